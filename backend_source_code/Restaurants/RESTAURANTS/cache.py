@@ -0,0 +1,153 @@
+"""
+Small typed layer over django.core.cache used by the hot lookups.
+
+    BUSINESS_DAYS = CacheNamespace[Optional[BusinessDay]]('business_day', ttl=300, versioned=True)
+    day = BUSINESS_DAYS.get_or_load(restaurant_id, loader=lambda: ...)
+    BUSINESS_DAYS.invalidate(restaurant_id)
+
+- Keys are namespaced: "<namespace>:<scope>[:g<generation>]:<parts>".
+- `versioned=True` namespaces keep a generation counter per scope;
+  invalidate(scope) bumps it, so every key of that scope goes stale at once
+  without having to know or delete them.
+- Values are wrapped before storing, so a cached None is a hit, not a miss.
+- Concurrent misses on the same key in one process run the loader once
+  (singleflight); the others wait and reuse its result.
+- Hits, misses, loads and invalidations are counted per namespace and exposed
+  by stats() (and the health check).
+- The cache is shared (Redis), so model instances are not stored whole:
+  cache `.values(*cacheable_fields(Model, exclude=secrets))` and rebuild with
+  from_cached(); the excluded fields load from the database on access.
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+from django.core.cache import caches
+
+T = TypeVar('T')
+
+_MISSING = object()
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+_flights_lock = threading.Lock()
+_flights: Dict[str, threading.Lock] = {}
+
+
+def _count(namespace: str, counter: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[namespace][counter] += amount
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Per-namespace counters of this process: hits, misses, loads, coalesced, invalidations."""
+    with _stats_lock:
+        return {name: dict(counters) for name, counters in _stats.items()}
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def cacheable_fields(model, exclude=()) -> list:
+    """Column names of `model` to cache, leaving out `exclude` (password hashes, secrets)."""
+    return [field.attname for field in model._meta.concrete_fields if field.attname not in exclude]
+
+
+def from_cached(model, values: Optional[dict], using: str = 'default'):
+    """
+    An instance of `model` from cached `.values()` (None stays None). Fields
+    that were not cached are deferred: read from the database only if used.
+    """
+    if values is None:
+        return None
+    return model.from_db(using, list(values), list(values.values()))
+
+
+class CacheNamespace(Generic[T]):
+    def __init__(self, name: str, ttl: Optional[int], alias: str = 'default', versioned: bool = False):
+        self.name = name
+        self.ttl = ttl
+        self.alias = alias
+        self.versioned = versioned
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _generation_key(self, scope: Hashable) -> str:
+        return f"{self.name}:{scope}:generation"
+
+    def generation(self, scope: Hashable) -> Optional[int]:
+        if not self.versioned:
+            return None
+        key = self._generation_key(scope)
+        generation = self.cache.get(key)
+        if generation is None:
+            # Start from the clock, not 0: an evicted counter must never bring back an old generation
+            self.cache.add(key, time.time_ns(), None)
+            generation = self.cache.get(key)
+        return generation
+
+    def key(self, scope: Hashable, *parts: Hashable) -> str:
+        segments = [self.name, str(scope)]
+        if self.versioned:
+            segments.append(f"g{self.generation(scope)}")
+        segments.extend(str(part) for part in parts)
+        return ':'.join(segments)
+
+    def get(self, scope: Hashable, *parts: Hashable, default: Optional[T] = None) -> Optional[T]:
+        value = self._get(self.key(scope, *parts))
+        return default if value is _MISSING else value
+
+    def _get(self, key: str):
+        wrapped = self.cache.get(key)
+        if wrapped is None:
+            _count(self.name, 'misses')
+            return _MISSING
+        _count(self.name, 'hits')
+        return wrapped[0]
+
+    def set(self, scope: Hashable, *parts: Hashable, value: T, ttl: Optional[int] = None) -> None:
+        self.cache.set(self.key(scope, *parts), (value,), self.ttl if ttl is None else ttl)
+
+    def delete(self, scope: Hashable, *parts: Hashable) -> None:
+        self.cache.delete(self.key(scope, *parts))
+
+    def get_or_load(self, scope: Hashable, *parts: Hashable, loader: Callable[[], T],
+                    ttl: Optional[int] = None) -> T:
+        """Cached value, or loader()'s result stored for `ttl` (one loader call per key at a time)."""
+        key = self.key(scope, *parts)
+        value = self._get(key)
+        if value is not _MISSING:
+            return value
+
+        with _flights_lock:
+            flight = _flights.setdefault(key, threading.Lock())
+        with flight:
+            # Another thread may have loaded it while we waited for the flight
+            wrapped = self.cache.get(key)
+            if wrapped is not None:
+                _count(self.name, 'coalesced')
+                return wrapped[0]
+            value = loader()
+            _count(self.name, 'loads')
+            self.cache.set(key, (value,), self.ttl if ttl is None else ttl)
+        with _flights_lock:
+            if _flights.get(key) is flight and not flight.locked():
+                del _flights[key]
+        return value
+
+    def invalidate(self, scope: Hashable) -> None:
+        """Makes every key of `scope` stale (versioned namespaces only)."""
+        if not self.versioned:
+            raise TypeError(f"cache namespace {self.name!r} is not versioned")
+        key = self._generation_key(scope)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, time.time_ns(), None)
+        _count(self.name, 'invalidations')
@@ -2,6 +2,8 @@ from django.http import JsonResponse
 from django.db import connection
 
 from django.conf import settings
+from message.broadcast import stats as broadcast_stats
+from RESTAURANTS.cache import stats as cache_stats
 
 def health_check(request):
     db_config = settings.DATABASES['default']
@@ -19,6 +21,6 @@ def health_check(request):
             one = cursor.fetchone()[0]
             if one != 1:
                 raise Exception("DB returned wrong value")
-        return JsonResponse({"status": "ok", "db": "connected", "config": debug_info}, status=200)
+        return JsonResponse({"status": "ok", "db": "connected", "config": debug_info, "broadcast": broadcast_stats(), "cache": cache_stats()}, status=200)
     except Exception as e:
         return JsonResponse({"status": "error", "db_error": str(e), "config": debug_info}, status=500)
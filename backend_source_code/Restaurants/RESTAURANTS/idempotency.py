@@ -0,0 +1,148 @@
+"""
+Idempotency-Key support for POST endpoints that guests retry on bad Wi-Fi.
+
+    @idempotent('order-create')
+    def create(self, request, *args, **kwargs): ...
+
+The first response for a key is stored in the cache for IDEMPOTENCY['TTL']
+seconds and replayed (with an `Idempotent-Replayed: true` header) for every
+repeat, without running the view again. A duplicate that arrives while the
+first request is still running waits for its result instead of starting a
+second order. Reusing a key with a different body is rejected with 422.
+
+Keys are scoped to the endpoint and the caller (guest session token or user),
+so two phones can never collide on the same key.
+"""
+import hashlib
+import json
+import secrets
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TTL': 60 * 15,
+    'LOCK_TTL': 30,
+    'WAIT_TIMEOUT': 10,
+}
+
+
+def _config(name):
+    return getattr(settings, 'IDEMPOTENCY', {}).get(name, DEFAULTS[name])
+
+
+def _cache():
+    return caches[_config('CACHE_ALIAS')]
+
+
+def _caller(request):
+    # Same lookup order the guest views use for their session token
+    data = request.data if hasattr(request.data, 'get') else {}
+    token = (request.headers.get('X-Guest-Session-Token')
+             or data.get('guest_session_token')
+             or request.query_params.get('guest_token'))
+    if token:
+        return f"guest:{token}"
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return "anonymous"
+
+
+def _fingerprint(request):
+    body = JSONRenderer().render(request.data) if request.data else b''
+    return hashlib.sha256(request.get_full_path().encode() + b'|' + body).hexdigest()
+
+
+def _replay(record):
+    return Response(record['data'], status=record['status'], headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(scope):
+    """Decorates an APIView handler (post/create) with Idempotency-Key handling."""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response({'detail': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            cache = _cache()
+            digest = hashlib.sha256(f"{_caller(request)}|{key}".encode()).hexdigest()
+            result_key = f"idempotency:{scope}:{digest}"
+            lock_key = f"{result_key}:lock"
+            fingerprint = _fingerprint(request)
+
+            record = cache.get(result_key)
+            # An int: Django's Redis serializer stores it as is, so _release's script can compare it
+            token = secrets.randbits(62)
+            if record is None and not cache.add(lock_key, token, _config('LOCK_TTL')):
+                record = _wait_for(cache, result_key, lock_key)
+                if record is None:
+                    return Response({'detail': 'A request with this Idempotency-Key is still being processed.'},
+                                    status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+
+            if record is not None:
+                if record['fingerprint'] != fingerprint:
+                    return Response({'detail': f'{HEADER} was already used for a different request.'},
+                                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return _replay(record)
+
+            try:
+                response = handler(view, request, *args, **kwargs)
+                # Server errors are not final: let the client retry them for real
+                if response.status_code < 500:
+                    cache.set(result_key, {
+                        'fingerprint': fingerprint,
+                        'status': response.status_code,
+                        'data': json.loads(JSONRenderer().render(response.data) or b'null'),
+                    }, _config('TTL'))
+                return response
+            finally:
+                _release(cache, lock_key, token)
+        return wrapper
+    return decorator
+
+
+_RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+def _release(cache, lock_key, token):
+    """
+    Deletes the lock only if it still holds `token`: a request that outlived
+    LOCK_TTL must not remove the lock a later request has taken since.
+    """
+    if isinstance(cache, RedisCache):
+        # Compare-and-delete in one round trip
+        client = cache._cache.get_client(lock_key, write=True)
+        client.eval(_RELEASE_SCRIPT, 1, cache.make_and_validate_key(lock_key), token)
+    elif cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _wait_for(cache, result_key, lock_key):
+    """Polls until the in-flight request stores its result (or gives up)."""
+    deadline = time.monotonic() + _config('WAIT_TIMEOUT')
+    while time.monotonic() < deadline:
+        record = cache.get(result_key)
+        if record is not None:
+            return record
+        if cache.get(lock_key) is None:
+            # The first request failed without a storable result
+            return cache.get(result_key)
+        time.sleep(0.05)
+    return None
@@ -0,0 +1,250 @@
+"""
+Resized derivatives of uploaded images.
+
+Menu pages show item, category and restaurant pictures at a few fixed sizes,
+so every upload is turned into WebP and JPEG copies (thumb/card/full by
+default, see settings.IMAGE_DERIVATIVES) stored next to the original:
+
+    media/item_images/burger.jpg
+    media/item_images/derived/burger.3f9c0a1b2d.thumb.webp
+    media/item_images/derived/burger.3f9c0a1b2d.thumb.jpg
+    ...
+
+The hash in the name comes from the original's bytes, so a derivative never
+changes once written and regenerating an unchanged image writes nothing.
+EXIF orientation is applied and all metadata (EXIF, GPS, ICC, comments) is
+dropped.
+
+What was generated is recorded on the model, in an `image_derivatives` JSON
+field keyed by image field name:
+
+    {"image1": {"source": "media/item_images/burger.jpg",
+                "variants": {"thumb": {"width": 160, "height": 120,
+                                       "webp": "...", "jpeg": "..."}, ...}}}
+
+The app signals call `schedule_derivatives` on save; ImageVariantsField
+exposes the URLs to API clients; `manage.py backfill_image_derivatives`
+covers images uploaded before this existed.
+"""
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'VARIANTS': {'thumb': 160, 'card': 480, 'full': 1280},
+    'WEBP_QUALITY': 80,
+    'JPEG_QUALITY': 82,
+}
+
+FORMATS = {
+    # key in the variant entry: (Pillow format, file extension)
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+# Image fields that get derivatives, by model label
+IMAGE_FIELDS = {
+    'item.Item': ['image1'],
+    'category.Category': ['image', 'icon_image'],
+    'restaurant.Restaurant': ['image', 'logo'],
+}
+
+# Refuse decompression bombs well before Pillow's own (warning-only) threshold
+MAX_PIXELS = 50_000_000
+
+
+def _config(name):
+    return getattr(settings, 'IMAGE_DERIVATIVES', {}).get(name, DEFAULTS[name])
+
+
+def _derived_name(source_name, digest, variant, extension):
+    directory, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'derived', f'{stem}.{digest}.{variant}.{extension}')
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(buffer, 'JPEG', quality=_config('JPEG_QUALITY'), optimize=True, progressive=True)
+    else:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+        image.save(buffer, 'WEBP', quality=_config('WEBP_QUALITY'), method=4)
+    return buffer.getvalue()
+
+
+def _save(name, content, storage):
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(content))
+    return name
+
+
+def generate_derivatives(source_name, storage=default_storage):
+    """
+    Writes the variants of the image stored as `source_name` and returns its
+    `image_derivatives` entry. Raises ValueError if the file is not an image.
+    """
+    with storage.open(source_name, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:10]
+
+    try:
+        original = Image.open(BytesIO(data))
+        if original.width * original.height > MAX_PIXELS:
+            raise ValueError(f'{source_name} is too large ({original.width}x{original.height})')
+        largest = max(_config('VARIANTS').values())
+        # JPEG can decode straight at a reduced scale, much cheaper than a full decode
+        original.draft('RGB', (largest, largest))
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise ValueError(f'{source_name} is not a readable image: {exc}') from exc
+
+    variants = {}
+    previous = None
+    for variant, box in sorted(_config('VARIANTS').items(), key=lambda pair: pair[1]):
+        image = original.copy()
+        image.thumbnail((box, box), Image.LANCZOS)
+        if previous is not None and previous['width'] == image.width:
+            # The original is smaller than this box: same pixels as the last variant
+            variants[variant] = dict(previous)
+            continue
+        entry = {'width': image.width, 'height': image.height}
+        for key, (image_format, extension) in FORMATS.items():
+            name = _derived_name(source_name, digest, variant, extension)
+            entry[key] = _save(name, _encode(image, image_format), storage)
+        variants[variant] = previous = entry
+
+    return {'source': source_name, 'variants': variants}
+
+
+def derived_files(entry):
+    """Every file name recorded in an `image_derivatives` entry."""
+    names = set()
+    for variant in (entry or {}).get('variants', {}).values():
+        names.update(variant[key] for key in FORMATS if variant.get(key))
+    return names
+
+
+def stale_fields(instance, fields):
+    """The image fields of `instance` whose derivatives are missing or belong to another file."""
+    derivatives = instance.image_derivatives or {}
+    stale = []
+    for field in fields:
+        name = getattr(instance, field).name or None
+        if (derivatives.get(field) or {}).get('source') != name:
+            stale.append(field)
+    return stale
+
+
+def refresh_derivatives(instance, fields, force=False, storage=default_storage):
+    """
+    Brings `instance.image_derivatives` in line with its image fields: new
+    images get variants, removed or replaced ones lose theirs. Stores the
+    result with a queryset update (no save signals) and returns the fields
+    that changed.
+    """
+    fields = list(fields) if force else stale_fields(instance, fields)
+    if not fields:
+        return []
+
+    derivatives = dict(instance.image_derivatives or {})
+    obsolete = set()
+    for field in fields:
+        old = derivatives.pop(field, None)
+        name = getattr(instance, field).name
+        if name:
+            try:
+                derivatives[field] = generate_derivatives(name, storage)
+            except (ValueError, OSError):
+                logger.warning('Could not build derivatives of %s.%s (pk=%s)',
+                               instance._meta.label, field, instance.pk, exc_info=True)
+                # Remembered as done, so every later save does not retry a broken file
+                derivatives[field] = {'source': name, 'variants': {}}
+        obsolete |= derived_files(old)
+
+    # Content-addressed names: files still used by another field (or the same image) stay
+    obsolete -= set().union(*(derived_files(entry) for entry in derivatives.values()))
+    for name in obsolete:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning('Could not delete derivative %s', name, exc_info=True)
+
+    instance.image_derivatives = derivatives
+    type(instance).objects.filter(pk=instance.pk).update(image_derivatives=derivatives)
+    return fields
+
+
+def schedule_derivatives(instance, fields, on_refresh=None):
+    """
+    Post-save hook: once the transaction commits, rebuilds the derivatives of
+    the image fields that changed, then calls `on_refresh(instance)` if any did.
+    """
+    if not stale_fields(instance, fields):
+        return
+    model, pk = type(instance), instance.pk
+
+    def run():
+        current = model.objects.filter(pk=pk).first()
+        if current is not None and refresh_derivatives(current, fields) and on_refresh:
+            on_refresh(current)
+
+    transaction.on_commit(run)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only URLs of an image field's derivatives:
+
+        {"srcset": {"webp": "<url> 160w, <url> 480w, ...", "jpeg": "..."},
+         "thumb": {"width": 160, "height": 120, "webp": "<url>", "jpeg": "<url>"},
+         "card": {...}, "full": {...}}
+
+    None until the derivatives of the current image exist.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def _url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def to_representation(self, instance):
+        entry = (instance.image_derivatives or {}).get(self.image_field)
+        name = getattr(instance, self.image_field).name
+        if not entry or not entry.get('variants') or not name or entry.get('source') != name:
+            return None
+
+        data = {'srcset': {}}
+        widths = {}
+        for variant, files in entry['variants'].items():
+            data[variant] = {'width': files['width'], 'height': files['height']}
+            for key in FORMATS:
+                data[variant][key] = url = self._url(files[key])
+                widths.setdefault(key, {})[files['width']] = url
+        for key, urls in widths.items():
+            data['srcset'][key] = ', '.join(f'{url} {width}w' for width, url in sorted(urls.items()))
+        return data
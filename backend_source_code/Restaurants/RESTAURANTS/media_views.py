@@ -0,0 +1,163 @@
+"""
+Serves MEDIA_ROOT when the files live on local disk (no GS_BUCKET_NAME).
+
+Compared to django.views.static.serve:
+
+- Byte ranges (`Range: bytes=...`, `If-Range`) with 206/416 answers, so
+  item videos can be seeked and resumed.
+- Strong ETag + Last-Modified, answered with 304 on revalidation.
+- Content-hashed names (image derivatives, QR codes: "<stem>.<hex>.<...>")
+  never change, so they are cached for a year as immutable; everything else
+  for MEDIA_SERVING["MAX_AGE"].
+- MEDIA_SERVING["OFFLOAD"] = "x-accel" (nginx) or "x-sendfile" (Apache,
+  lighttpd) leaves the bytes to the front server: the view only checks the
+  file and sets headers. nginx needs an internal location mapping
+  ACCEL_PREFIX to MEDIA_ROOT.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+DEFAULTS = {
+    'OFFLOAD': None,  # None, "x-accel" or "x-sendfile"
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 60 * 60,
+    'IMMUTABLE_MAX_AGE': 365 * 24 * 60 * 60,
+}
+
+CHUNK_SIZE = 64 * 1024
+
+# "<stem>.<10+ hex digest>.<anything>": written once under that name, never modified
+_HASHED_NAME = re.compile(r'\.[0-9a-f]{10,}\.[^/]+$')
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _config(name):
+    return getattr(settings, 'MEDIA_SERVING', {}).get(name, DEFAULTS[name])
+
+
+def is_immutable(path):
+    return bool(_HASHED_NAME.search(path))
+
+
+def _resolve(path):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Not found")
+    return path, full_path
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single `bytes=` range, None to send the
+    whole file (no/unsupported header), or ValueError if unsatisfiable.
+    """
+    match = _RANGE.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None  # multiple ranges and other units: a full 200 is allowed
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            # An empty file has no last N bytes to send
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _if_range_matches(request, etag, mtime):
+    value = request.headers.get('If-Range')
+    if value is None:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    modified = parse_http_date_safe(value)
+    return modified is not None and int(mtime) <= modified
+
+
+def _read(full_path, start, length):
+    with open(full_path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    path, full_path = _resolve(path)
+    stat = os.stat(full_path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    # 304 for a matching If-None-Match / If-Modified-Since (412 for failed If-Match)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, path, full_path, size, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if is_immutable(path):
+        patch_cache_control(response, public=True, max_age=_config('IMMUTABLE_MAX_AGE'), immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=_config('MAX_AGE'))
+    return response
+
+
+def _file_response(request, path, full_path, size, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    offload = _config('OFFLOAD')
+    if offload:
+        # The front server answers ranges and streams the body itself
+        response = HttpResponse(content_type=content_type)
+        if offload == 'x-accel':
+            response['X-Accel-Redirect'] = quote(_config('ACCEL_PREFIX').rstrip('/') + '/' + path)
+        else:
+            response['X-Sendfile'] = full_path
+        return response
+
+    byte_range = None
+    if 'Range' in request.headers and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    body = [] if request.method == 'HEAD' else _read(full_path, start, length)
+    response = StreamingHttpResponse(body, content_type=content_type, status=206 if byte_range else 200)
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
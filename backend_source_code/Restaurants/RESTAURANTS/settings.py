@@ -216,6 +216,73 @@ else:
         },
     }
 
+# Cache: shared Redis when available (database 1, channels uses 0), otherwise one
+# local-memory cache per process. RESTAURANTS/cache.py adds namespaces on top.
+if REDIS_HOST and REDIS_HOST != 'localhost':
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": f"redis://{REDIS_HOST}:6379/1",
+            "KEY_PREFIX": "restaurants",
+            "TIMEOUT": 300,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "restaurants",
+            "TIMEOUT": 300,
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        },
+    }
+
+# Time to live (seconds) of the cached lookups in accounts/, restaurant/ and payment/.
+# Writes drop the entries through signals; the TTL only bounds what a missed signal costs.
+CACHE_TTLS = {
+    "auth_user": 300,
+    "staff_restaurants": 300,
+    "business_day": 300,
+    "payment_gateway": 300,
+    "generated_image": 24 * 60 * 60,  # prompt hash -> stored file, see owners/image_generation.py
+    "ws_identity": 60,  # WebSocket handshakes, see message/handshake.py
+    "ws_guest_session": 60,
+}
+
+# Broadcast bus (message/broadcast.py): events are queued on commit and delivered in
+# batches. The in-memory layer only works from the server's own loop, so it is flushed
+# at the end of each request; Redis gets a background dispatcher thread.
+BROADCAST_BUS = {
+    "MODE": "thread" if CHANNEL_LAYERS["default"]["BACKEND"].startswith("channels_redis") else "inline",
+    "BATCH_SIZE": 100,
+    "MAX_RETRIES": 3,
+    "RETRY_BACKOFF": 0.1,  # seconds, multiplied by the attempt number
+}
+
+# Idempotency-Key replay for order submission and checkout (RESTAURANTS/idempotency.py).
+# Only shared across processes when CACHES uses Redis.
+IDEMPOTENCY = {
+    "CACHE_ALIAS": "default",
+    "TTL": 60 * 15,  # how long a stored response is replayed, seconds
+    "LOCK_TTL": 30,  # an in-flight request older than this is considered dead
+    "WAIT_TIMEOUT": 10,  # how long a concurrent duplicate waits for the first one
+}
+
+# Pre-rendered customer menu responses (item/snapshots.py), keyed by Restaurant.menu_version
+MENU_SNAPSHOT = {
+    "CACHE_ALIAS": "default",
+    "TTL": 60 * 60,  # rendered body of one menu version, seconds
+    "VERSION_TTL": 30,  # other processes see a new version within this, unless the cache is shared
+}
+
+# Resized copies of uploaded item/category/restaurant images (RESTAURANTS/images.py).
+# Each variant fits in a square box of the given size; originals are never upscaled.
+IMAGE_DERIVATIVES = {
+    "VARIANTS": {"thumb": 160, "card": 480, "full": 1280},
+    "WEBP_QUALITY": 80,
+    "JPEG_QUALITY": 82,
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -230,7 +297,7 @@ else:
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ],  
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend"
@@ -243,6 +310,8 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'restaurant.exceptions.custom_exception_handler',
 }
 
+TEST_RUNNER = "RESTAURANTS.test_runner.CacheIsolatingRunner"
+
 LOGIN_REDIRECT_URL = "/profile/"
 
 
@@ -313,6 +382,46 @@ else:
     MEDIA_URL = '/media/'
     MEDIA_ROOT = env('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
 
+# /media/ view (RESTAURANTS/media_views.py). Behind nginx set MEDIA_OFFLOAD=x-accel and map
+# ACCEL_PREFIX as an internal location aliasing MEDIA_ROOT; "x-sendfile" for Apache/lighttpd.
+MEDIA_SERVING = {
+    "OFFLOAD": env('MEDIA_OFFLOAD', default=None),
+    "ACCEL_PREFIX": "/protected-media/",
+    "MAX_AGE": 60 * 60,  # seconds, for names that may be overwritten
+    "IMMUTABLE_MAX_AGE": 365 * 24 * 60 * 60,  # content-hashed names
+}
+
+# AI image generation (owners/image_generation.py): async upstream calls with a pooled client,
+# results stored in media storage under the prompt hash. Timeouts in seconds.
+IMAGE_GENERATION = {
+    "ENDPOINT": env('IMAGE_GENERATION_ENDPOINT', default='https://image.pollinations.ai/prompt/'),
+    "CONNECT_TIMEOUT": 5,
+    "READ_TIMEOUT": 60,
+    "TOTAL_TIMEOUT": 90,  # including the wait for a free slot
+    "MAX_CONCURRENCY": 4,  # upstream requests per process
+    "MAX_BYTES": 10 * 1024 * 1024,
+}
+
+# Table QR codes (device/qr.py): content-addressed PNGs rendered after commit on a background
+# thread ("thread") or in the commit callback ("inline"). `manage.py render_qr_codes` catches up.
+QR_CODES = {
+    "MODE": env('QR_CODES_MODE', default='thread'),
+    "BATCH_SIZE": 100,
+    "BOX_SIZE": 10,
+    "BORDER": 4,
+    "SHEET_DPI": 150,  # printable sheet: A4 pages of SHEET_COLUMNS x SHEET_ROWS codes
+    "SHEET_COLUMNS": 3,
+    "SHEET_ROWS": 4,
+}
+
+# Chat persistence (message/persistence.py). "write_behind" broadcasts first and inserts in
+# batches of up to BATCH_SIZE at most FLUSH_INTERVAL seconds later; a crash loses at most that window.
+CHAT_PERSISTENCE = {
+    "MODE": env('CHAT_PERSISTENCE_MODE', default='sync'),  # "sync" or "write_behind"
+    "BATCH_SIZE": 50,
+    "FLUSH_INTERVAL": 0.25,  # seconds
+}
+
 STATICFILES_DIRS = [
         os.path.join(BASE_DIR, 'static'),
 ]
@@ -0,0 +1,24 @@
+import unittest
+
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+
+
+class CacheIsolatingRunner(DiscoverRunner):
+    """
+    Clears every cache before each test. Test transactions are rolled back
+    without firing the signals that invalidate cached rows, and SQLite reuses
+    the rolled back ids, so a cached lookup could otherwise leak into the next
+    test.
+    """
+
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+
+        class CacheClearingResult(base):
+            def startTest(self, test):
+                for cache in caches.all():
+                    cache.clear()
+                super().startTest(test)
+
+        return CacheClearingResult
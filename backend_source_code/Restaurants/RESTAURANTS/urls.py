@@ -37,10 +37,10 @@ urlpatterns = [
 
 
 from django.urls import re_path
-from django.views.static import serve
+from .media_views import serve_media
 
 urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
+    re_path(r'^media/(?P<path>.*)$', serve_media, name='media'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from RESTAURANTS.cache import CacheNamespace, cacheable_fields, from_cached
+
+USERS = CacheNamespace('auth_user', ttl=settings.CACHE_TTLS['auth_user'])
+
+
+def forget_user(user_id):
+    """Drops the cached user now and again after commit (a reader may re-cache the old row meanwhile)."""
+    USERS.delete(user_id)
+    transaction.on_commit(lambda: USERS.delete(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the token's user (and so its role) in the
+    cache instead of loading it on every request. Saving or deleting a user
+    drops the entry (accounts/signals.py). The password hash is never cached:
+    it is deferred on the returned user and loads only if something reads it.
+    """
+
+    def get_user(self, validated_token):
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            # The revoke check compares each token to the stored password hash
+            return super().get_user(validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        User = get_user_model()
+        fields = cacheable_fields(User, exclude=('password',))
+        values = USERS.get_or_load(
+            user_id, loader=lambda: User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values(*fields).first()
+        )
+        user = from_cached(User, values)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import User,ChefStaff
 from restaurant.models import Restaurant
+from RESTAURANTS.images import ImageVariantsField
 import secrets
 from django.core.mail import send_mail
 from django.conf import settings
@@ -39,9 +40,11 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 
 class RestaurantSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField('image')
+
     class Meta:
         model = Restaurant
-        fields = ['id', 'resturent_name', 'location', 'phone_number', 'package', 'image']
+        fields = ['id', 'resturent_name', 'location', 'phone_number', 'package', 'image', 'image_variants']
 
 
 
@@ -1,3 +1,138 @@
+import threading
+import time
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from payment.lookups import GATEWAYS, active_gateway
+from payment.models import PaymentGateway
+from restaurant.lookups import active_business_day
+from restaurant.models import BusinessDay, Restaurant
+from RESTAURANTS import cache as cache_layer
+from RESTAURANTS.cache import CacheNamespace
+from .authentication import USERS
+from .models import User
+
+
+class CacheNamespaceTests(TestCase):
+
+    def setUp(self):
+        cache_layer.reset_stats()
+
+    def test_cached_none_is_a_hit(self):
+        namespace = CacheNamespace('test_none', ttl=60)
+        loads = []
+        for _ in range(3):
+            self.assertIsNone(namespace.get_or_load(1, loader=lambda: loads.append(1)))
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(cache_layer.stats()['test_none'], {'misses': 1, 'loads': 1, 'hits': 2})
+
+    def test_invalidate_drops_every_key_of_the_scope_only(self):
+        namespace = CacheNamespace('test_versioned', ttl=60, versioned=True)
+        namespace.set(1, 'a', value='one-a')
+        namespace.set(1, 'b', value='one-b')
+        namespace.set(2, 'a', value='two-a')
+
+        namespace.invalidate(1)
+
+        self.assertIsNone(namespace.get(1, 'a'))
+        self.assertIsNone(namespace.get(1, 'b'))
+        self.assertEqual(namespace.get(2, 'a'), 'two-a')
+
+    def test_concurrent_misses_load_once(self):
+        namespace = CacheNamespace('test_flight', ttl=60)
+        calls = []
+
+        def slow_loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(namespace.get_or_load('k', loader=slow_loader)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+
+class CachedLookupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+
+    def test_jwt_user_is_loaded_once_and_dropped_on_save(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.owner).access_token}')
+        url = reverse('category-list')
+
+        client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            client.get(url)
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "accounts_user"' in q['sql']])
+
+        User.objects.filter(pk=self.owner.pk).update(role='customer')
+        self.owner.refresh_from_db()
+        self.owner.save()
+        response = client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_active_business_day_follows_writes(self):
+        self.assertIsNone(active_business_day(self.restaurant.id))
+        with self.assertNumQueries(0):
+            self.assertIsNone(active_business_day(self.restaurant.id))
+
+        day = BusinessDay.objects.create(restaurant=self.restaurant)
+        self.assertEqual(active_business_day(self.restaurant.id), day)
+
+        day.is_active = False
+        day.save()
+        self.assertIsNone(active_business_day(self.restaurant.id))
+
+    def test_activating_a_gateway_invalidates_the_others(self):
+        stripe = PaymentGateway.objects.create(
+            restaurant=self.restaurant, provider='stripe', is_active=True, key_id='pk', key_secret='sk'
+        )
+        self.assertEqual(active_gateway(self.restaurant.id), stripe)
+        self.assertEqual(active_gateway(self.restaurant.id, 'stripe'), stripe)
+
+        paytabs = PaymentGateway.objects.create(
+            restaurant=self.restaurant, provider='paytabs', is_active=True, key_id='id', key_secret='key'
+        )
+        with self.assertNumQueries(2):
+            self.assertEqual(active_gateway(self.restaurant.id), paytabs)
+            self.assertIsNone(active_gateway(self.restaurant.id, 'stripe'))
+
+    def test_secrets_stay_out_of_the_shared_cache(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.owner).access_token}')
+        client.get(reverse('category-list'))
+        cached_user = USERS.get(self.owner.pk)
+        self.assertEqual(cached_user['email'], self.owner.email)
+        self.assertNotIn('password', cached_user)
 
-# Create your tests here.
+        PaymentGateway.objects.create(
+            restaurant=self.restaurant, provider='stripe', is_active=True, key_id='pk', key_secret='sk'
+        )
+        gateway = active_gateway(self.restaurant.id)
+        self.assertNotIn('key_secret', GATEWAYS.get(self.restaurant.id, 'any'))
+        # ...and load from the database when used
+        with self.assertNumQueries(1):
+            self.assertEqual(gateway.get_decrypted_secret(), 'sk')
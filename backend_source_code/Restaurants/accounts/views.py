@@ -14,8 +14,7 @@ from rest_framework.decorators import action
 from .permissions import IsOwnerRole, IsOwnerChefOrStaff
 from .pagination import ChefAndStaffPagination
 from django.core.mail import send_mail
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from message.broadcast import publish
 import logging
 # jwt
 from rest_framework.permissions import AllowAny
@@ -27,6 +26,7 @@ from rest_framework import serializers
 from .utils import get_restaurant_owner_id
 from rest_framework.exceptions import NotFound
 from django.contrib.auth import authenticate
+from message.handshake import forget_identity
 
 logger = logging.getLogger(__name__)
 # Create your views here.
@@ -365,6 +365,8 @@ class LogoutApiView(APIView):
             if refresh_token:
                 token = RefreshToken(refresh_token)
                 token.blacklist()
+            # The next socket handshake must load the user again
+            forget_identity(request.user.pk)
             return Response({"detail": "Successfully logged out."}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"detail": "Error logging out."}, status=status.HTTP_400_BAD_REQUEST)
@@ -409,8 +411,7 @@ class ChefStaffViewSet(viewsets.ModelViewSet):
 
         instance = serializer.save(restaurant=restaurant)
         
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{instance.restaurant.id}",
             {
                 "type": "chefstaff_created",
@@ -440,8 +441,7 @@ class ChefStaffViewSet(viewsets.ModelViewSet):
             
         serializer.save()
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{instance.restaurant.id}",
             {
                 "type": "chefstaff_updated",
@@ -466,8 +466,7 @@ class ChefStaffViewSet(viewsets.ModelViewSet):
         instance_id = instance.id
         instance.delete()
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{restaurant_id}",
             {
                 "type": "chefstaff_deleted",
@@ -9,7 +9,7 @@ from rest_framework import status
 from django.db.models import Sum, Count, F, ExpressionWrapper, fields
 from datetime import timedelta
 from django.utils import timezone
-from order.models import Order
+from order.models import Order, SalesRollup
 from django.db.models.functions import TruncMonth
 from datetime import datetime
 from rest_framework.pagination import PageNumberPagination
@@ -101,10 +101,10 @@ class RestaurantViewSet(ModelViewSet):
 
         # Get total sales and order count for each month in the current year
         monthly_sales = (
-            Order.objects.filter(created_time__year=current_year)
-            .annotate(month=TruncMonth('created_time'))  # Truncate to month
+            SalesRollup.objects.filter(bucket__year=current_year)
+            .annotate(month=TruncMonth('bucket'))  # Truncate to month
             .values('month')
-            .annotate(total_orders=Count('id'), total_sales=Sum('total_price'))
+            .annotate(total_orders=Sum('order_count'), total_sales=Sum('revenue'))
             .order_by('month')
         )
 
@@ -138,10 +138,10 @@ class RestaurantViewSet(ModelViewSet):
 
         # Get total sales and order count for each month in the previous year
         monthly_sales = (
-            Order.objects.filter(created_time__year=previous_year)
-            .annotate(month=TruncMonth('created_time'))  # Truncate to month
+            SalesRollup.objects.filter(bucket__year=previous_year)
+            .annotate(month=TruncMonth('bucket'))  # Truncate to month
             .values('month')
-            .annotate(total_orders=Count('id'), total_sales=Sum('total_price'))
+            .annotate(total_orders=Sum('order_count'), total_sales=Sum('revenue'))
             .order_by('month')
         )
 
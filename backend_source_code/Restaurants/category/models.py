@@ -12,6 +12,8 @@ class Category(models.Model):
     image = models.ImageField(upload_to='media/category_images/', null=True, blank=True)
     icon = models.CharField(max_length=50, blank=True, null=True)
     icon_image = models.ImageField(upload_to='media/category_icons/', null=True, blank=True)
+    # Resized copies of image and icon_image (RESTAURANTS/images.py)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     
     # Hierarchical fields
     parent_category = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='subcategories')
@@ -1,13 +1,18 @@
 from rest_framework import serializers
 from .models import Category
+from .tree import children_of
 from django.utils.text import slugify
 
+from RESTAURANTS.images import ImageVariantsField
+
 
 class CategorySerializer(serializers.ModelSerializer):
     image = serializers.ImageField(required=False)
+    image_variants = ImageVariantsField('image')
+    icon_image_variants = ImageVariantsField('icon_image')
     class Meta:
         model = Category
-        fields = ['id', 'Category_name', 'slug','image', 'parent_category', 'level', 'icon', 'icon_image']
+        fields = ['id', 'Category_name', 'slug','image', 'image_variants', 'parent_category', 'level', 'icon', 'icon_image', 'icon_image_variants']
         read_only_fields = ['slug', 'level']
 
     def create(self, validated_data):
@@ -17,9 +22,11 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class CustomerCategorySerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField('image')
+    icon_image_variants = ImageVariantsField('icon_image')
     class Meta:
         model = Category
-        fields = ['id', 'Category_name', 'slug', 'image', 'parent_category', 'level', 'icon', 'icon_image']
+        fields = ['id', 'Category_name', 'slug', 'image', 'image_variants', 'parent_category', 'level', 'icon', 'icon_image', 'icon_image_variants']
 
 class HierarchicalCategorySerializer(CategorySerializer):
     subcategories = serializers.SerializerMethodField()
@@ -28,9 +35,12 @@ class HierarchicalCategorySerializer(CategorySerializer):
         fields = CategorySerializer.Meta.fields + ['subcategories']
 
     def get_subcategories(self, obj):
-        if obj.level == 0: # Only fetch for top level to avoid deep recursion if not needed
-             return HierarchicalCategorySerializer(obj.subcategories.all(), many=True).data
-        return []
+        # Views load the whole tree up front (category/tree.py); a lone instance
+        # (e.g. retrieve) builds its restaurant's tree here, still in one query
+        children = getattr(obj, 'tree_children', None)
+        if children is None:
+            children = children_of(obj)
+        return HierarchicalCategorySerializer(children, many=True, context=self.context).data
 
 class SubCategorySerializer(serializers.ModelSerializer):
     image = serializers.ImageField(required=False)
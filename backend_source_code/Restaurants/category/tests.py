@@ -1,3 +1,83 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import ChefStaff, User
+from restaurant.models import Restaurant
+from .models import Category
+from .tree import build_category_tree
+
+
+class CategoryTreeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        cls.chef = User.objects.create_user(
+            email='chef@example.com', username='chef', password='pass1234', role='chef'
+        )
+        ChefStaff.objects.create(user=cls.chef, restaurant=cls.restaurant, action='accepted')
+
+        # Drinks > Hot > Coffee, Drinks > Cold, Food
+        cls.drinks = Category.objects.create(restaurant=cls.restaurant, Category_name='Drinks')
+        cls.hot = Category.objects.create(restaurant=cls.restaurant, Category_name='Hot', parent_category=cls.drinks)
+        cls.coffee = Category.objects.create(restaurant=cls.restaurant, Category_name='Coffee', parent_category=cls.hot)
+        Category.objects.create(restaurant=cls.restaurant, Category_name='Cold', parent_category=cls.drinks)
+        Category.objects.create(restaurant=cls.restaurant, Category_name='Food')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def names(self, nodes):
+        return {node['Category_name']: self.names(node['subcategories']) for node in nodes}
+
+    def test_build_links_children_in_memory(self):
+        roots = build_category_tree(Category.objects.all())
+        self.assertEqual([root.Category_name for root in roots], ['Drinks', 'Food'])
+        self.assertEqual([c.Category_name for c in roots[0].tree_children], ['Hot', 'Cold'])
+        self.assertEqual([c.Category_name for c in roots[0].tree_children[0].tree_children], ['Coffee'])
+
+    def test_owner_hierarchy_is_one_query_at_any_depth(self):
+        url = reverse('category-list')
+        with CaptureQueriesContext(connection) as shallow:
+            response = self.client.get(url, {'hierarchy': 'true'})
+        self.assertEqual(
+            self.names(response.data),
+            {'Drinks': {'Hot': {'Coffee': {}}, 'Cold': {}}, 'Food': {}},
+        )
+
+        espresso = Category.objects.create(
+            restaurant=self.restaurant, Category_name='Espresso', parent_category=self.coffee
+        )
+        Category.objects.create(restaurant=self.restaurant, Category_name='Ristretto', parent_category=espresso)
+        with CaptureQueriesContext(connection) as deep:
+            response = self.client.get(url, {'hierarchy': 'true'})
+
+        self.assertIn('Ristretto', str(response.data))
+        self.assertEqual(len(deep.captured_queries), len(shallow.captured_queries))
+        self.assertEqual(len([q for q in deep.captured_queries if 'category_category' in q['sql']]), 1)
+
+    def test_retrieve_with_hierarchy_still_nests(self):
+        response = self.client.get(reverse('category-detail', args=[self.drinks.id]), {'hierarchy': 'true'})
+        self.assertEqual(self.names(response.data['subcategories']), {'Hot': {'Coffee': {}}, 'Cold': {}})
+
+    def test_customer_and_chef_views_share_the_tree(self):
+        customer = APIClient()
+        response = customer.get(
+            reverse('customer-categories'), {'restaurant_id': self.restaurant.id, 'hierarchy': 'true'}
+        )
+        self.assertEqual(set(self.names(response.json())), {'Drinks', 'Food'})
+
+        self.client.force_authenticate(self.chef)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('my_categories'), {'hierarchy': 'true'})
+        self.assertEqual(self.names(response.data)['Drinks'], {'Hot': {'Coffee': {}}, 'Cold': {}})
+        self.assertEqual(len([q for q in ctx.captured_queries if 'category_category' in q['sql']]), 1)
@@ -0,0 +1,30 @@
+def build_category_tree(categories):
+    """
+    Links already loaded categories into a forest using parent_category_id, so
+    a whole menu needs one query whatever its depth. Every category gets a
+    `tree_children` list (ordered by id); returns the roots, ordered by id.
+    A category whose parent is not among `categories` is treated as a root.
+    """
+    nodes = {category.id: category for category in categories}
+    for category in nodes.values():
+        category.tree_children = []
+
+    roots = []
+    for category in sorted(nodes.values(), key=lambda c: (c.level, c.id)):
+        parent = nodes.get(category.parent_category_id)
+        (parent.tree_children if parent else roots).append(category)
+    return roots
+
+
+def category_tree(queryset):
+    """Loads `queryset` (one query) and returns its roots, see build_category_tree."""
+    return build_category_tree(list(queryset))
+
+
+def children_of(category):
+    """Children of a category that was not loaded through build_category_tree (one query)."""
+    from .models import Category
+    nodes = {node.id: node for node in Category.objects.filter(restaurant_id=category.restaurant_id)}
+    build_category_tree(nodes.values())
+    node = nodes.get(category.id)
+    return node.tree_children if node else []
@@ -7,10 +7,10 @@ from accounts.permissions import IsOwnerRole,IsCustomerRole,IsOwnerChefOrStaff,I
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from accounts.models import ChefStaff
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from message.broadcast import publish
+from item.snapshots import snapshot_response
+from .tree import category_tree
 
-channel_layer = get_channel_layer()
 
 
 
@@ -37,10 +37,17 @@ class CategoryViewSet(viewsets.ModelViewSet):
         else:
             queryset = Category.objects.none()
 
-        if self.request.query_params.get('hierarchy') == 'true':
+        if self.request.query_params.get('hierarchy') == 'true' and self.action != 'list':
             return queryset.filter(level=0)
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('hierarchy') != 'true':
+            return super().list(request, *args, **kwargs)
+        # Whole tree from one query instead of one per category
+        roots = category_tree(self.filter_queryset(self.get_queryset()))
+        return Response(self.get_serializer(roots, many=True).data)
+
     def perform_create(self, serializer):
         # Use filter().first() to avoid MultipleObjectsReturned error
         restaurant = Restaurant.objects.filter(owner=self.request.user).first()
@@ -72,7 +79,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         instance.delete()
 
         # 🔥 send WebSocket event
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{restaurant_id}",
             {
                 "type": "category_deleted",
@@ -85,7 +92,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         restaurant_id = category.restaurant.id
         data = CategorySerializer(category).data
 
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{restaurant_id}",
             {
                 "type": event_type,
@@ -121,7 +128,7 @@ class SubCategoryViewSet(viewsets.ModelViewSet):
         category = serializer.save(restaurant=restaurant)
 
         # 🔥 send WebSocket event
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{restaurant.id}",
             {
                 "type": "subcategory_created",
@@ -138,7 +145,7 @@ class CustomerCategoryListView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
     pagination_class = None
 
-    def get_queryset(self):
+    def get_restaurant_id(self):
         user = self.request.user
         
         # Allow anonymous access for customer-facing endpoint
@@ -146,12 +153,9 @@ class CustomerCategoryListView(generics.ListAPIView):
         if user.is_anonymous:
             restaurant_id = self.request.query_params.get('restaurant_id')
             if restaurant_id:
-                return Category.objects.filter(restaurant_id=restaurant_id)
+                return restaurant_id
 
-            first_restaurant = Restaurant.objects.first()
-            if first_restaurant:
-                return Category.objects.filter(restaurant=first_restaurant)
-            return Category.objects.none()
+            return Restaurant.objects.values_list('id', flat=True).first()
 
         # Only allow customers
         if user.role != 'customer':
@@ -162,7 +166,26 @@ class CustomerCategoryListView(generics.ListAPIView):
         if not device or not device.restaurant:
             raise PermissionDenied("No restaurant associated with this customer device.")
 
-        return Category.objects.filter(restaurant=device.restaurant)
+        return device.restaurant_id
+
+    def get_queryset(self):
+        restaurant_id = self.get_restaurant_id()
+        if restaurant_id is None:
+            return Category.objects.none()
+        return Category.objects.filter(restaurant_id=restaurant_id)
+
+    def list(self, request, *args, **kwargs):
+        restaurant_id = self.get_restaurant_id()
+        if restaurant_id is None or not str(restaurant_id).isdigit():
+            return super().list(request, *args, **kwargs)
+
+        # Same menu for every guest: serve the pre-rendered snapshot (or a 304)
+        def build():
+            if request.query_params.get('hierarchy') == 'true':
+                roots = category_tree(self.get_queryset())
+                return HierarchicalCategorySerializer(roots, many=True, context=self.get_serializer_context()).data
+            return super(CustomerCategoryListView, self).list(request, *args, **kwargs).data
+        return snapshot_response(request, int(restaurant_id), 'categories', build)
     
 
 
@@ -175,5 +198,8 @@ class ChefOrStaffRestaurantCategoriesView(APIView):
         user = request.user
         restaurant_ids = ChefStaff.objects.filter(user=user).values_list('restaurant_id', flat=True)
         categories = Category.objects.filter(restaurant_id__in=restaurant_ids)
+        if request.query_params.get('hierarchy') == 'true':
+            serializer = HierarchicalCategorySerializer(category_tree(categories), many=True)
+            return Response(serializer.data)
         serializer = CategorySerializer(categories, many=True)
         return Response(serializer.data)
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from item.views import ChefItemViewSet
-from order.views import ChefStaffOrdersAPIView, ChefStaffUpdateOrderStatusAPIView
+from order.views import ChefStaffOrdersAPIView, ChefStaffUpdateOrderStatusAPIView, BulkOrderStatusUpdateAPIView
 from category.views import ChefOrStaffRestaurantCategoriesView
 from device.views import DeviceViewSetall, DeviceViewSet
 
@@ -21,5 +21,6 @@ urlpatterns = [
     path('', include(router.urls)),
     path('orders/', ChefStaffOrdersAPIView.as_view(), name='chef-orders'),
     path('orders/status/<int:pk>/', ChefStaffUpdateOrderStatusAPIView.as_view(), name='chef-update-order-status'),
+    path('orders/status/bulk/', BulkOrderStatusUpdateAPIView.as_view(), name='chef-bulk-update-order-status'),
     path('categories/', ChefOrStaffRestaurantCategoriesView.as_view(), name='my_categories'),
 ]
\ No newline at end of file
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from category.views import CustomerCategoryListView
 from rest_framework.routers import DefaultRouter
-from item.views import CustomerItemViewSet
+from item.views import CustomerItemViewSet, CustomerMenuSnapshotView
 from order.views import OrderCreateAPIView, OrderCancelAPIView,MyOrdersAPIView,MySingleOrderAPIView, CartViewSet
 from review.views import CreateReviewAPIView
 from payment.views import CreateCheckoutSessionView, CreateBulkCheckoutSessionView, PaymentSuccessView, PaymentCancelView, VerifyRazorpayPaymentView, VerifyPaymentView, PaymentWebhookView, PayTabsReturnView
@@ -17,6 +17,7 @@ router.register('cart', CartViewSet, basename='cart')
 urlpatterns = [
     path('', include(router.urls)),
     path('categories/', CustomerCategoryListView.as_view(), name='customer-categories'),
+    path('menu/', CustomerMenuSnapshotView.as_view(), name='customer-menu'),
     path('restaurants/', PublicRestaurantListView.as_view(), name='public-restaurants'),
     path('devices/', PublicDeviceListView.as_view(), name='public-devices'),
     path('devices/<uuid:uuid>/', PublicDeviceByUUIDView.as_view(), name='public-device-by-uuid'),
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from device.models import Device
+from device.qr import is_current, render_pending
+
+
+class Command(BaseCommand):
+    help = ('Renders the QR codes of tables whose code is missing or stale (legacy names, renamed tables, '
+            'renders lost with a restarting worker)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurant', type=int, action='append', help='Only this restaurant id (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the stale codes')
+
+    def handle(self, *args, **options):
+        devices = Device.objects.order_by('pk')
+        if options['restaurant']:
+            devices = devices.filter(restaurant_id__in=options['restaurant'])
+
+        stale = [device for device in devices.iterator(chunk_size=500) if not is_current(device)]
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"✓ {len(stale)} of {devices.count()} tables need a new code"))
+            return
+
+        rendered = render_pending([device.pk for device in stale])
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {len(stale)} tables updated, {rendered} codes rendered ({len(stale) - rendered} reused from storage)"
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0014_device_qr_code_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guestsession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['device'], name='gsession_active_device_idx'),
+        ),
+    ]
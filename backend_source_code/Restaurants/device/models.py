@@ -3,10 +3,8 @@ import uuid as uuid_lib
 from .constants import ACTION_CHOICES,STATUS_CHOICES
 from accounts.models import User
 from restaurant.models import Restaurant
-import qrcode
-from io import BytesIO
-from django.core.files.base import ContentFile
 import urllib.parse
+from .qr import is_current, schedule_qr_codes
 
 # Create your models here.
 
@@ -28,37 +26,15 @@ class Device(models.Model):
         params = {
             "id": self.id,
             "table": self.table_name,
-            "restaurant_id": self.restaurant.id
+            "restaurant_id": self.restaurant_id
         }
         return f"{base_url}/login?{urllib.parse.urlencode(params)}"
 
     def save(self, *args, **kwargs):
-        is_new = self._state.adding
-        super().save(*args, **kwargs)  # Save first to get ID if new
-        
-        if is_new or not self.qr_code_image:
-            self.generate_qr_code()
-
-    def generate_qr_code(self):
-        qr_url = self.table_url
-        
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_url)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        file_name = f"qr_table_{self.id}_{self.uuid}.png"
-        
-        self.qr_code_image.save(file_name, ContentFile(buffer.getvalue()), save=False)
-        super().save(update_fields=['qr_code_image'])
+        super().save(*args, **kwargs)
+        # Rendered in the background after commit; a new table or a renamed one needs a new code
+        if not is_current(self):
+            schedule_qr_codes([self.pk])
 
     def __str__(self):
         return f"{self.table_name}"
@@ -71,6 +47,12 @@ class GuestSession(models.Model):
     expires_at = models.DateTimeField(null=True, blank=True)
     last_seen_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # "Is there an open session on this table?" - only active rows matter
+            models.Index(fields=['device'], name='gsession_active_device_idx', condition=models.Q(is_active=True)),
+        ]
+
     def __str__(self):
         return f"Session {self.id} for {self.device.table_name}"
     
@@ -0,0 +1,108 @@
+"""
+Bulk table provisioning: N devices and their login users in one transaction.
+
+Creating a table one request at a time costs a password hash, a couple of
+username lookups, a QR render and an email each. Here the usernames are
+checked in one query, the hashes run on a thread pool (PBKDF2 releases the
+GIL), users and devices are written with bulk_create, the codes are rendered
+in the background after commit, and the owner gets one email with every
+credential.
+"""
+import random
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.mail import send_mail
+from django.db import transaction
+
+from accounts.models import User
+from message.broadcast import publish
+from .models import Device
+from .qr import schedule_qr_codes
+
+MAX_TABLES = 200
+HASH_WORKERS = 8
+
+
+def generate_username(restaurant_name):
+    number = random.randint(1000, 9999)
+    return f"{restaurant_name.replace(' ', '').lower()}{number}"
+
+
+def generate_password(length=10):
+    characters = string.ascii_letters + string.digits
+    return ''.join(random.choice(characters) for _ in range(length))
+
+
+def device_email(username):
+    return f"{username}@example.com"
+
+
+def unique_usernames(restaurant_name, count, attempts=5):
+    """`count` fresh device usernames, checked against existing emails in one query per attempt."""
+    usernames = set()
+    for _ in range(attempts):
+        candidates = {generate_username(restaurant_name) for _ in range(count - len(usernames))} - usernames
+        taken = set(User.objects.filter(email__in=[device_email(name) for name in candidates])
+                    .values_list('email', flat=True))
+        usernames |= {name for name in candidates if device_email(name) not in taken}
+        if len(usernames) == count:
+            return sorted(usernames)
+    raise ValueError("Failed to generate unique device credentials. Please try again.")
+
+
+def _hash_all(passwords):
+    with ThreadPoolExecutor(max_workers=min(HASH_WORKERS, len(passwords))) as pool:
+        return list(pool.map(make_password, passwords))
+
+
+def table_names(prefix, start, count):
+    return [f"{prefix} {number}" for number in range(start, start + count)]
+
+
+def provision_tables(restaurant, count, prefix='Table', start=1, region='Primary'):
+    """
+    Creates tables "<prefix> <start>" .. "<prefix> <start + count - 1>", each
+    with a customer user. Returns (devices, credentials), credentials being
+    {"table_name", "username", "password"} dicts for the owner.
+    """
+    names = table_names(prefix, start, count)
+    usernames = unique_usernames(restaurant.resturent_name, count)
+    passwords = [generate_password() for _ in names]
+    hashes = _hash_all(passwords)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(email=device_email(username), username=username, password=hashed, role='customer')
+            for username, hashed in zip(usernames, hashes)
+        ])
+        devices = Device.objects.bulk_create([
+            Device(table_name=name, table_number=str(number), region=region, restaurant=restaurant, user=user)
+            for number, (name, user) in enumerate(zip(names, users), start=start)
+        ])
+        schedule_qr_codes([device.pk for device in devices])
+
+        # One event for the whole floor instead of one per table
+        publish(f"restaurant_{restaurant.id}", {
+            "type": "devices_created",
+            "device_ids": [device.pk for device in devices],
+        })
+
+    credentials = [
+        {"table_name": device.table_name, "username": device.user.username, "password": password}
+        for device, password in zip(devices, passwords)
+    ]
+    return devices, credentials
+
+
+def email_credentials(restaurant, credentials, recipient):
+    lines = [f"{c['table_name']}: username {c['username']}, password {c['password']}" for c in credentials]
+    send_mail(
+        subject=f"{len(credentials)} Device Users Created",
+        message=f"New tables for {restaurant.resturent_name}:\n\n" + "\n".join(lines),
+        from_email=settings.EMAIL_HOST_USER,
+        recipient_list=[recipient],
+        fail_silently=False,
+    )
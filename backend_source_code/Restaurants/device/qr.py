@@ -0,0 +1,234 @@
+"""
+Table QR codes.
+
+A code is named after a hash of what it encodes (the table URL and the
+render settings): "media/qr_codes/qr.<sha16>.png". A device whose file
+already has the name of its current URL is up to date, and a code that
+already exists in storage is never rendered twice. Content-hashed names are
+served as immutable by RESTAURANTS/media_views.py.
+
+Rendering happens off the request path: `schedule_qr_codes(ids)` runs after
+the transaction commits, either on a background worker thread ("thread"
+mode) or right in the commit callback ("inline", used by tests). Codes lost
+with a restarting worker are picked up by `manage.py render_qr_codes`.
+
+`qr_sheet(devices, kind)` lays the codes out on printable A4 pages (PDF) or
+one PNG grid.
+"""
+import hashlib
+import logging
+import math
+import queue
+import threading
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MODE': 'thread',  # "thread" or "inline"
+    'BATCH_SIZE': 100,
+    'BOX_SIZE': 10,
+    'BORDER': 4,
+    'SHEET_DPI': 150,
+    'SHEET_COLUMNS': 3,
+    'SHEET_ROWS': 4,
+}
+
+UPLOAD_DIR = 'media/qr_codes/'
+A4_INCHES = (8.27, 11.69)
+SHEET_KINDS = {'pdf': 'application/pdf', 'png': 'image/png'}
+
+
+def _config(name):
+    return getattr(settings, 'QR_CODES', {}).get(name, DEFAULTS[name])
+
+
+def qr_name(url):
+    payload = f"{_config('BOX_SIZE')}:{_config('BORDER')}:{url}"
+    return f"{UPLOAD_DIR}qr.{hashlib.sha256(payload.encode()).hexdigest()[:16]}.png"
+
+
+def render_qr(url):
+    """PNG bytes of the code for `url`."""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=_config('BOX_SIZE'),
+        border=_config('BORDER'),
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+    buffer = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def is_current(device):
+    return device.qr_code_image.name == qr_name(device.table_url)
+
+
+def ensure_qr_codes(devices, storage=default_storage):
+    """
+    Points every device at the code of its current URL, rendering only the
+    codes missing from storage, and removes the files nothing uses anymore.
+    One UPDATE for the batch; returns how many codes were rendered.
+    """
+    from .models import Device
+
+    stale, obsolete, rendered = [], set(), 0
+    for device in devices:
+        name = qr_name(device.table_url)
+        if device.qr_code_image.name == name:
+            continue
+        if not storage.exists(name):
+            name = storage.save(name, ContentFile(render_qr(device.table_url)))
+            rendered += 1
+        if device.qr_code_image.name:
+            obsolete.add(device.qr_code_image.name)
+        device.qr_code_image.name = name
+        stale.append(device)
+    if not stale:
+        return 0
+
+    Device.objects.bulk_update(stale, ['qr_code_image'], batch_size=_config('BATCH_SIZE'))
+    obsolete -= set(Device.objects.filter(qr_code_image__in=obsolete).values_list('qr_code_image', flat=True))
+    for name in obsolete:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning('Could not delete QR code %s', name, exc_info=True)
+    return rendered
+
+
+def render_pending(device_ids):
+    from .models import Device
+
+    device_ids = list(device_ids)
+    batch_size = _config('BATCH_SIZE')
+    rendered = 0
+    for offset in range(0, len(device_ids), batch_size):
+        devices = Device.objects.filter(pk__in=device_ids[offset:offset + batch_size]).order_by('pk')
+        rendered += ensure_qr_codes(devices)
+    return rendered
+
+
+class _Renderer(threading.Thread):
+    """Renders queued device ids in batches, one at a time."""
+
+    def __init__(self):
+        super().__init__(name='qr-renderer', daemon=True)
+        self.queue = queue.Queue()
+
+    def run(self):
+        while True:
+            ids = set(self.queue.get())
+            pending = 1
+            while True:
+                try:
+                    ids.update(self.queue.get_nowait())
+                    pending += 1
+                except queue.Empty:
+                    break
+            try:
+                render_pending(sorted(ids))
+            except Exception:
+                logger.exception('QR rendering failed for devices %s', sorted(ids))
+            finally:
+                close_old_connections()
+                for _ in range(pending):
+                    self.queue.task_done()
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def _submit(device_ids):
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None or not _renderer.is_alive():
+            _renderer = _Renderer()
+            _renderer.start()
+    _renderer.queue.put(device_ids)
+
+
+def schedule_qr_codes(device_ids):
+    """Render the codes of `device_ids` once the surrounding transaction commits."""
+    device_ids = list(device_ids)
+    if not device_ids:
+        return
+
+    def run():
+        if _config('MODE') == 'inline':
+            render_pending(device_ids)
+        else:
+            _submit(device_ids)
+
+    transaction.on_commit(run)
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, OSError):
+        # Pillow built without FreeType: fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def _draw_cell(page, device, code, box):
+    left, top, width, height = box
+    label_height = height // 8
+    side = min(width, height - label_height)
+    code = code.convert('L').resize((side, side), Image.NEAREST)
+    page.paste(code, (left + (width - side) // 2, top))
+
+    draw = ImageDraw.Draw(page)
+    font = _font(label_height // 2)
+    text_width = draw.textlength(device.table_name, font=font)
+    draw.text((left + (width - text_width) / 2, top + side + label_height // 4), device.table_name, fill=0, font=font)
+
+
+def qr_sheet(devices, kind='pdf', storage=default_storage):
+    """
+    Printable sheet of the devices' codes: A4 pages of SHEET_COLUMNS x
+    SHEET_ROWS labelled codes as one PDF, or every code on one PNG grid.
+    Codes that are missing or stale are rendered first.
+    """
+    devices = list(devices)
+    ensure_qr_codes(devices, storage)
+
+    dpi = _config('SHEET_DPI')
+    columns, rows = _config('SHEET_COLUMNS'), _config('SHEET_ROWS')
+    page_width, page_height = (round(inches * dpi) for inches in A4_INCHES)
+    margin = dpi // 2
+    cell_width = (page_width - 2 * margin) // columns
+    cell_height = (page_height - 2 * margin) // rows
+    per_page = columns * rows if kind == 'pdf' else max(len(devices), 1)
+    if kind == 'png':
+        page_height = 2 * margin + cell_height * math.ceil(per_page / columns)
+
+    pages = []
+    for start in range(0, max(len(devices), 1), per_page):
+        page = Image.new('L', (page_width, page_height), 255)
+        for n, device in enumerate(devices[start:start + per_page]):
+            with storage.open(device.qr_code_image.name, 'rb') as f:
+                code = Image.open(f)
+                code.load()
+            row, column = divmod(n, columns)
+            box = (margin + column * cell_width, margin + row * cell_height, cell_width, cell_height)
+            _draw_cell(page, device, code, box)
+        pages.append(page)
+
+    buffer = BytesIO()
+    if kind == 'pdf':
+        pages[0].save(buffer, format='PDF', resolution=dpi, save_all=True, append_images=pages[1:])
+    else:
+        pages[0].save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Device, Reservation
+from .provisioning import MAX_TABLES, table_names
 
 
 class DeviceSerializer(serializers.ModelSerializer):
@@ -24,6 +25,22 @@ class DeviceSerializer(serializers.ModelSerializer):
 
 
 
+class BulkProvisionSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=MAX_TABLES)
+    prefix = serializers.CharField(max_length=30, default='Table')
+    start = serializers.IntegerField(min_value=0, default=1)
+    region = serializers.CharField(max_length=50, default='Primary', allow_blank=True)
+
+    def validate(self, attrs):
+        names = table_names(attrs['prefix'], attrs['start'], attrs['count'])
+        taken = list(Device.objects.filter(restaurant=self.context['restaurant'], table_name__in=names)
+                     .order_by('id').values_list('table_name', flat=True))
+        if taken:
+            raise serializers.ValidationError({"start": [f"These tables already exist: {', '.join(taken)}."]})
+        return attrs
+
+
+
 
 class ReservationSerializer(serializers.ModelSerializer):
     device_name = serializers.CharField(source='device.table_name', read_only=True)
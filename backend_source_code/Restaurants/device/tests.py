@@ -1,3 +1,124 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from restaurant.models import Restaurant
+from .models import Device
+from .qr import qr_name
+
+
+# Fast hasher: provisioning hashes a password per table
+@override_settings(QR_CODES={'MODE': 'inline'}, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TableProvisioningTests(TestCase):
+    provision_url = reverse('device-bulk-provision')
+    sheet_url = reverse('device-qr-sheet')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = mock.patch('message.broadcast.get_channel_layer',
+                             return_value=mock.Mock(group_send=mock.AsyncMock()))
+        self.layer = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def provision(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.provision_url, {'count': 3, **data}, format='json')
+
+    def test_bulk_provision_creates_tables_users_and_codes(self):
+        response = self.provision(count=12, prefix='Patio', start=5)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 12)
+        devices = list(Device.objects.filter(restaurant=self.restaurant).order_by('id'))
+        self.assertEqual([d.table_name for d in devices], [f'Patio {n}' for n in range(5, 17)])
+        self.assertEqual(devices[0].table_number, '5')
+        for device in devices:
+            self.assertEqual(device.qr_code_image.name, qr_name(device.table_url))
+            self.assertTrue(default_storage.exists(device.qr_code_image.name))
+
+        first = response.data['devices'][0]
+        user = User.objects.get(username=first['username'])
+        self.assertEqual(user.role, 'customer')
+        self.assertTrue(user.check_password(first['password']))
+        # One email with every credential instead of one per table
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(first['password'], mail.outbox[0].body)
+
+        events = [call.args[1] for call in self.layer.group_send.call_args_list]
+        self.assertEqual([e['type'] for e in events], ['devices_created'])
+        self.assertEqual(events[0]['device_ids'], [d.id for d in devices])
+
+    def test_existing_table_names_are_rejected(self):
+        self.provision(count=2)
+        response = self.provision(count=3, start=2)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Table 2', str(response.data['start']))
+        self.assertEqual(Device.objects.count(), 2)
+
+    def test_codes_are_cached_by_content(self):
+        self.provision(count=1)
+        device = Device.objects.get()
+        with mock.patch('device.qr.render_qr') as render, self.captureOnCommitCallbacks(execute=True):
+            device.action = 'hold'
+            device.save()
+        render.assert_not_called()
+
+        old = device.qr_code_image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            device.table_name = 'Window'
+            device.save()
+        device.refresh_from_db()
+        self.assertNotEqual(device.qr_code_image.name, old)
+        self.assertFalse(default_storage.exists(old))
+
+    def test_printable_sheet(self):
+        self.provision(count=13)
+
+        response = self.client.get(self.sheet_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertEqual(response.content.count(b'/Type /Page\n'), 2)  # 12 codes per page
+
+        ids = ','.join(str(pk) for pk in Device.objects.order_by('id').values_list('id', flat=True)[:4])
+        response = self.client.get(self.sheet_url, {'type': 'png', 'ids': ids})
+        self.assertEqual(response['Content-Type'], 'image/png')
+        sheet = Image.open(BytesIO(response.content))
+        self.assertGreater(sheet.height, 0)
+
+        self.assertEqual(self.client.get(self.sheet_url, {'type': 'svg'}).status_code, 400)
+
+    def test_command_renders_stale_codes(self):
+        self.provision(count=2)
+        Device.objects.update(qr_code_image='media/qr_codes/qr_table_legacy.png')
+
+        out = StringIO()
+        call_command('render_qr_codes', stdout=out)
+        self.assertIn('2 tables updated, 0 codes rendered', out.getvalue())
+        self.assertTrue(all(device.qr_code_image.name == qr_name(device.table_url)
+                            for device in Device.objects.all()))
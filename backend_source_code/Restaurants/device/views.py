@@ -1,13 +1,15 @@
-import random
-import string
 from rest_framework import viewsets, permissions,filters
 from rest_framework.response import Response
 from rest_framework import status
 from django.core.mail import send_mail
 from django.conf import settings
+from django.http import HttpResponse
+from django.urls import reverse
 from rest_framework import serializers
 from .models import Device,Reservation
-from .serializers import DeviceSerializer,ReservationSerializer,ReservationStatusUpdateSerializer
+from .serializers import BulkProvisionSerializer,DeviceSerializer,ReservationSerializer,ReservationStatusUpdateSerializer
+from .provisioning import email_credentials, generate_password, generate_username, provision_tables
+from .qr import SHEET_KINDS, qr_sheet
 from accounts.models import User
 from restaurant.models import Restaurant
 from .paginations import DevicePagination,ReservationPagination
@@ -21,12 +23,11 @@ from django.utils.dateparse import parse_date
 from django_filters.rest_framework import DjangoFilterBackend
 from datetime import timedelta
 from django.utils.timezone import now
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from django.db import transaction
+from message.broadcast import publish
 import uuid
 from .models import Device, Reservation, GuestSession
 
-channel_layer = get_channel_layer()
 
 class ResolveTableView(APIView):
     permission_classes = [AllowAny]
@@ -94,7 +95,7 @@ class ResolveTableView(APIView):
         )
 
         # Broadcast New Session Started (Optional, for Dashboard)
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{device.restaurant.id}",
             {
                 "type": "session_started",
@@ -154,12 +155,17 @@ class CloseTableSessionView(APIView):
         # Prompt says: "Any active orders must be completed or cancelled."
         
         from order.models import Order
+        from order.rollups import retract_sales
         unpaid_orders = Order.objects.filter(guest_session=session, payment_status__in=['unpaid', 'pending', 'pending_cash'])
         # We'll cancel them to be safe/clean
-        unpaid_orders.update(status='cancelled', payment_status='cancelled')
+        with transaction.atomic():
+            # Orders already counted as sales come back out of the dashboards' rollups
+            retract_sales(unpaid_orders)
+            # updated_time is auto_now, which .update() skips; delta sync relies on it
+            unpaid_orders.update(status='cancelled', payment_status='cancelled', updated_time=now())
         
         # 4. Notify Dashboard & Customer
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{restaurant.id}",
             {
                 "type": "session_closed", 
@@ -169,7 +175,7 @@ class CloseTableSessionView(APIView):
         )
         
         # Notify Customer Device to reset
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"session_{session.id}",
             {
                 "type": "session_closed",
@@ -179,13 +185,6 @@ class CloseTableSessionView(APIView):
         
         return Response({'message': 'Session closed successfully'})
 
-def generate_username(restaurant_name):
-    number = random.randint(1000, 9999)
-    return f"{restaurant_name.replace(' ', '').lower()}{number}"
-
-def generate_password(length=10):
-    characters = string.ascii_letters + string.digits
-    return ''.join(random.choice(characters) for _ in range(length))
 
 
 
@@ -227,7 +226,7 @@ class DeviceViewSet(viewsets.ModelViewSet):
         print("DEBUG_DEVICES: No access found. Returning empty.")
         return Device.objects.none()
 
-    def perform_create(self, serializer):
+    def get_restaurant(self):
         user = self.request.user
         
         restaurant = None
@@ -249,6 +248,18 @@ class DeviceViewSet(viewsets.ModelViewSet):
             
             if not restaurant:
                 raise serializers.ValidationError("You are not associated with any accepted restaurant.")
+        return restaurant
+
+    def owner_email(self, restaurant):
+        user = self.request.user
+        if user.role == 'owner':
+             return user.email
+        elif restaurant.owner:
+             return restaurant.owner.email
+        return "admin@cleverbiz.ai"
+
+    def perform_create(self, serializer):
+        restaurant = self.get_restaurant()
 
         # Generate unique username
         username = None
@@ -276,23 +287,16 @@ class DeviceViewSet(viewsets.ModelViewSet):
         device = serializer.save(user=device_user, restaurant=restaurant)
 
         # Notify owner if possible, or log it
-        if user.role == 'owner':
-             owner_email = user.email
-        elif restaurant.owner:
-             owner_email = restaurant.owner.email
-        else:
-             owner_email = "admin@cleverbiz.ai"
-
         send_mail(
             subject="New Device User Created",
             message=f"Username: {username}\nPassword: {password}",
             from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[owner_email],
+            recipient_list=[self.owner_email(restaurant)],
             fail_silently=False
         )
 
         data = DeviceSerializer(device).data
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{restaurant.id}",
             {
                 "type": "device_created",
@@ -306,7 +310,7 @@ class DeviceViewSet(viewsets.ModelViewSet):
 
         # 🔥 WebSocket Broadcast - device updated
         data = DeviceSerializer(device).data
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{restaurant.id}",
             {
                 "type": "device_updated",
@@ -327,7 +331,7 @@ class DeviceViewSet(viewsets.ModelViewSet):
             device_user.delete()
 
         # 🔥 WebSocket Broadcast - device deleted
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{restaurant.id}",
             {
                 "type": "device_deleted",
@@ -335,6 +339,53 @@ class DeviceViewSet(viewsets.ModelViewSet):
             }
         )
 
+    @action(detail=False, methods=['post'], url_path='bulk-provision')
+    def bulk_provision(self, request):
+        """
+        Sets up a floor in one request: {"count": 60, "prefix": "Table", "start": 1}.
+        QR codes are rendered in the background; `sheet_url` prints them all.
+        """
+        restaurant = self.get_restaurant()
+        serializer = BulkProvisionSerializer(data=request.data, context={'restaurant': restaurant})
+        serializer.is_valid(raise_exception=True)
+        try:
+            devices, credentials = provision_tables(restaurant, **serializer.validated_data)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+        email_credentials(restaurant, credentials, self.owner_email(restaurant))
+
+        ids = ','.join(str(device.pk) for device in devices)
+        sheet_url = request.build_absolute_uri(reverse(f'{self.basename}-qr-sheet')) + f'?ids={ids}'
+        return Response({
+            "created": len(devices),
+            "devices": [
+                {"id": device.pk, **entry} for device, entry in zip(devices, credentials)
+            ],
+            "sheet_url": sheet_url,
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='qr-sheet', url_name='qr-sheet')
+    def print_qr_sheet(self, request):
+        """Printable QR codes: ?type=pdf (A4 pages, default) or png (one grid); ?ids=1,2,3 to pick tables."""
+        kind = request.query_params.get('type', 'pdf')
+        if kind not in SHEET_KINDS:
+            return Response({"type": f"Choose one of: {', '.join(SHEET_KINDS)}."}, status=400)
+
+        devices = self.get_queryset().order_by('id')
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                devices = devices.filter(pk__in=[int(pk) for pk in ids.split(',')])
+            except ValueError:
+                return Response({"ids": "Comma separated device ids expected."}, status=400)
+        if not devices.exists():
+            return Response({"error": "No tables to print."}, status=404)
+
+        response = HttpResponse(qr_sheet(devices, kind), content_type=SHEET_KINDS[kind])
+        response['Content-Disposition'] = f'attachment; filename="table-qr-codes.{kind}"'
+        return response
+
     @action(detail=False, methods=['get'], url_path='stats')
     def get_device_stats(self, request):
         user = request.user
@@ -394,7 +445,7 @@ class CreateReservationAPIView(APIView):
         if serializer.is_valid():
             reservation =serializer.save()
             data = ReservationSerializer(reservation).data
-            async_to_sync(channel_layer.group_send)(
+            publish(
                 f"restaurant_{device.restaurant.id}",
                 {
                     "type": "reservation_created",
@@ -463,7 +514,7 @@ class ReservationViewSet(viewsets.ModelViewSet):
         reservation = serializer.save()
 
         data = ReservationSerializer(reservation).data
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{reservation.restaurant.id}",
             {
                 "type": "reservation_updated",
@@ -0,0 +1,42 @@
+"""
+Item events for the `restaurant_<id>` group.
+
+Every guest device and dashboard of the restaurant receives these, so they
+are kept small: an update carries only the fields whose serialized value
+changed, a delete only the id. Every event also carries the menu `version`
+its change produced:
+
+    {"type": "item_updated", "item_id": 7, "changes": {"price": "12.50"}, "version": 42}
+
+A client applies an event whose version is at most one above the last one it
+saw; a bigger jump means it missed something, and it refetches
+/customer/menu/ (whose body carries the version to continue from).
+"""
+from .serializers import ItemSerializer
+from .snapshots import publish_menu_event
+
+
+def item_state(item):
+    """The item as clients see it; taken before an update to diff against."""
+    return ItemSerializer(item).data
+
+
+def changed_fields(before, after):
+    return {name: value for name, value in after.items() if before.get(name) != value}
+
+
+def item_created(item):
+    publish_menu_event(item.restaurant_id, {"type": "item_created", "item": item_state(item)})
+
+
+def item_updated(item, before):
+    # Sent even when nothing visible changed: the save still moved the version
+    publish_menu_event(item.restaurant_id, {
+        "type": "item_updated",
+        "item_id": item.id,
+        "changes": changed_fields(before, item_state(item)),
+    })
+
+
+def item_deleted(restaurant_id, item_id):
+    publish_menu_event(restaurant_id, {"type": "item_deleted", "item_id": item_id})
@@ -7,8 +7,11 @@ from .models import Item
 class ItemFilter(django_filters.FilterSet):
     category = django_filters.NumberFilter(field_name="category__id")
     sub_category = django_filters.NumberFilter(field_name="sub_category__id")
+    # Discounted price, as the guest pays it
+    min_price = django_filters.NumberFilter(field_name="effective_price", lookup_expr='gte')
+    max_price = django_filters.NumberFilter(field_name="effective_price", lookup_expr='lte')
 
     class Meta:
         model = Item
-        fields = ['category', 'sub_category']
+        fields = ['category', 'sub_category', 'min_price', 'max_price']
 
@@ -0,0 +1,50 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from item.snapshots import invalidate_menu
+from RESTAURANTS.images import IMAGE_FIELDS, refresh_derivatives, stale_fields
+
+
+class Command(BaseCommand):
+    help = 'Builds the resized WebP/JPEG derivatives of images uploaded before they existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(IMAGE_FIELDS), action='append',
+                            help='Only this model (repeatable); default is every model with images')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild derivatives that already look up to date')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the images that would be processed')
+
+    def handle(self, *args, **options):
+        labels = options['model'] or sorted(IMAGE_FIELDS)
+        total = 0
+        for label in labels:
+            model = apps.get_model(label)
+            fields = IMAGE_FIELDS[label]
+            has_image = Q()
+            for field in fields:
+                has_image |= Q(**{f'{field}__gt': ''})
+            # An emptied field can leave derivatives behind, so those rows are checked too
+            queryset = model.objects.filter(has_image | ~Q(image_derivatives={})).order_by('pk')
+
+            processed = 0
+            restaurants = set()
+            for instance in queryset.iterator(chunk_size=200):
+                if options['dry_run']:
+                    processed += bool(options['force'] or stale_fields(instance, fields))
+                    continue
+                if refresh_derivatives(instance, fields, force=options['force']):
+                    processed += 1
+                    restaurant_id = getattr(instance, 'restaurant_id', None)
+                    if restaurant_id:
+                        restaurants.add(restaurant_id)
+
+            for restaurant_id in restaurants:
+                invalidate_menu(restaurant_id)
+            verb = 'Would process' if options['dry_run'] else 'Processed'
+            self.stdout.write(f"{verb} {processed} {model._meta.verbose_name_plural}")
+            total += processed
+
+        self.stdout.write(self.style.SUCCESS(f"✓ {total} records up to date"))
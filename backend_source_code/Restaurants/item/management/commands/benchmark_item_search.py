@@ -0,0 +1,118 @@
+import random
+import time
+from decimal import Decimal
+from functools import reduce
+from operator import and_
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from accounts.models import User
+from category.models import Category
+from item.models import Item
+from item.search import backend, index_items, search_items, search_terms
+from restaurant.models import Restaurant
+
+WORDS = [
+    'chicken', 'beef', 'lamb', 'paneer', 'tofu', 'prawn', 'salmon', 'falafel', 'halloumi', 'mushroom',
+    'spicy', 'grilled', 'crispy', 'smoked', 'garlic', 'lemon', 'honey', 'truffle', 'masala', 'teriyaki',
+    'burger', 'wrap', 'salad', 'bowl', 'pizza', 'pasta', 'curry', 'soup', 'taco', 'skewer',
+]
+CATEGORIES = ['Starters', 'Mains', 'Grills', 'Burgers', 'Salads', 'Desserts', 'Drinks', 'Specials', 'Kids', 'Sides']
+
+
+def icontains_search(queryset, text):
+    """What SearchFilter over item_name and category__Category_name does."""
+    conditions = [
+        Q(item_name__icontains=term) | Q(category__Category_name__icontains=term)
+        for term in search_terms(text)
+    ]
+    return queryset.filter(reduce(and_, conditions))
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks full-text item search against the icontains SearchFilter on a seeded catalog (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=50_000, help='Items to seed')
+        parser.add_argument('--queries', default='chick,spicy bur,tru,grilled salmon bowl,zzz',
+                            help='Comma separated search strings')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement (best is kept)')
+        parser.add_argument('--page-size', type=int, default=10)
+
+    def handle(self, *args, **options):
+        kind = backend()
+        if kind is None:
+            self.stdout.write(self.style.WARNING(f"No full-text backend on {connection.vendor}; nothing to compare"))
+            return
+
+        with transaction.atomic():
+            restaurant = self.seed(options['items'])
+            self.compare(restaurant, kind, options)
+            # Never keep the benchmark data
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        self.stdout.write(f"Seeding {count} items...")
+        started = time.perf_counter()
+        rng = random.Random(42)
+
+        owner = User.objects.create_user(
+            email='bench-owner@example.invalid', username='bench-owner', password=None, role='owner'
+        )
+        restaurant = Restaurant.objects.create(
+            resturent_name='Search Benchmark', location='-', phone_number='+000000001', owner=owner
+        )
+        categories = [Category.objects.create(restaurant=restaurant, Category_name=name) for name in CATEGORIES]
+
+        batch = []
+        for n in range(count):
+            category = categories[n % len(categories)]
+            name = ' '.join(rng.sample(WORDS, 3)).title()
+            batch.append(Item(
+                item_name=name, price=Decimal('10.00'), description='', slug=f'bench-{n}',
+                category=category, restaurant=restaurant,
+                # bulk_create skips save(), so fill the document here
+                search_document=f'{name} {category.Category_name}',
+            ))
+            if len(batch) == 5000:
+                index_items(Item.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            index_items(Item.objects.bulk_create(batch))
+
+        self.stdout.write(f"  seeded in {time.perf_counter() - started:.1f}s")
+        return restaurant
+
+    def compare(self, restaurant, kind, options):
+        queryset = Item.objects.filter(restaurant=restaurant)
+        page_size = options['page_size']
+        repeat = options['repeat']
+
+        def best_of(run):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+            return min(timings) * 1000
+
+        self.stdout.write(f"{'query':<22} {'matches':>8} {'icontains (ms)':>15} {kind + ' (ms)':>12} {'speedup':>8}")
+        for text in [q.strip() for q in options['queries'].split(',') if q.strip()]:
+            # One page plus the count, like the paginated list endpoints
+            def old():
+                results = icontains_search(queryset, text).order_by('-created_time')
+                results.count()
+                list(results[:page_size])
+
+            def new():
+                results = search_items(queryset, text).order_by('-search_rank', 'id')
+                results.count()
+                list(results[:page_size])
+
+            matches = search_items(queryset, text).count()
+            old_ms, new_ms = best_of(old), best_of(new)
+            self.stdout.write(f"{text:<22} {matches:>8} {old_ms:>15.2f} {new_ms:>12.2f} {old_ms / new_ms:>7.1f}x")
+
+        self.stdout.write(self.style.SUCCESS("✓ Benchmark finished (seed data rolled back)"))
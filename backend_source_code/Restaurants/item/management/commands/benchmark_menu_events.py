@@ -0,0 +1,111 @@
+import asyncio
+import json
+import time
+from decimal import Decimal
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+from category.models import Category
+from item.events import changed_fields, item_state
+from item.models import Item
+from item.serializers import ItemSerializer
+from restaurant.models import Restaurant
+
+
+class Command(BaseCommand):
+    help = ('Compares full-item and delta menu events: bytes per event and serialization time when fanned '
+            'out to N connected devices (seed data rolled back afterwards)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=500, help='Sockets in the restaurant group')
+        parser.add_argument('--events', type=int, default=50, help='Price updates to send')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            item = self.seed()
+            results = {
+                'full item': self.measure(item, options, delta=False),
+                'delta': self.measure(item, options, delta=True),
+            }
+            # Never keep the benchmark data
+            transaction.set_rollback(True)
+
+        devices = options['devices']
+        self.stdout.write(f"{options['events']} price updates to {devices} devices")
+        self.stdout.write(f"{'format':<10} {'bytes/event':>12} {'MB total':>9} {'build (ms)':>11} "
+                          f"{'fan-out (ms)':>13} {'encode/device (us)':>19}")
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<10} {r['bytes']:>12} {r['bytes'] * devices * options['events'] / 1e6:>9.2f} "
+                f"{r['build_ms']:>11.3f} {r['fanout_ms']:>13.1f} {r['encode_us']:>19.2f}"
+            )
+        full, delta = results['full item'], results['delta']
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Delta events are {full['bytes'] / delta['bytes']:.1f}x smaller and "
+            f"{full['encode_us'] / delta['encode_us']:.1f}x cheaper to encode per device (seed data rolled back)"
+        ))
+
+    def seed(self):
+        owner = User.objects.create_user(
+            email='bench-owner@example.invalid', username='bench-owner', password=None, role='owner'
+        )
+        restaurant = Restaurant.objects.create(
+            resturent_name='Event Benchmark Restaurant', location='-', phone_number='+000000002', owner=owner
+        )
+        category = Category.objects.create(restaurant=restaurant, Category_name='Signature Mains')
+        return Item.objects.create(
+            item_name='Slow Roasted Lamb Shoulder', price=Decimal('120.00'), category=category, restaurant=restaurant,
+            description='Twelve hour roasted lamb shoulder with pomegranate molasses, charred aubergine, '
+                        'toasted pine nuts, mint yoghurt and warm flatbread. Serves two to three guests.',
+            image1='media/item_images/slow-roasted-lamb-shoulder-with-pomegranate.jpg',
+            video='media/item_videos/slow-roasted-lamb-shoulder.mp4',
+        )
+
+    def build_events(self, item, count, delta):
+        """The events the views would publish for `count` price changes, and the time it took."""
+        built = []
+        started = time.perf_counter()
+        for n in range(count):
+            before = item_state(item) if delta else None
+            item.price = Decimal('120.00') + n + 1
+            if delta:
+                built.append({"type": "item_updated", "item_id": item.id,
+                              "changes": changed_fields(before, item_state(item)), "version": n + 1})
+            else:
+                built.append({"type": "item_updated", "item": ItemSerializer(item).data})
+        return built, (time.perf_counter() - started) * 1000 / count
+
+    def measure(self, item, options, delta):
+        events, build_ms = self.build_events(item, options['events'], delta)
+        devices = options['devices']
+
+        async def fan_out():
+            layer = InMemoryChannelLayer(capacity=options['events'] + 1)
+            channels = [await layer.new_channel() for _ in range(devices)]
+            for channel in channels:
+                await layer.group_add('restaurant_bench', channel)
+
+            encode = 0.0
+            sent = 0
+            started = time.perf_counter()
+            for event in events:
+                await layer.group_send('restaurant_bench', event)
+                for channel in channels:
+                    message = await layer.receive(channel)
+                    # What every consumer does before writing to its socket
+                    encode_started = time.perf_counter()
+                    sent += len(json.dumps(message))
+                    encode += time.perf_counter() - encode_started
+            return (time.perf_counter() - started) * 1000, encode, sent
+
+        fanout_ms, encode_s, sent = asyncio.run(fan_out())
+        deliveries = devices * len(events)
+        return {
+            'bytes': round(sent / deliveries),
+            'build_ms': build_ms,
+            'fanout_ms': fanout_ms,
+            'encode_us': encode_s * 1e6 / deliveries,
+        }
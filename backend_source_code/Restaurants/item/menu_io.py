@@ -0,0 +1,231 @@
+"""
+Bulk menu import/export.
+
+A menu travels as flat rows, one per item, in CSV or JSON:
+
+    category, subcategory, item_name, description, price,
+    discount_percentage, availability
+
+A row with an empty item_name only declares its category/subcategory, so
+categories without items survive an export/import round trip.
+
+Importing upserts by name: categories by (parent, name), items by
+(category, item_name). Everything is written in one transaction with a
+handful of bulk queries, which skip the Item/Category save signals, so the
+search index and the menu version are updated here explicitly and a single
+`menu_replaced` event replaces the per-item broadcasts.
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework import serializers
+
+from category.models import Category
+from .models import Item
+from .pricing import refresh_effective_price
+from .search import index_items, search_document
+from .snapshots import invalidate_menu, publish_menu_event
+
+COLUMNS = ['category', 'subcategory', 'item_name', 'description', 'price', 'discount_percentage', 'availability']
+ITEM_FIELDS = ['description', 'price', 'discount_percentage', 'effective_price', 'availability', 'sub_category']
+MAX_ROWS = 5000
+BATCH_SIZE = 500
+
+
+class MenuRowSerializer(serializers.Serializer):
+    category = serializers.CharField(max_length=100)
+    subcategory = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    item_name = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True, default=None)
+    discount_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=100,
+                                                   required=False, default=Decimal('0.00'))
+    availability = serializers.BooleanField(required=False, default=True)
+
+    def to_internal_value(self, data):
+        # CSV cells are always strings; empty optional cells mean "use the default"
+        data = {key: value for key, value in data.items() if key in COLUMNS and value not in ('', None)}
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        if attrs['item_name'] and attrs['price'] is None:
+            raise serializers.ValidationError({'price': 'This field is required for an item.'})
+        return attrs
+
+
+def parse_rows(upload=None, data=None):
+    """Rows from an uploaded .csv/.json file or an already parsed JSON body."""
+    if upload is not None:
+        content = upload.read().decode('utf-8-sig')
+        if upload.name.lower().endswith('.csv') or 'csv' in (upload.content_type or ''):
+            return list(csv.DictReader(io.StringIO(content)))
+        try:
+            data = json.loads(content)
+        except ValueError:
+            raise serializers.ValidationError({'file': 'Expected a CSV or JSON file.'})
+    if isinstance(data, dict):
+        data = data.get('rows')
+    if not isinstance(data, list):
+        raise serializers.ValidationError({'rows': 'Expected a list of menu rows.'})
+    return data
+
+
+def validate_rows(rows):
+    """Validated rows, or ValidationError listing the bad rows by their 1-based number."""
+    if len(rows) > MAX_ROWS:
+        raise serializers.ValidationError({'rows': f'At most {MAX_ROWS} rows per import.'})
+    valid, errors = [], {}
+    for number, row in enumerate(rows, start=1):
+        serializer = MenuRowSerializer(data=row if isinstance(row, dict) else {})
+        if serializer.is_valid():
+            valid.append({key: value.strip() if isinstance(value, str) else value
+                          for key, value in serializer.validated_data.items()})
+        else:
+            errors[number] = serializer.errors
+    if errors:
+        raise serializers.ValidationError({'rows': errors})
+    return valid
+
+
+def _ensure_categories(restaurant, rows):
+    """(parent name, name) -> Category for every category the rows mention, creating the missing ones."""
+    categories = {}
+    for category in Category.objects.filter(restaurant=restaurant, level__lte=1).select_related('parent_category'):
+        parent = category.parent_category.Category_name if category.parent_category_id else None
+        categories.setdefault((parent, category.Category_name), category)
+
+    created = 0
+    for level, wanted in enumerate([
+        {(None, row['category']) for row in rows},
+        {(row['category'], row['subcategory']) for row in rows if row['subcategory']},
+    ]):
+        missing = sorted(key for key in wanted if key not in categories)
+        new = [
+            Category(
+                restaurant=restaurant, Category_name=name, slug=slugify(name), level=level,
+                parent_category=categories[(None, parent)] if parent else None,
+            )
+            for parent, name in missing
+        ]
+        for key, category in zip(missing, Category.objects.bulk_create(new, batch_size=BATCH_SIZE)):
+            categories[key] = category
+        created += len(new)
+    return categories, created
+
+
+@transaction.atomic
+def import_menu(restaurant, rows, replace=False):
+    """
+    Upserts `rows` (from validate_rows) into the restaurant's menu. With
+    `replace`, items missing from the rows are marked unavailable rather
+    than deleted, since deleting an item would take its order lines with it.
+    Returns counts of what changed.
+    """
+    categories, categories_created = _ensure_categories(restaurant, rows)
+
+    existing = {
+        (item.category_id, item.item_name): item
+        for item in Item.objects.filter(restaurant=restaurant).select_for_update()
+    }
+    now = timezone.now()
+    to_create, to_update, seen = [], [], set()
+    for row in rows:
+        if not row['item_name']:
+            continue
+        category = categories[(None, row['category'])]
+        sub_category = categories[(row['category'], row['subcategory'])] if row['subcategory'] else None
+        key = (category.id, row['item_name'])
+        if key in seen:
+            continue  # a repeated row is ignored; the first one wins
+        seen.add(key)
+
+        item = existing.get(key)
+        if item is None:
+            item = Item(restaurant=restaurant, item_name=row['item_name'], slug=slugify(row['item_name']),
+                        category=category)
+            to_create.append(item)
+        else:
+            to_update.append(item)
+        item.description = row['description']
+        item.price = row['price']
+        item.discount_percentage = row['discount_percentage']
+        refresh_effective_price(item)
+        item.availability = row['availability']
+        item.sub_category = sub_category
+        item.updated_time = now
+        item.search_document = search_document(item)
+
+    hidden = []
+    if replace:
+        hidden = [item for key, item in existing.items() if key not in seen and item.availability]
+        for item in hidden:
+            item.availability = False
+            item.updated_time = now
+
+    Item.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    Item.objects.bulk_update(to_update, ITEM_FIELDS + ['updated_time', 'search_document'], batch_size=BATCH_SIZE)
+    Item.objects.bulk_update(hidden, ['availability', 'updated_time'], batch_size=BATCH_SIZE)
+    index_items(to_create + to_update)
+
+    summary = {
+        'categories_created': categories_created,
+        'items_created': len(to_create),
+        'items_updated': len(to_update),
+        'items_hidden': len(hidden),
+    }
+    invalidate_menu(restaurant.id)
+    publish_menu_event(restaurant.id, {"type": "menu_replaced", "restaurant_id": restaurant.id, **summary})
+    return summary
+
+
+def export_rows(restaurant):
+    """Yields the restaurant's menu as row dicts, one query streamed in chunks."""
+    items = (
+        Item.objects.filter(restaurant=restaurant)
+        .order_by('category__Category_name', 'sub_category__Category_name', 'item_name', 'id')
+        .values_list('category__Category_name', 'sub_category__Category_name', 'item_name', 'description',
+                     'price', 'discount_percentage', 'availability')
+    )
+    used = set()
+    for values in items.iterator(chunk_size=BATCH_SIZE):
+        row = dict(zip(COLUMNS, values))
+        row['subcategory'] = row['subcategory'] or ''
+        used.update({(row['category'], ''), (row['category'], row['subcategory'])})
+        yield row
+
+    # Categories without items, so they are recreated on import
+    categories = (
+        Category.objects.filter(restaurant=restaurant, level__lte=1)
+        .order_by('level', 'Category_name')
+        .values_list('parent_category__Category_name', 'Category_name')
+    )
+    for parent, name in categories:
+        key = (parent, name) if parent else (name, '')
+        if key in used:
+            continue
+        used.add(key)
+        yield dict.fromkeys(COLUMNS, '') | {'category': key[0], 'subcategory': key[1]}
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.DictWriter(_Echo(), fieldnames=COLUMNS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_json(rows):
+    yield '['
+    for number, row in enumerate(rows):
+        yield (',' if number else '') + json.dumps(row, default=str)
+    yield ']'
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:20
+
+from django.db import OperationalError, migrations, models
+
+FTS_TABLE = 'item_search_fts'
+GIN_INDEX = 'item_search_gin'
+
+
+def create_search_index(apps, schema_editor):
+    Item = apps.get_model('item', 'Item')
+    connection = schema_editor.connection
+
+    items = list(Item.objects.select_related('category', 'sub_category'))
+    for item in items:
+        parts = [item.item_name, item.category.Category_name if item.category_id else '',
+                 item.sub_category.Category_name if item.sub_category_id else '']
+        item.search_document = ' '.join(part for part in parts if part)
+    Item.objects.bulk_update(items, ['search_document'], batch_size=1000)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+        schema_editor.add_index(Item, GinIndex(SearchVector('search_document', config='simple'), name=GIN_INDEX))
+    elif connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document)")
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to icontains
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (%s, %s)",
+                [(item.pk, item.search_document) for item in items],
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {GIN_INDEX}")
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item', '0008_item_discount_percentage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
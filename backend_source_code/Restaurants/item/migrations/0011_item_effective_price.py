@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:42
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def fill_effective_price(apps, schema_editor):
+    # Same rule as item.pricing.final_price, frozen here so later changes cannot alter this migration
+    Item = apps.get_model('item', 'Item')
+    items = list(Item.objects.only('price', 'discount_percentage'))
+    for item in items:
+        price = item.price
+        if item.discount_percentage > 0:
+            price -= price * item.discount_percentage / 100
+        item.effective_price = price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    Item.objects.bulk_update(items, ['effective_price'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item', '0010_item_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='effective_price',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0.0, editable=False, max_digits=10),
+        ),
+        migrations.RunPython(fill_effective_price, migrations.RunPython.noop),
+    ]
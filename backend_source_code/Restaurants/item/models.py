@@ -20,18 +20,31 @@ class Item(models.Model):
 
     # Discount Feature
     discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    # price less the discount, kept by save() (item/pricing.py) for price filters and totals in SQL
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, db_index=True, editable=False)
 
     availability = models.BooleanField(default=True)
     video = models.FileField(upload_to='media/item_videos/', null=True, blank=True)
 
     created_time = models.DateTimeField(auto_now_add=True)
     updated_time = models.DateTimeField(auto_now=True)
+
+    # Name + category names, indexed for full-text search (item/search.py)
+    search_document = models.TextField(blank=True, default='', editable=False)
+    # Resized copies of image1 (RESTAURANTS/images.py)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     
 
     def save(self, *args, **kwargs):
         
         if not self.slug:
             self.slug = slugify(self.item_name)
+        from .pricing import refresh_effective_price
+        from .search import search_document
+        self.search_document = search_document(self)
+        refresh_effective_price(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'search_document', 'effective_price'}
         super().save(*args, **kwargs)
     def __str__(self):
         return self.item_name
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+Item pricing.
+
+The price a guest pays for one unit is the item price less its discount
+percentage, rounded to cents. It is computed here only, and stored on the
+item as `effective_price` (refreshed by Item.save() and the bulk writers) so
+price filters, sorting and cart totals run in SQL.
+
+Orders price their lines from the item's own price and discount at the
+moment they are placed (final_prices), never from a cached value.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
+
+CENT = Decimal('0.01')
+
+
+def final_price(price, discount_percentage=0):
+    """Unit price after the discount, rounded half-up to cents."""
+    price = Decimal(price or 0)
+    discount = Decimal(discount_percentage or 0)
+    if discount > 0:
+        price -= price * discount / 100
+    return price.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def final_prices(items):
+    """{item id: unit price} for many items at once."""
+    return {item.pk: final_price(item.price, item.discount_percentage) for item in items}
+
+
+def refresh_effective_price(item):
+    item.effective_price = final_price(item.price, item.discount_percentage)
+    return item.effective_price
+
+
+def total_price(lines='items'):
+    """Annotation summing quantity x effective price over a cart's (or any) `lines` relation."""
+    money = DecimalField(max_digits=14, decimal_places=2)
+    line = ExpressionWrapper(F(f'{lines}__quantity') * F(f'{lines}__item__effective_price'), output_field=money)
+    return Coalesce(Sum(line), Decimal('0.00'), output_field=money)
@@ -0,0 +1,160 @@
+"""
+Full-text item search.
+
+Each Item keeps a denormalized `search_document` (name, category and
+sub-category names) that Item.save() refreshes. The index over it depends on
+the database:
+
+- Postgres: a GIN expression index on to_tsvector('simple', search_document)
+  (migration item 0009); queried with to_tsquery prefix terms, ranked with
+  ts_rank.
+- SQLite (USE_SQLITE): an FTS5 table `item_search_fts` whose rowid is the item
+  id, kept in step by the Item signals; ranked with bm25.
+
+Any other database, or an SQLite build without FTS5, falls back to the old
+icontains search.
+
+Every word of the query must match the start of a word in the document, so
+"chick bur" finds "Chicken Burger".
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+FTS_TABLE = 'item_search_fts'
+SEARCH_CONFIG = 'simple'
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+# Databases known to have the FTS5 table (only positive answers are remembered)
+_fts_databases = set()
+
+
+def search_document(item):
+    """The text an item is found by."""
+    parts = [item.item_name]
+    if item.category_id:
+        parts.append(item.category.Category_name)
+    if item.sub_category_id:
+        parts.append(item.sub_category.Category_name)
+    return ' '.join(part for part in parts if part)
+
+
+def search_terms(text):
+    return _WORD.findall((text or '').lower())
+
+
+def search_vector():
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('search_document', config=SEARCH_CONFIG)
+
+
+def fts_available(using=connection):
+    """True if this SQLite database has the FTS5 table (created by the item 0009 migration)."""
+    if using.vendor != 'sqlite':
+        return False
+    name = str(using.settings_dict['NAME'])
+    if name in _fts_databases:
+        return True
+    with using.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        found = cursor.fetchone() is not None
+    if found:
+        _fts_databases.add(name)
+    return found
+
+
+def backend(using=connection):
+    if using.vendor == 'postgresql':
+        return 'postgres'
+    if fts_available(using):
+        return 'fts5'
+    return None
+
+
+def index_items(items, using=connection):
+    """Writes the FTS5 rows of `items` (no-op on Postgres: the index is an expression index)."""
+    if not fts_available(using):
+        return
+    rows = [(item.pk, item.search_document) for item in items]
+    if rows:
+        with using.cursor() as cursor:
+            cursor.executemany(f"INSERT OR REPLACE INTO {FTS_TABLE}(rowid, document) VALUES (%s, %s)", rows)
+
+
+def unindex_items(item_ids, using=connection):
+    if not fts_available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in item_ids])
+
+
+def refresh_search_documents(queryset):
+    """Recomputes and stores the documents of `queryset` (after a category rename, bulk writes...)."""
+    from .models import Item
+
+    items = list(queryset.select_related('category', 'sub_category'))
+    for item in items:
+        item.search_document = search_document(item)
+    Item.objects.bulk_update(items, ['search_document'], batch_size=1000)
+    index_items(items)
+    return len(items)
+
+
+def search_items(queryset, text):
+    """
+    `queryset` narrowed to items matching every word of `text` as a prefix,
+    annotated with `search_rank` (higher is better). Returns None when no
+    full-text backend is available.
+    """
+    terms = search_terms(text)
+    kind = backend()
+    if kind is None:
+        return None
+    if not terms:
+        return queryset
+
+    if kind == 'postgres':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        query = SearchQuery(' & '.join(f"{term}:*" for term in terms), config=SEARCH_CONFIG, search_type='raw')
+        # Same expression as the GIN index, so the planner can use it
+        vector = search_vector()
+        return queryset.alias(search_vector=vector).filter(search_vector=query).annotate(
+            search_rank=SearchRank(vector, query)
+        )
+
+    match = ' AND '.join(f'"{term}"*' for term in terms)
+    table = queryset.model._meta.db_table
+    # MATCH must run once per query, not once per item row: the filter is an IN
+    # list built from one FTS scan, and the ranks come from a materialized CTE
+    # that SQLite also builds once and probes by id. bm25 is lower-is-better;
+    # negate it so both backends sort by -search_rank.
+    return queryset.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+    ).annotate(
+        search_rank=RawSQL(
+            f"WITH hits AS MATERIALIZED (SELECT rowid AS id, -bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s) SELECT rank FROM hits WHERE hits.id = {table}.id",
+            [match],
+        )
+    )
+
+
+class ItemSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the full-text index. Results are ordered by rank,
+    keeping the view's own ordering as the tie-breaker. Falls back to the
+    regular icontains search where no index exists.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        if not search_terms(text):
+            return super().filter_queryset(request, queryset, view)
+
+        results = search_items(queryset, text)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        return results.order_by('-search_rank', *queryset.query.order_by, 'id')
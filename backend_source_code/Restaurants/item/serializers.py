@@ -1,10 +1,13 @@
 from rest_framework import serializers
 from django.utils.text import slugify
+
+from RESTAURANTS.images import ImageVariantsField
 from .models import Item
 
 
 class ItemSerializer(serializers.ModelSerializer):
     image1 = serializers.ImageField(required=False)
+    image1_variants = ImageVariantsField('image1')
     video = serializers.FileField(required=False)
     category_name = serializers.CharField(source='category.Category_name', read_only=True)
     restaurant_name = serializers.CharField(source='restaurant.resturent_name', read_only=True)
@@ -12,8 +15,8 @@ class ItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Item
-        fields = ['id', 'item_name', 'price', 'description', 'slug', 'category', 'sub_category', 'restaurant','category_name', 'image1','availability','video','restaurant_name', 'discount_percentage']
-        read_only_fields = ['slug', 'restaurant']
+        fields = ['id', 'item_name', 'price', 'description', 'slug', 'category', 'sub_category', 'restaurant','category_name', 'image1', 'image1_variants','availability','video','restaurant_name', 'discount_percentage', 'effective_price']
+        read_only_fields = ['slug', 'restaurant', 'effective_price']
 
     def create(self, validated_data):
         validated_data['slug'] = slugify(validated_data['item_name'])
@@ -24,3 +27,14 @@ class ItemSerializer(serializers.ModelSerializer):
 
 
 
+
+
+class BulkAvailabilitySerializer(serializers.Serializer):
+    availability = serializers.BooleanField()
+    item_ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False, max_length=1000)
+    category_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if ('item_ids' in attrs) == ('category_id' in attrs):
+            raise serializers.ValidationError("Send either item_ids or category_id.")
+        return attrs
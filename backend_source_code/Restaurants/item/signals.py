@@ -0,0 +1,70 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from category.models import Category
+from RESTAURANTS.images import IMAGE_FIELDS, schedule_derivatives
+from .models import Item
+from .search import index_items, refresh_search_documents, unindex_items
+from .snapshots import invalidate_menu
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_menu_snapshot(sender, instance, **kwargs):
+    """Any item or category write (views, admin, seed scripts) moves the menu version."""
+    invalidate_menu(instance.restaurant_id)
+
+
+def _invalidate_after_derivatives(instance):
+    # Derivatives land after the save that triggered them; the menu must pick up their URLs
+    invalidate_menu(instance.restaurant_id)
+
+
+@receiver(post_save, sender=Item)
+def build_item_image_derivatives(sender, instance, **kwargs):
+    schedule_derivatives(instance, IMAGE_FIELDS['item.Item'], on_refresh=_invalidate_after_derivatives)
+
+
+@receiver(post_save, sender=Category)
+def build_category_image_derivatives(sender, instance, **kwargs):
+    schedule_derivatives(instance, IMAGE_FIELDS['category.Category'], on_refresh=_invalidate_after_derivatives)
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance, **kwargs):
+    index_items([instance])
+
+
+@receiver(post_delete, sender=Item)
+def unindex_item(sender, instance, **kwargs):
+    unindex_items([instance.pk])
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_name(sender, instance, update_fields=None, **kwargs):
+    instance._stored_name = None
+    if instance.pk and (update_fields is None or 'Category_name' in update_fields):
+        instance._stored_name = Category.objects.filter(pk=instance.pk).values_list('Category_name', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_items(sender, instance, created, **kwargs):
+    """Item documents carry the category names, so a rename must reach them (and only a rename)."""
+    stored = getattr(instance, '_stored_name', None)
+    if not created and stored is not None and stored != instance.Category_name:
+        refresh_search_documents(Item.objects.filter(category=instance) | Item.objects.filter(sub_category=instance))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_sub_category_items(sender, instance, **kwargs):
+    # sub_category is SET_NULL by a bulk update that sends no signals
+    instance._sub_item_ids = list(Item.objects.filter(sub_category=instance).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def reindex_orphaned_items(sender, instance, **kwargs):
+    ids = getattr(instance, '_sub_item_ids', None)
+    if ids:
+        refresh_search_documents(Item.objects.filter(id__in=ids))
@@ -0,0 +1,220 @@
+"""
+Customer menu snapshots.
+
+Every guest that scans a QR code reads the same menu, so the customer menu
+endpoints render it once per restaurant and menu version and serve the stored
+JSON bytes afterwards. Restaurant.menu_version is bumped (after commit) by the
+Item/Category signals in item/signals.py; a new version means new cache keys,
+so nothing has to be deleted.
+
+Responses carry a strong ETag built from the restaurant, the version and the
+request URL, so `If-None-Match` is answered with 304 before anything is
+rendered or even read from the cache.
+
+Menu events sent with publish_menu_event carry the version their change
+produced, so a client that sees a version jump of more than one knows it
+missed an event and refetches the snapshot.
+
+Small, well-understood changes (e.g. bulk availability) go through
+patch_menu_items instead: the version still moves, but the snapshots
+rendered for the old version are patched and carried over rather than
+rendered again from scratch.
+"""
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from rest_framework.renderers import JSONRenderer
+
+from message.broadcast import publish
+from RESTAURANTS.cache import CacheNamespace
+from restaurant.models import Restaurant
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TTL': 60 * 60,  # a version's rendered body
+    'VERSION_TTL': 30,  # how long a process trusts its cached version number
+}
+
+_pending = threading.local()
+# restaurant id -> last version this thread bumped it to
+_bumped = threading.local()
+
+
+def _config(name):
+    return getattr(settings, 'MENU_SNAPSHOT', {}).get(name, DEFAULTS[name])
+
+
+VERSIONS = CacheNamespace('menu_version', ttl=_config('VERSION_TTL'), alias=_config('CACHE_ALIAS'))
+SNAPSHOTS = CacheNamespace('menu_snapshot', ttl=_config('TTL'), alias=_config('CACHE_ALIAS'))
+# (restaurant, version) -> {(kind, url hash)} of the snapshots rendered for it
+SNAPSHOT_INDEX = CacheNamespace('menu_snapshot_index', ttl=_config('TTL'), alias=_config('CACHE_ALIAS'))
+
+
+def _stored_version(restaurant_id):
+    return Restaurant.objects.filter(pk=restaurant_id).values_list('menu_version', flat=True).first() or 0
+
+
+def menu_version(restaurant_id):
+    """Current menu version of a restaurant (0 before the first change)."""
+    return VERSIONS.get_or_load(restaurant_id, loader=lambda: _stored_version(restaurant_id))
+
+
+def bump_menu_version(restaurant_id):
+    """Moves the restaurant to a new menu version and returns it."""
+    # The UPDATE holds the row until commit, so the read-back is our own version
+    with transaction.atomic():
+        Restaurant.objects.filter(pk=restaurant_id).update(menu_version=F('menu_version') + 1)
+        version = _stored_version(restaurant_id)
+    VERSIONS.set(restaurant_id, value=version)
+    if not hasattr(_bumped, 'versions'):
+        _bumped.versions = {}
+    _bumped.versions[restaurant_id] = version
+    return version
+
+
+def invalidate_menu(restaurant_id):
+    """
+    Bumps the menu version once the current transaction commits, so no reader
+    can render the new version from the old rows. Repeated calls inside one
+    transaction (e.g. a cascade delete) bump only once.
+    """
+    pending = getattr(_pending, 'restaurants', None)
+    if pending is None:
+        pending = _pending.restaurants = set()
+    pending.add(restaurant_id)
+
+    def bump():
+        # Only the first callback of the transaction does the work
+        if restaurant_id in pending:
+            pending.discard(restaurant_id)
+            bump_menu_version(restaurant_id)
+
+    transaction.on_commit(bump)
+
+
+def publish_menu_event(restaurant_id, event):
+    """
+    Publishes `event` to the restaurant group once the transaction commits,
+    stamped with the menu version its writes produced. Call it after the
+    writes: their version bump is queued first and has run by then.
+    """
+    def send():
+        version = getattr(_bumped, 'versions', {}).pop(restaurant_id, None)
+        if version is None:
+            # Another event of the same transaction already took the bumped version
+            version = _stored_version(restaurant_id)
+        publish(f"restaurant_{restaurant_id}", {**event, "version": version})
+
+    transaction.on_commit(send)
+
+
+def build_menu(restaurant_id, serializer_context):
+    """Full menu of a restaurant: category tree plus every item, as plain data."""
+    from category.models import Category
+    from category.serializers import HierarchicalCategorySerializer
+    from category.tree import category_tree
+    from .models import Item
+    from .serializers import ItemSerializer
+
+    tree = HierarchicalCategorySerializer(
+        category_tree(Category.objects.filter(restaurant_id=restaurant_id)), many=True, context=serializer_context,
+    ).data
+
+    items = Item.objects.filter(restaurant_id=restaurant_id).select_related('category', 'restaurant').order_by('id')
+    return {
+        'restaurant': restaurant_id,
+        'version': menu_version(restaurant_id),
+        'categories': tree,
+        'items': ItemSerializer(items, many=True, context=serializer_context).data,
+    }
+
+
+def _url_hash(request):
+    return hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()[:16]
+
+
+def _etag(restaurant_id, version, kind, url_hash):
+    return f'"menu-{restaurant_id}-{version}-{kind}-{url_hash}"'
+
+
+def _remember(restaurant_id, version, kind, url_hash):
+    # Best effort: a lost entry only means that snapshot is rendered again after a patch
+    rendered = SNAPSHOT_INDEX.get(restaurant_id, version, default=frozenset())
+    SNAPSHOT_INDEX.set(restaurant_id, version, value=rendered | {(kind, url_hash)})
+
+
+def _patch_items(data, kind, changes):
+    if kind == 'menu':
+        items = data['items']
+    elif kind == 'items':
+        items = data['results'] if isinstance(data, dict) else data
+    else:
+        return data  # categories carry no item fields
+    for item in items:
+        item.update(changes.get(item['id'], ()))
+    return data
+
+
+def patch_menu_items(restaurant_id, changes):
+    """
+    After commit, moves the restaurant to a new menu version and carries the
+    old version's snapshots over with `changes` ({item id: {field: value}})
+    applied to the items they contain. Only for changes that cannot affect
+    which items a snapshot lists or in what order.
+    """
+    def carry():
+        old = _stored_version(restaurant_id)
+        new = bump_menu_version(restaurant_id)
+        carried = set()
+        for kind, url_hash in SNAPSHOT_INDEX.get(restaurant_id, old, default=frozenset()):
+            body = SNAPSHOTS.get(restaurant_id, _etag(restaurant_id, old, kind, url_hash).strip('"'))
+            if body is None:
+                continue
+            data = _patch_items(json.loads(body), kind, changes)
+            if kind == 'menu':
+                data['version'] = new
+            tag = _etag(restaurant_id, new, kind, url_hash).strip('"')
+            SNAPSHOTS.set(restaurant_id, tag, value=JSONRenderer().render(data))
+            carried.add((kind, url_hash))
+        if carried:
+            SNAPSHOT_INDEX.set(restaurant_id, new, value=frozenset(carried))
+
+    transaction.on_commit(carry)
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return header.strip() == '*' or etag in [tag.strip() for tag in header.split(',')]
+
+
+def snapshot_response(request, restaurant_id, kind, build):
+    """
+    Serves `build()` (JSON-able data) for the restaurant's current menu version,
+    rendering it at most once per version and URL.
+    """
+    version = menu_version(restaurant_id)
+    url_hash = _url_hash(request)
+    etag = _etag(restaurant_id, version, kind, url_hash)
+
+    def render():
+        body = JSONRenderer().render(build())
+        _remember(restaurant_id, version, kind, url_hash)
+        return body
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        # Concurrent misses for the same version render it once
+        body = SNAPSHOTS.get_or_load(restaurant_id, etag.strip('"'), loader=render)
+        response = HttpResponse(body, content_type='application/json')
+
+    response['ETag'] = etag
+    # Always revalidate: the version can move at any time
+    patch_cache_control(response, no_cache=True)
+    return response
@@ -1,3 +1,750 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import ChefStaff, User
+from RESTAURANTS.images import derived_files
+from category.models import Category
+from restaurant.models import Restaurant
+from . import pricing, search
+from .models import Item
+
+
+class MenuSnapshotTests(TestCase):
+    menu_url = reverse('customer-menu')
+    categories_url = reverse('customer-categories')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        cls.mains = Category.objects.create(restaurant=cls.restaurant, Category_name='Mains')
+        cls.grills = Category.objects.create(
+            restaurant=cls.restaurant, Category_name='Grills', parent_category=cls.mains
+        )
+        cls.items = [
+            Item.objects.create(
+                item_name=f'Dish {n}', price=Decimal('10.00'), description='', category=cls.mains,
+                sub_category=cls.grills if n % 2 else None, restaurant=cls.restaurant,
+            )
+            for n in range(4)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_menu(self, **headers):
+        return self.client.get(self.menu_url, {'restaurant_id': self.restaurant.id}, **headers)
+
+    def test_menu_is_rendered_once_per_version(self):
+        first = self.get_menu()
+        self.assertEqual(first.status_code, 200)
+        menu = first.json()
+        self.assertEqual([c['Category_name'] for c in menu['categories']], ['Mains'])
+        self.assertEqual([c['Category_name'] for c in menu['categories'][0]['subcategories']], ['Grills'])
+        self.assertEqual(len(menu['items']), 4)
+        self.assertEqual(menu['items'][0]['category_name'], 'Mains')
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.get_menu()
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.get_menu()['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get_menu(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_item_change_moves_to_a_new_version(self):
+        before = self.get_menu()
+        item = self.items[0]
+        item.item_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+
+        after = self.get_menu(HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertIn('Renamed', [i['item_name'] for i in after.json()['items']])
+        self.assertEqual(after.json()['version'], before.json()['version'] + 1)
+
+    def test_cascade_delete_bumps_the_version_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mains.delete()
+
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.menu_version, 1)
+        self.assertEqual(self.get_menu().json()['items'], [])
+
+    def test_saving_a_stale_restaurant_keeps_the_menu_version(self):
+        stale = Restaurant.objects.get(pk=self.restaurant.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items[0].item_name = 'Renamed'
+            self.items[0].save()
+        self.assertEqual(stale.menu_version, 0)
+
+        stale.location = 'Abu Dhabi'
+        stale.save()
+
+        self.restaurant.refresh_from_db()
+        self.assertEqual((self.restaurant.location, self.restaurant.menu_version), ('Abu Dhabi', 1))
+
+    def test_category_list_keeps_its_shape_and_revalidates(self):
+        response = self.client.get(self.categories_url, {'restaurant_id': self.restaurant.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({c['Category_name'] for c in response.json()}, {'Mains', 'Grills'})
+
+        cached = self.client.get(
+            self.categories_url, {'restaurant_id': self.restaurant.id}, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(cached.status_code, 304)
+
+    def test_unknown_restaurant_is_404(self):
+        response = self.client.get(self.menu_url, {'restaurant_id': 999})
+        self.assertEqual(response.status_code, 404)
+
+
+class ItemSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        cls.burgers = Category.objects.create(restaurant=cls.restaurant, Category_name='Burgers')
+        cls.drinks = Category.objects.create(restaurant=cls.restaurant, Category_name='Drinks')
+        for name, category in [('Chicken Burger', cls.burgers), ('Beef Burger', cls.burgers),
+                               ('Chicken Soup', cls.drinks), ('Lemonade', cls.drinks)]:
+            Item.objects.create(item_name=name, price=Decimal('10.00'), description='', category=category,
+                                restaurant=cls.restaurant)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def search(self, text):
+        response = self.client.get(reverse('item-list'), {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return [item['item_name'] for item in response.data['results']]
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 is the SQLite backend')
+    def test_sqlite_uses_fts5(self):
+        self.assertEqual(search.backend(), 'fts5')
+        ranked = search.search_items(Item.objects.all(), 'burger').order_by('-search_rank')
+        # "Burger" in both the name and the category outranks the name alone
+        self.assertEqual(ranked[0].category, self.burgers)
+        self.assertEqual(ranked.count(), 2)
+
+    def test_every_word_matches_as_a_prefix(self):
+        self.assertEqual(self.search('chick bur'), ['Chicken Burger'])
+        self.assertEqual(sorted(self.search('chick')), ['Chicken Burger', 'Chicken Soup'])
+
+    def test_category_names_are_searchable(self):
+        self.assertEqual(sorted(self.search('burgers')), ['Beef Burger', 'Chicken Burger'])
+
+    def test_category_rename_reaches_the_items(self):
+        self.drinks.Category_name = 'Beverages'
+        self.drinks.save()
+        self.assertEqual(sorted(self.search('bever')), ['Chicken Soup', 'Lemonade'])
+        self.assertEqual(self.search('drinks'), [])
+
+    def test_other_category_edits_leave_the_items_alone(self):
+        with mock.patch('item.signals.refresh_search_documents') as refresh:
+            self.drinks.save()
+            self.drinks.Category_name = 'Beverages'
+            self.drinks.save(update_fields=['image_derivatives'])
+        refresh.assert_not_called()
+
+    def test_deleted_items_leave_the_index(self):
+        Item.objects.get(item_name='Lemonade').delete()
+        self.assertEqual(self.search('lemon'), [])
+
+    def test_customer_search_uses_the_index(self):
+        response = APIClient().get(
+            reverse('customer_items-list'), {'restaurant_id': self.restaurant.id, 'search': 'soup'}
+        )
+        self.assertEqual([item['item_name'] for item in response.json()['results']], ['Chicken Soup'])
+
+
+def make_jpeg(width, height, name='dish.jpg', exif=None):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 80, 40)).save(buffer, 'JPEG', exif=exif or Image.Exif())
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageDerivativeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        cls.mains = Category.objects.create(restaurant=cls.restaurant, Category_name='Mains')
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def create_item(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = Item.objects.create(item_name='Steak', price=Decimal('30.00'), description='',
+                                       category=self.mains, restaurant=self.restaurant, image1=image)
+        item.refresh_from_db()
+        return item
+
+    def test_upload_builds_every_variant_without_metadata(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90 degrees: stored landscape, shown portrait
+        exif[0x010e] = 'secret description'
+        item = self.create_item(make_jpeg(2000, 1000, exif=exif))
+
+        variants = item.image_derivatives['image1']['variants']
+        self.assertEqual(item.image_derivatives['image1']['source'], item.image1.name)
+        self.assertEqual({name: (v['width'], v['height']) for name, v in variants.items()},
+                         {'thumb': (80, 160), 'card': (240, 480), 'full': (640, 1280)})
+        for variant in variants.values():
+            self.assertIn('/derived/', variant['webp'])
+            for key, expected in [('webp', 'WEBP'), ('jpeg', 'JPEG')]:
+                with default_storage.open(variant[key]) as f:
+                    image = Image.open(f)
+                    self.assertEqual(image.format, expected)
+                    self.assertEqual(len(image.getexif()), 0)
+                    self.assertEqual(image.size, (variant['width'], variant['height']))
+
+    def test_serializer_exposes_srcset(self):
+        item = self.create_item(make_jpeg(1000, 1000))
+        data = self.client.get(reverse('item-detail', args=[item.id])).data['image1_variants']
+
+        self.assertTrue(data['thumb']['webp'].startswith('http://testserver/media/'))
+        # No upscaling: the 1000px original caps "full", which is not listed twice
+        self.assertEqual(data['full']['width'], 1000)
+        self.assertEqual(data['srcset']['webp'].count(' 1000w'), 1)
+        self.assertEqual([part.split()[-1] for part in data['srcset']['jpeg'].split(', ')],
+                         ['160w', '480w', '1000w'])
+
+    def test_replacing_the_image_drops_old_derivatives_and_moves_the_menu(self):
+        item = self.create_item(make_jpeg(600, 400))
+        old_files = derived_files(item.image_derivatives['image1'])
+        version = Restaurant.objects.get(pk=self.restaurant.pk).menu_version
+
+        item.image1 = make_jpeg(800, 800, name='other.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        item.refresh_from_db()
+
+        self.assertTrue(all(not default_storage.exists(name) for name in old_files))
+        self.assertEqual(item.image_derivatives['image1']['variants']['card']['width'], 480)
+        self.assertGreater(Restaurant.objects.get(pk=self.restaurant.pk).menu_version, version)
+
+        item.image1 = None
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        item.refresh_from_db()
+        self.assertEqual(item.image_derivatives, {})
+
+    def test_unrelated_saves_do_not_regenerate(self):
+        item = self.create_item(make_jpeg(600, 400))
+        item.item_name = 'Ribeye'
+        with mock.patch('RESTAURANTS.images.generate_derivatives') as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                item.save()
+        generate.assert_not_called()
+
+    def test_unreadable_image_is_recorded_once(self):
+        bogus = SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg')
+        with self.assertLogs('RESTAURANTS.images', 'WARNING'):
+            item = self.create_item(bogus)
+        self.assertEqual(item.image_derivatives['image1']['variants'], {})
+        self.assertIsNone(self.client.get(reverse('item-detail', args=[item.id])).data['image1_variants'])
+
+    def test_backfill_command_covers_existing_media(self):
+        logo = default_storage.save('media/restaurant_logos/logo.jpg', make_jpeg(300, 300))
+        icon = default_storage.save('media/category_icons/icon.jpg', make_jpeg(64, 64))
+        # Rows written around the signals, as before this feature existed
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(logo=logo)
+        Category.objects.filter(pk=self.mains.pk).update(icon_image=icon)
+
+        call_command('backfill_image_derivatives', '--dry-run', stdout=StringIO())
+        self.assertEqual(Restaurant.objects.get(pk=self.restaurant.pk).image_derivatives, {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('backfill_image_derivatives', stdout=StringIO())
+        restaurant = Restaurant.objects.get(pk=self.restaurant.pk)
+        category = Category.objects.get(pk=self.mains.pk)
+        self.assertEqual(restaurant.image_derivatives['logo']['variants']['full']['width'], 300)
+        self.assertEqual(category.image_derivatives['icon_image']['variants']['thumb']['width'], 64)
+        self.assertEqual(restaurant.menu_version, 1)
+
+
+class MenuImportExportTests(TestCase):
+    import_url = reverse('menu-import')
+    export_url = reverse('menu-export')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        cls.mains = Category.objects.create(restaurant=cls.restaurant, Category_name='Mains')
+        cls.steak = Item.objects.create(item_name='Steak', price=Decimal('30.00'), description='Old',
+                                        category=cls.mains, restaurant=cls.restaurant)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        patcher = mock.patch('message.broadcast.get_channel_layer',
+                             return_value=mock.Mock(group_send=mock.AsyncMock()))
+        self.layer = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def import_rows(self, rows, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.import_url + ('?replace=true' if params.get('replace') else ''),
+                                    {'rows': rows}, format='json')
+
+    def event_types(self):
+        return [call.args[1]['type'] for call in self.layer.group_send.await_args_list]
+
+    def test_json_import_upserts_in_bulk_with_one_event(self):
+        rows = [
+            {'category': 'Mains', 'item_name': 'Steak', 'description': 'Dry aged', 'price': '42.50'},
+            {'category': 'Drinks', 'subcategory': 'Hot', 'item_name': 'Latte', 'price': '4'},
+            {'category': 'Drinks', 'subcategory': 'Hot', 'item_name': 'Mocha', 'price': '5', 'availability': False},
+            {'category': 'Desserts'},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.import_rows(rows)
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['categories_created'], 3)
+        self.assertEqual((response.data['items_created'], response.data['items_updated']), (2, 1))
+        # Bulk statements, not one INSERT per row
+        self.assertLess(len(ctx.captured_queries), 20)
+        self.assertEqual(self.event_types(), ['menu_replaced'])
+
+        self.steak.refresh_from_db()
+        self.assertEqual((self.steak.price, self.steak.description), (Decimal('42.50'), 'Dry aged'))
+        latte = Item.objects.get(item_name='Latte')
+        self.assertEqual((latte.category.Category_name, latte.sub_category.Category_name), ('Drinks', 'Hot'))
+        self.assertEqual(latte.sub_category.level, 1)
+        self.assertFalse(Item.objects.get(item_name='Mocha').availability)
+        self.assertTrue(Category.objects.filter(restaurant=self.restaurant, Category_name='Desserts').exists())
+
+        # Bulk writes skip signals; the import keeps search and the menu version in step itself
+        search = self.client.get(reverse('item-list'), {'search': 'hot lat'}).data['results']
+        self.assertEqual([item['item_name'] for item in search], ['Latte'])
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.menu_version, 1)
+
+    def test_invalid_rows_change_nothing(self):
+        response = self.import_rows([
+            {'category': 'Mains', 'item_name': 'Soup', 'price': '8'},
+            {'category': 'Mains', 'item_name': 'Salad'},
+            {'item_name': 'Bread', 'price': 'abc'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['rows']), {2, 3})
+        self.assertFalse(Item.objects.filter(item_name='Soup').exists())
+        self.assertEqual(self.event_types(), [])
+
+    def test_replace_hides_missing_items_instead_of_deleting(self):
+        response = self.import_rows([{'category': 'Mains', 'item_name': 'Fish', 'price': '20'}], replace=True)
+        self.assertEqual(response.data['items_hidden'], 1)
+        self.steak.refresh_from_db()
+        self.assertFalse(self.steak.availability)
+
+    def test_csv_export_round_trips_through_import(self):
+        Category.objects.create(restaurant=self.restaurant, Category_name='Empty')
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        self.assertIn(b'Mains,,Steak,Old,30.00,0.00,True', content)
+        self.assertIn(b'Empty,,,,,,', content)
+
+        upload = SimpleUploadedFile('menu.csv', content.replace(b'30.00', b'31.00'), content_type='text/csv')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.import_url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['items_updated'], response.data['categories_created']), (1, 0))
+        self.steak.refresh_from_db()
+        self.assertEqual(self.steak.price, Decimal('31.00'))
+
+    def test_json_export(self):
+        response = self.client.get(self.export_url, {'type': 'json'})
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(rows[0]['item_name'], 'Steak')
+        self.assertEqual(rows[0]['price'], '30.00')
+
+    def test_other_roles_and_restaurants_are_refused(self):
+        chef = User.objects.create_user(email='chef@example.com', username='chef', password='pass1234', role='chef')
+        self.client.force_authenticate(chef)
+        self.assertEqual(self.client.get(self.export_url).status_code, 403)
+
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.get(self.export_url, {'restaurant_id': 999}).status_code, 404)
+
+    def test_owner_of_several_restaurants_must_pick_one(self):
+        other = Restaurant.objects.create(
+            resturent_name='Second Bistro', location='Dubai', phone_number='+971500000002', owner=self.owner
+        )
+        response = self.client.get(self.export_url, {'type': 'json'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('restaurant_id', response.json())
+
+        response = self.client.get(self.export_url, {'type': 'json', 'restaurant_id': other.id})
+        self.assertEqual(response.status_code, 200)
+
+    def test_managers_work_in_the_restaurant_that_accepted_them(self):
+        manager = User.objects.create_user(
+            email='manager@example.com', username='manager', password='pass1234', role='manager'
+        )
+        ChefStaff.objects.create(restaurant=self.restaurant, user=manager, action='accepted')
+        self.client.force_authenticate(manager)
+        self.assertEqual(self.client.get(self.export_url, {'type': 'json'}).status_code, 200)
+
+
+class BulkAvailabilityTests(TestCase):
+    url = reverse('item-bulk-availability')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        cls.mains = Category.objects.create(restaurant=cls.restaurant, Category_name='Mains')
+        cls.fish = Category.objects.create(restaurant=cls.restaurant, Category_name='Fish', parent_category=cls.mains)
+        cls.desserts = Category.objects.create(restaurant=cls.restaurant, Category_name='Desserts')
+        cls.salmon, cls.tuna, cls.steak, cls.cake = [
+            Item.objects.create(item_name=name, price=Decimal('10.00'), description='', category=category,
+                                sub_category=sub, restaurant=cls.restaurant)
+            for name, category, sub in [('Salmon', cls.mains, cls.fish), ('Tuna', cls.mains, cls.fish),
+                                        ('Steak', cls.mains, None), ('Cake', cls.desserts, None)]
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        patcher = mock.patch('message.broadcast.get_channel_layer',
+                             return_value=mock.Mock(group_send=mock.AsyncMock()))
+        self.layer = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def toggle(self, url=None, **body):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url or self.url, body, format='json')
+
+    def available(self):
+        return dict(Item.objects.values_list('item_name', 'availability'))
+
+    def test_item_ids_are_changed_with_one_update_and_one_event(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.toggle(availability=False, item_ids=[self.salmon.id, self.cake.id])
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "item_item"')]), 1)
+        self.assertEqual(self.available(), {'Salmon': False, 'Tuna': True, 'Steak': True, 'Cake': False})
+
+        self.layer.group_send.assert_awaited_once()
+        group, event = self.layer.group_send.await_args.args
+        self.assertEqual(group, f'restaurant_{self.restaurant.id}')
+        self.assertEqual(event['type'], 'availability_changed')
+        self.assertEqual(event['items'], {str(self.salmon.id): False, str(self.cake.id): False})
+
+    def test_category_covers_its_sub_category_items(self):
+        chef = User.objects.create_user(email='chef@example.com', username='chef', password='pass1234', role='chef')
+        ChefStaff.objects.create(user=chef, restaurant=self.restaurant, action='accepted')
+        self.client.force_authenticate(chef)
+
+        response = self.toggle(reverse('chef-items-bulk-availability'), availability=False, category_id=self.fish.id)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(self.available(), {'Salmon': False, 'Tuna': False, 'Steak': True, 'Cake': True})
+
+    def test_foreign_items_reject_the_whole_request(self):
+        other_owner = User.objects.create_user(
+            email='other@example.com', username='other', password='pass1234', role='owner'
+        )
+        other = Restaurant.objects.create(
+            resturent_name='Other', location='Dubai', phone_number='+971500000002', owner=other_owner
+        )
+        foreign = Item.objects.create(item_name='Foreign', price=Decimal('1.00'), description='',
+                                      category=Category.objects.create(restaurant=other, Category_name='X'),
+                                      restaurant=other)
+
+        response = self.toggle(availability=False, item_ids=[self.salmon.id, foreign.id])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['item_ids'], [foreign.id])
+        self.assertTrue(Item.objects.get(pk=self.salmon.pk).availability)
+        self.layer.group_send.assert_not_awaited()
+
+        self.assertEqual(self.toggle(availability=False).status_code, 400)
+
+    def test_cached_menu_is_patched_not_rebuilt(self):
+        customer = APIClient()
+        menu_url = reverse('customer-menu')
+        before = customer.get(menu_url, {'restaurant_id': self.restaurant.id})
+
+        self.toggle(availability=False, item_ids=[self.steak.id])
+
+        with CaptureQueriesContext(connection) as ctx:
+            after = customer.get(menu_url, {'restaurant_id': self.restaurant.id}, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        menu = after.json()
+        self.assertEqual(menu['version'], before.json()['version'] + 1)
+        self.assertEqual({i['item_name']: i['availability'] for i in menu['items']},
+                         {'Salmon': True, 'Tuna': True, 'Steak': False, 'Cake': True})
+
+
+class MenuEventTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        cls.mains = Category.objects.create(restaurant=cls.restaurant, Category_name='Mains')
+        cls.steak = Item.objects.create(item_name='Steak', price=Decimal('30.00'), description='Long text ' * 20,
+                                        category=cls.mains, restaurant=cls.restaurant)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        patcher = mock.patch('message.broadcast.get_channel_layer',
+                             return_value=mock.Mock(group_send=mock.AsyncMock()))
+        self.layer = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def events(self):
+        return [call.args[1] for call in self.layer.group_send.await_args_list]
+
+    def current_version(self):
+        return Restaurant.objects.get(pk=self.restaurant.pk).menu_version
+
+    def test_update_carries_only_changed_fields_and_the_new_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('item-detail', args=[self.steak.id]), {'price': '32.50'},
+                                         format='json')
+        self.assertEqual(response.status_code, 200)
+
+        [event] = self.events()
+        self.assertEqual(event, {
+            'type': 'item_updated', 'item_id': self.steak.id, 'changes': {'price': '32.50', 'effective_price': '32.50'},
+            'version': self.current_version(),
+        })
+
+    def test_versions_are_consecutive_across_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post(reverse('item-list'), {
+                'item_name': 'Soup', 'price': '8.00', 'description': 'Hot', 'category': self.mains.id,
+            }, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('item-detail', args=[created.data['id']]))
+
+        created_event, deleted_event = self.events()
+        self.assertEqual(created_event['item']['item_name'], 'Soup')
+        self.assertEqual(deleted_event, {
+            'type': 'item_deleted', 'item_id': created.data['id'], 'version': created_event['version'] + 1,
+        })
+        # A client that missed events resyncs from the snapshot, which names the same version
+        menu = APIClient().get(reverse('customer-menu'), {'restaurant_id': self.restaurant.id}).json()
+        self.assertEqual(menu['version'], deleted_event['version'])
+
+    def test_chef_delete_names_the_item(self):
+        chef = User.objects.create_user(email='chef@example.com', username='chef', password='pass1234', role='chef')
+        ChefStaff.objects.create(user=chef, restaurant=self.restaurant, action='accepted')
+        self.client.force_authenticate(chef)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('chef-items-detail', args=[self.steak.id]))
+
+        [event] = self.events()
+        self.assertEqual(self.layer.group_send.await_args.args[0], f'restaurant_{self.restaurant.id}')
+        self.assertEqual((event['type'], event['item_id']), ('item_deleted', self.steak.id))
+
+
+class ItemPricingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        cls.mains = Category.objects.create(restaurant=cls.restaurant, Category_name='Mains')
+        for name, price, discount in [('Soup', '8.00', 0), ('Steak', '40.00', 50), ('Salad', '15.00', 0),
+                                      ('Lobster', '90.00', 10)]:
+            Item.objects.create(item_name=name, price=Decimal(price), discount_percentage=Decimal(discount),
+                                description='', category=cls.mains, restaurant=cls.restaurant)
+
+    def test_final_price_rounds_half_up_to_cents(self):
+        self.assertEqual(pricing.final_price(Decimal('9.99'), Decimal('15')), Decimal('8.49'))
+        self.assertEqual(pricing.final_price(Decimal('0.05'), Decimal('50')), Decimal('0.03'))
+        self.assertEqual(pricing.final_price(Decimal('12.00')), Decimal('12.00'))
+
+    def test_save_keeps_effective_price_in_step(self):
+        steak = Item.objects.get(item_name='Steak')
+        self.assertEqual(steak.effective_price, Decimal('20.00'))
+        steak.discount_percentage = Decimal('25.00')
+        steak.save(update_fields=['discount_percentage'])
+        self.assertEqual(Item.objects.get(pk=steak.pk).effective_price, Decimal('30.00'))
+
+    def test_price_range_and_sort_use_the_discounted_price(self):
+        response = APIClient().get(reverse('customer_items-list'), {
+            'restaurant_id': self.restaurant.id, 'min_price': '10', 'max_price': '30', 'ordering': '-effective_price',
+        })
+        self.assertEqual([(i['item_name'], i['effective_price']) for i in response.json()['results']],
+                         [('Steak', '20.00'), ('Salad', '15.00')])
+
+    def test_menu_import_prices_items(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        with mock.patch('message.broadcast.get_channel_layer', return_value=mock.Mock(group_send=mock.AsyncMock())):
+            client.post(reverse('menu-import'), {'rows': [
+                {'category': 'Mains', 'item_name': 'Soup', 'price': '10.00', 'discount_percentage': '20'},
+                {'category': 'Mains', 'item_name': 'Bread', 'price': '3.00', 'discount_percentage': '10'},
+            ]}, format='json')
+        self.assertEqual(dict(Item.objects.filter(item_name__in=['Soup', 'Bread'])
+                              .values_list('item_name', 'effective_price')),
+                         {'Soup': Decimal('8.00'), 'Bread': Decimal('2.70')})
+
+
+class MediaServingTests(TestCase):
+
+    def setUp(self):
+        self.media = media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.body = bytes(range(256)) * 40  # 10240 bytes
+        os.makedirs(os.path.join(media, 'item_videos', 'derived'))
+        with open(os.path.join(media, 'item_videos', 'clip.mp4'), 'wb') as f:
+            f.write(self.body)
+        with open(os.path.join(media, 'item_videos', 'derived', 'clip.0123456789.card.webp'), 'wb') as f:
+            f.write(b'webp')
+
+    def get(self, path='/media/item_videos/clip.mp4', **headers):
+        return self.client.get(path, headers=headers)
+
+    def test_full_response_advertises_ranges_and_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual(response['Content-Length'], '10240')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+    def test_byte_range_returns_partial_content(self):
+        response = self.get(Range='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.body[100:200])
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/10240')
+        self.assertEqual(response['Content-Length'], '100')
+
+    def test_open_and_suffix_ranges(self):
+        response = self.get(Range='bytes=10000-')
+        self.assertEqual(response['Content-Range'], 'bytes 10000-10239/10240')
+        self.assertEqual(b''.join(response.streaming_content), self.body[10000:])
+
+        response = self.get(Range='bytes=-16')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10224-10239/10240')
+        self.assertEqual(b''.join(response.streaming_content), self.body[-16:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range='bytes=20000-20100')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10240')
+
+    def test_suffix_range_of_an_empty_file_is_unsatisfiable(self):
+        open(os.path.join(self.media, 'item_videos', 'empty.mp4'), 'wb').close()
+        response = self.get('/media/item_videos/empty.mp4', Range='bytes=-16')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(Range='bytes=0-9', **{'If-Range': etag}).status_code, 206)
+        response = self.get(Range='bytes=0-9', **{'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '10240')
+
+    def test_revalidation_is_not_modified(self):
+        etag = self.get()['ETag']
+        response = self.get(**{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_hashed_names_are_immutable(self):
+        response = self.get('/media/item_videos/derived/clip.0123456789.card.webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_offload_sets_headers_without_a_body(self):
+        with override_settings(MEDIA_SERVING={'OFFLOAD': 'x-accel'}):
+            response = self.get(Range='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/item_videos/clip.mp4')
+        self.assertEqual(response.content, b'')
+
+        with override_settings(MEDIA_SERVING={'OFFLOAD': 'x-sendfile'}):
+            response = self.get()
+        self.assertTrue(response['X-Sendfile'].endswith(os.path.join('item_videos', 'clip.mp4')))
+
+    def test_paths_outside_media_root_are_not_found(self):
+        self.assertEqual(self.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.get('/media/item_videos/missing.mp4').status_code, 404)
+        self.assertEqual(self.client.post('/media/item_videos/clip.mp4').status_code, 405)
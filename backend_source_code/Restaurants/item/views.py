@@ -1,7 +1,7 @@
 from rest_framework import viewsets, permissions
 from rest_framework.exceptions import ValidationError, PermissionDenied
 from .models import Item
-from .serializers import ItemSerializer
+from .serializers import ItemSerializer, BulkAvailabilitySerializer
 from accounts.permissions import IsOwnerRole,IsStaffRole,IsChefRole,IsCustomerRole,IsOwnerChefOrStaff
 from .pagination import ItemPagination
 from .filters import ItemFilter
@@ -11,7 +11,7 @@ from restaurant.models import Restaurant
 from accounts.models import ChefStaff
 from .permissions import IsStafforChefOfRestaurant
 from device.models import Device
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, NotFound
 from order.models import Order
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -19,20 +19,72 @@ from rest_framework.views import APIView
 from django.db.models import Sum, F
 from order.models import OrderItem
 from restaurant.models import Restaurant
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-
-channel_layer = get_channel_layer()
-
-
-
-class ItemViewSet(viewsets.ModelViewSet):
+from .snapshots import snapshot_response, build_menu, patch_menu_items, publish_menu_event
+from . import events
+from .search import ItemSearchFilter
+from . import menu_io
+from django.http import StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+
+
+class BulkAvailabilityMixin:
+    """
+    POST <items>/bulk-availability/ {"availability": false, "item_ids": [...]}
+    or {"availability": false, "category_id": 3} (items in that category or
+    sub-category). Changes every matching item of the user's restaurants with
+    one UPDATE and sends one availability_changed event per restaurant.
+    """
+
+    @action(detail=False, methods=['post'], url_path='bulk-availability')
+    def bulk_availability(self, request):
+        serializer = BulkAvailabilitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        availability = serializer.validated_data['availability']
+        item_ids = serializer.validated_data.get('item_ids')
+
+        scope = self.get_queryset().order_by()
+        if item_ids is not None:
+            scope = scope.filter(id__in=item_ids)
+        else:
+            category_id = serializer.validated_data['category_id']
+            scope = scope.filter(Q(category_id=category_id) | Q(sub_category_id=category_id))
+
+        with transaction.atomic():
+            found = dict(scope.select_for_update().values_list('id', 'restaurant_id'))
+            if item_ids is not None:
+                missing = sorted(set(item_ids) - set(found))
+                if missing:
+                    return Response({"error": "Items not found or unauthorized", "item_ids": missing}, status=400)
+            elif not found:
+                raise NotFound("No items in this category")
+
+            Item.objects.filter(id__in=list(found)).update(availability=availability, updated_time=timezone.now())
+
+            by_restaurant = {}
+            for item_id, restaurant_id in found.items():
+                by_restaurant.setdefault(restaurant_id, []).append(item_id)
+            for restaurant_id, ids in by_restaurant.items():
+                patch_menu_items(restaurant_id, {item_id: {'availability': availability} for item_id in ids})
+                # String keys: the Redis layer's msgpack refuses integer map keys
+                publish_menu_event(restaurant_id, {
+                    "type": "availability_changed",
+                    "items": {str(item_id): availability for item_id in ids},
+                })
+
+        return Response({"updated": len(found), "availability": availability})
+
+
+class ItemViewSet(BulkAvailabilityMixin, viewsets.ModelViewSet):
     serializer_class = ItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerChefOrStaff]
     pagination_class = ItemPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter,filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ItemSearchFilter]
     filterset_class = ItemFilter
-    ordering_fields = ['created_time']
+    ordering_fields = ['created_time', 'effective_price']
     ordering = ['-created_time']
     search_fields = ['item_name', 'category__Category_name']
 
@@ -67,7 +119,7 @@ class ItemViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You are not authorized to add items.")
 
         item = serializer.save(restaurant=restaurant)
-        self.send_ws_event("item_created", item)
+        events.item_created(item)
 
     def is_user_authorized(self, item):
         user = self.request.user
@@ -85,8 +137,9 @@ class ItemViewSet(viewsets.ModelViewSet):
         item = self.get_object()
         if not self.is_user_authorized(item):
             raise PermissionDenied("You don't have permission to update this item.")
+        before = events.item_state(serializer.instance)
         item = serializer.save()
-        self.send_ws_event("item_updated", item)
+        events.item_updated(item, before)
 
     def perform_destroy(self, instance):
         if not self.is_user_authorized(instance):
@@ -95,13 +148,7 @@ class ItemViewSet(viewsets.ModelViewSet):
         restaurant_id = instance.restaurant.id
         item_id = instance.id
         instance.delete()
-        async_to_sync(channel_layer.group_send)(
-            f"restaurant_{restaurant_id}",
-            {
-                "type": "item_deleted",
-                "item_id": item_id
-            }
-        )
+        events.item_deleted(restaurant_id, item_id)
 
     def is_user_authorized(self, item):
         user = self.request.user
@@ -114,19 +161,6 @@ class ItemViewSet(viewsets.ModelViewSet):
                 action='accepted'
             ).exists()
         return False
-    
-    def send_ws_event(self, event_type, item):
-        """Helper method to broadcast item events"""
-        restaurant_id = item.restaurant.id
-        data = ItemSerializer(item).data
-
-        async_to_sync(channel_layer.group_send)(
-            f"restaurant_{restaurant_id}",
-            {
-                "type": event_type,
-                "item": data
-            }
-        )
 
 
 
@@ -134,12 +168,12 @@ class ItemViewSet(viewsets.ModelViewSet):
 
 
 
-class StaffItemViewSet(viewsets.ModelViewSet):
+class StaffItemViewSet(BulkAvailabilityMixin, viewsets.ModelViewSet):
     queryset = Item.objects.all()
     permission_classes = [permissions.IsAuthenticated, IsStaffRole]
     serializer_class = ItemSerializer
     pagination_class = ItemPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, ItemSearchFilter]
     filterset_class = ItemFilter
     search_fields = ['item_name', 'category__Category_name']
 
@@ -150,24 +184,13 @@ class StaffItemViewSet(viewsets.ModelViewSet):
             return Item.objects.filter(restaurant=chef_staff.restaurant).order_by('-created_time')
         except ChefStaff.DoesNotExist:
             return Item.objects.none()
-    def send_ws_event(self, event_type, item=None, item_id=None):
-        """Broadcast update/delete events to WebSocket"""
-        restaurant_id = item.restaurant.id if item else None
-        data = ItemSerializer(item).data if item else None
-
-        async_to_sync(channel_layer.group_send)(
-            f"restaurant_{restaurant_id}",
-            {
-                "type": event_type, 
-                "item": data,
-            }
-        )
 
     def perform_update(self, serializer):
         if not IsStafforChefOfRestaurant().has_object_permission(self.request, self, serializer.instance):
             raise PermissionDenied("You are not authorized to update this item.")
+        before = events.item_state(serializer.instance)
         item = serializer.save()
-        self.send_ws_event("item_updated", item=item)
+        events.item_updated(item, before)
 
     def perform_destroy(self, instance):
         if not IsStafforChefOfRestaurant().has_object_permission(self.request, self, instance):
@@ -175,7 +198,7 @@ class StaffItemViewSet(viewsets.ModelViewSet):
         restaurant_id = instance.restaurant.id
         item_id = instance.id
         instance.delete()
-        self.send_ws_event("item_deleted", item_id=item_id)
+        events.item_deleted(restaurant_id, item_id)
 
     
 
@@ -203,12 +226,12 @@ class StaffItemViewSet(viewsets.ModelViewSet):
 
 
 
-class ChefItemViewSet(viewsets.ModelViewSet):
+class ChefItemViewSet(BulkAvailabilityMixin, viewsets.ModelViewSet):
     queryset = Item.objects.all()
     permission_classes = [permissions.IsAuthenticated,IsChefRole]
     serializer_class = ItemSerializer
     pagination_class = ItemPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, ItemSearchFilter]
     filterset_class = ItemFilter
     search_fields = ['item_name', 'category__Category_name']
 
@@ -220,24 +243,13 @@ class ChefItemViewSet(viewsets.ModelViewSet):
         except ChefStaff.DoesNotExist:
             return Item.objects.none()
         
-    def send_ws_event(self, event_type, item=None, item_id=None):
-        """Broadcast update/delete events to WebSocket"""
-        restaurant_id = item.restaurant.id if item else None
-        data = ItemSerializer(item).data if item else None
-
-        async_to_sync(channel_layer.group_send)(
-            f"restaurant_{restaurant_id}",
-            {
-                "type": event_type,   # Must match method in consumer
-                "item": data,
-            }
-        )
 
     def perform_update(self, serializer):
         if not IsStafforChefOfRestaurant().has_object_permission(self.request, self, serializer.instance):
             raise PermissionDenied("You are not authorized to update this item.")
+        before = events.item_state(serializer.instance)
         item = serializer.save()
-        self.send_ws_event("item_updated", item=item)
+        events.item_updated(item, before)
 
     def perform_destroy(self, instance):
         if not IsStafforChefOfRestaurant().has_object_permission(self.request, self, instance):
@@ -245,7 +257,7 @@ class ChefItemViewSet(viewsets.ModelViewSet):
         restaurant_id = instance.restaurant.id
         item_id = instance.id
         instance.delete()
-        self.send_ws_event("item_deleted", item_id=item_id)
+        events.item_deleted(restaurant_id, item_id)
 
     
     @action(detail=False,methods=['get'],url_path='status-summary')
@@ -276,33 +288,129 @@ class CustomerItemViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ItemSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = ItemPagination  
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ItemSearchFilter]
     filterset_class = ItemFilter  
+    ordering_fields = ['effective_price', 'item_name']
     search_fields = ['item_name', 'category__Category_name']
 
-    def get_queryset(self):
-        # Allow anonymous access for customer-facing endpoint
-        if self.action == 'retrieve':
-            return Item.objects.all()
-
+    def get_restaurant_ids(self):
         # Return items from first restaurant for anonymous users
         if self.request.user.is_anonymous:
             restaurant_id = self.request.query_params.get('restaurant_id')
             if restaurant_id:
-                return Item.objects.filter(restaurant_id=restaurant_id)
+                return [restaurant_id]
             
-            first_restaurant = Restaurant.objects.first()
-            if first_restaurant:
-                return Item.objects.filter(restaurant=first_restaurant)
-            return Item.objects.none()
+            first_restaurant = Restaurant.objects.values_list('id', flat=True).first()
+            return [first_restaurant] if first_restaurant else []
         
         restaurant_ids = self.request.user.devices.values_list('restaurant_id', flat=True)
         # print("Customer's restaurant IDs:", list(restaurant_ids))
-        val=list(restaurant_ids)
-        return Item.objects.filter(restaurant_id__in=val)
+        return list(restaurant_ids)
+
+    def get_queryset(self):
+        # Allow anonymous access for customer-facing endpoint
+        if self.action == 'retrieve':
+            return Item.objects.all()
+
+        val = self.get_restaurant_ids()
+        return Item.objects.filter(restaurant_id__in=val).select_related('category', 'restaurant')
+
+    def list(self, request, *args, **kwargs):
+        restaurant_ids = {str(restaurant_id) for restaurant_id in self.get_restaurant_ids()}
+        if len(restaurant_ids) != 1 or not next(iter(restaurant_ids)).isdigit():
+            return super().list(request, *args, **kwargs)
+
+        # Every filter/search/page combination is its own snapshot of the menu version
+        def build():
+            return super(CustomerItemViewSet, self).list(request, *args, **kwargs).data
+        return snapshot_response(request, int(restaurant_ids.pop()), 'items', build)
+
+
+class CustomerMenuSnapshotView(APIView):
+    """Whole customer menu (category tree + items) in one cached response."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        restaurant_id = request.query_params.get('restaurant_id')
+        if not restaurant_id and not request.user.is_anonymous:
+            device = request.user.devices.first()
+            restaurant_id = device.restaurant_id if device else None
+        if not restaurant_id or not str(restaurant_id).isdigit():
+            return Response({"error": "restaurant_id is required"}, status=400)
+
+        restaurant_id = int(restaurant_id)
+
+        def build():
+            if not Restaurant.objects.filter(pk=restaurant_id).exists():
+                raise NotFound("Restaurant not found")
+            return build_menu(restaurant_id, {'request': request})
+        return snapshot_response(request, restaurant_id, 'menu', build)
+
 
 
 
+class MenuFileMixin:
+    # IsOwnerRole admits owners and managers; chefs and staff cannot import or export
+    permission_classes = [permissions.IsAuthenticated, IsOwnerRole]
+
+    def get_restaurant(self, request):
+        """
+        The restaurant to import into or export: ?restaurant_id= among the
+        owner's restaurants (or, for a manager, the ones that accepted them).
+        Required when there is more than one.
+        """
+        user = request.user
+        if user.role == 'owner':
+            restaurants = Restaurant.objects.filter(owner=user)
+        elif user.role == 'manager':
+            restaurant_ids = ChefStaff.objects.filter(user=user, action='accepted').values_list('restaurant_id', flat=True)
+            restaurants = Restaurant.objects.filter(id__in=restaurant_ids)
+        else:
+            raise PermissionDenied("Only owners and managers can import or export the menu.")
+
+        restaurant_id = request.query_params.get('restaurant_id')
+        if restaurant_id:
+            restaurants = restaurants.filter(id=restaurant_id) if restaurant_id.isdigit() else restaurants.none()
+        candidates = list(restaurants.order_by('id')[:2])
+        if not candidates:
+            raise NotFound("Restaurant not found")
+        if len(candidates) > 1:
+            raise ValidationError({"restaurant_id": "You have several restaurants; say which one."})
+        return candidates[0]
+
+
+class MenuImportView(MenuFileMixin, APIView):
+    """
+    Creates or updates categories, subcategories and items from a CSV/JSON
+    file ("file") or a JSON body ({"rows": [...]}), in one transaction.
+    ?replace=true also hides the items the file no longer lists.
+    """
+
+    def post(self, request):
+        restaurant = self.get_restaurant(request)
+        rows = menu_io.validate_rows(menu_io.parse_rows(upload=request.FILES.get('file'), data=request.data))
+        body = request.data if hasattr(request.data, 'get') else {}
+        replace = str(request.query_params.get('replace', body.get('replace', ''))).lower() == 'true'
+        summary = menu_io.import_menu(restaurant, rows, replace=replace)
+        return Response({"restaurant_id": restaurant.id, **summary})
+
+
+class MenuExportView(MenuFileMixin, APIView):
+    """Streams the menu in the import format: ?type=csv (default) or ?type=json."""
+
+    def get(self, request):
+        restaurant = self.get_restaurant(request)
+        file_type = request.query_params.get('type', 'csv')
+        if file_type not in ('csv', 'json'):
+            raise ValidationError({"type": "Use csv or json."})
+
+        rows = menu_io.export_rows(restaurant)
+        if file_type == 'csv':
+            response = StreamingHttpResponse(menu_io.stream_csv(rows), content_type='text/csv; charset=utf-8')
+        else:
+            response = StreamingHttpResponse(menu_io.stream_json(rows), content_type='application/json')
+        response['Content-Disposition'] = f'attachment; filename="menu-{restaurant.id}.{file_type}"'
+        return response
 
 
 class MostSellingItemsAPIView(APIView):
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MessageConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'message'
+
+    def ready(self):
+        # Hooks the broadcast bus into request_started / request_finished
+        from . import broadcast  # noqa: F401
+        from . import signals  # noqa: F401
@@ -0,0 +1,250 @@
+"""
+Broadcast bus for channel-layer events.
+
+Views, services and signals call `publish(group, event)` instead of
+`async_to_sync(channel_layer.group_send)(group, event)`. The event is only
+queued once the surrounding transaction commits (rolled-back writes never
+reach a socket) and is delivered in batches, with retry, off the request path:
+
+* "thread" mode: a background dispatcher thread with its own event loop.
+  Used with the Redis channel layer.
+* "inline" mode: events queued during a request are flushed when the request
+  finishes, after the response has been handed back to the server; outside a
+  request they are flushed right after commit. Used with the in-memory layer,
+  whose queues must be touched from the server's own event loop.
+
+`stats()` exposes queue depth, counters and publish latency.
+"""
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, 'BROADCAST_BUS', {}).get(name, default)
+
+
+class _Envelope:
+    __slots__ = ('group', 'event', 'published_at', 'attempts')
+
+    def __init__(self, group, event):
+        self.group = group
+        self.event = event
+        self.published_at = time.monotonic()
+        self.attempts = 0
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.published = 0
+        self.delivered = 0
+        self.retried = 0
+        self.dropped = 0
+        self.batches = 0
+        self.latency_total = 0.0
+        self.latency_last = 0.0
+        self.latency_max = 0.0
+
+    def delivered_one(self, envelope):
+        latency = time.monotonic() - envelope.published_at
+        with self.lock:
+            self.delivered += 1
+            self.latency_total += latency
+            self.latency_last = latency
+            self.latency_max = max(self.latency_max, latency)
+
+
+_stats = _Stats()
+_queue = queue.Queue()
+_local = threading.local()
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def mode():
+    return _setting('MODE', 'inline')
+
+
+def publish(group, event):
+    """
+    Queue `event` (a channel-layer message with a "type") for `group`.
+    Inside a transaction it is held back until commit and dropped on rollback.
+    """
+    envelope = _Envelope(group, event)
+    with _stats.lock:
+        _stats.published += 1
+    transaction.on_commit(lambda: _enqueue(envelope))
+
+
+def _enqueue(envelope):
+    if mode() == 'thread':
+        _queue.put(envelope)
+        _ensure_dispatcher()
+        return
+
+    pending = _pending()
+    pending.append(envelope)
+    if not getattr(_local, 'in_request', False):
+        flush()
+
+
+def _pending():
+    if not hasattr(_local, 'pending'):
+        _local.pending = []
+    return _local.pending
+
+
+def flush():
+    """Deliver everything queued by this thread (inline mode) right now."""
+    pending = _pending()
+    while pending:
+        batch_size = _setting('BATCH_SIZE', 100)
+        batch, pending[:] = pending[:batch_size], pending[batch_size:]
+        try:
+            async_to_sync(_deliver)(batch)
+        except Exception as e:
+            # e.g. called from inside a running event loop; nothing to retry on
+            logger.error(f"Broadcast flush failed, dropping {len(batch)} events: {e}")
+            with _stats.lock:
+                _stats.dropped += len(batch)
+
+
+async def _deliver(batch):
+    """Send one batch in publish order, retrying failed events with backoff."""
+    channel_layer = get_channel_layer()
+    max_retries = _setting('MAX_RETRIES', 3)
+    backoff = _setting('RETRY_BACKOFF', 0.1)
+
+    with _stats.lock:
+        _stats.batches += 1
+
+    for envelope in batch:
+        while True:
+            envelope.attempts += 1
+            try:
+                await channel_layer.group_send(envelope.group, envelope.event)
+            except Exception as e:
+                if envelope.attempts > max_retries:
+                    logger.error(
+                        f"Dropping {envelope.event.get('type')} for {envelope.group} "
+                        f"after {envelope.attempts} attempts: {e}"
+                    )
+                    with _stats.lock:
+                        _stats.dropped += 1
+                    break
+                with _stats.lock:
+                    _stats.retried += 1
+                await asyncio.sleep(backoff * envelope.attempts)
+            else:
+                _stats.delivered_one(envelope)
+                break
+
+
+class _Dispatcher(threading.Thread):
+    """Drains the shared queue in batches on a private event loop."""
+
+    def __init__(self):
+        super().__init__(name='broadcast-dispatcher', daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self.idle = threading.Event()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        while True:
+            batch = [_queue.get()]
+            self.idle.clear()
+            batch_size = _setting('BATCH_SIZE', 100)
+            while len(batch) < batch_size:
+                try:
+                    batch.append(_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.loop.run_until_complete(_deliver(batch))
+            except Exception as e:
+                logger.error(f"Broadcast dispatcher error: {e}")
+            finally:
+                for _ in batch:
+                    _queue.task_done()
+            if _queue.empty():
+                self.idle.set()
+
+
+def _ensure_dispatcher():
+    global _dispatcher
+    if _dispatcher is not None and _dispatcher.is_alive():
+        return
+    with _dispatcher_lock:
+        if _dispatcher is None or not _dispatcher.is_alive():
+            _dispatcher = _Dispatcher()
+            _dispatcher.start()
+
+
+def drain(timeout=5.0):
+    """
+    Wait until every committed event has been handed to the channel layer.
+    Returns False if the timeout expired first. Also runs at interpreter exit.
+    """
+    flush()
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+atexit.register(drain)
+
+
+def stats():
+    """Queue depth, delivery counters and publish->delivery latency (ms)."""
+    with _stats.lock:
+        delivered = _stats.delivered
+        return {
+            'mode': mode(),
+            'queue_depth': _queue.qsize() + len(_pending()),
+            'published': _stats.published,
+            'delivered': delivered,
+            'retried': _stats.retried,
+            'dropped': _stats.dropped,
+            'batches': _stats.batches,
+            'latency_ms': {
+                'last': round(_stats.latency_last * 1000, 3),
+                'avg': round(_stats.latency_total / delivered * 1000, 3) if delivered else 0.0,
+                'max': round(_stats.latency_max * 1000, 3),
+            },
+        }
+
+
+def reset_stats():
+    with _stats.lock:
+        _stats.reset()
+
+
+def _request_started(**kwargs):
+    _local.in_request = True
+
+
+def _request_finished(**kwargs):
+    _local.in_request = False
+    flush()
+
+
+request_started.connect(_request_started, dispatch_uid='broadcast_request_started')
+request_finished.connect(_request_finished, dispatch_uid='broadcast_request_finished')
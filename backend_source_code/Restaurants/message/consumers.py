@@ -6,7 +6,9 @@ from restaurant.models import Restaurant
 from device.models import Device
 from accounts.models import User
 import logging
+from restaurant.lookups import active_business_day
 from .models import CallSession
+from .persistence import persist
 import json
 import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
@@ -20,6 +22,8 @@ from datetime import timedelta
 logger = logging.getLogger(__name__)
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    context = None
+
     async def connect(self):
         self.device_id = self.scope['url_route']['kwargs']['device_id']
         self.user = self.scope['user']
@@ -35,9 +39,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.restaurant_id = query_params.get('restaurant_id', [None])[0]
 
         self.restaurant_group_name = f"room_{self.device_id}_{self.restaurant_id}"
-        print("jjdjdjdjjdjdjjd",self.restaurant_group_name)
 
         if self.user and (self.user.is_authenticated or self.user.is_anonymous):
+            # Everything a message needs besides its text, kept for the life of the socket
+            self.context = await self._load_context()
+
             # For anonymous users (guests), we might want to restrict them to their device room only
             # But for now, let's allow them to join the group to enable messaging
             await self.channel_layer.group_add(self.restaurant_group_name, self.channel_name)
@@ -68,36 +74,23 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         msg_type = data.get('type', 'message')
 
-        # Determine sender and receiver
-        if self.user.is_anonymous or (hasattr(self.user, 'role') and self.user.role == "customer"):
-            receiver = await self._get_restaurant_owner(self.restaurant_id)
-            is_from_device = True
-        else:  # owner or staff
-            receiver = await self._get_device_user(self.device_id)
-            is_from_device = False
-
+        is_from_device = self.user.is_anonymous or (hasattr(self.user, 'role') and self.user.role == "customer")
         sender = self.user
 
-        chat_message = await self._save_message(
-            sender=sender,
-            receiver=receiver,
-            message=message,
-            device_id=self.device_id,
-            restaurant_id=self.restaurant_id,
-            is_from_device=is_from_device,
-            room_name=self.restaurant_group_name,
-            guest_session=self.guest_session # Pass session
-        )
+        chat_message = self._build_message(message, is_from_device)
 
         if not chat_message:
             await self.send(text_data=json.dumps({"error": "Message could not be saved. Device or Restaurant may not exist."}))
             return
+        # Saved before the broadcast, or queued for the write-behind writer (message/persistence.py)
+        await persist(chat_message)
 
         # Broadcast the message to the specific chat room
         await self.channel_layer.group_send(
             self.restaurant_group_name,
             {
                 'type': 'chat_message',
+                'id': str(chat_message.client_id),
                 'message': message,
                 'msg_type': msg_type,
                 'sender': sender.username,
@@ -112,6 +105,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             f"restaurant_{self.restaurant_id}",
             {
                 'type': 'chat_message',
+                'id': str(chat_message.client_id),
                 'message': message,
                 'msg_type': msg_type,
                 'sender': sender.username,
@@ -123,6 +117,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message(self, event):
         await self.send(text_data=json.dumps({
+            'id': event.get('id'),
             'message': event['message'],
             'msg_type': event.get('msg_type', 'message'),
             'sender': event['sender'],
@@ -132,74 +127,104 @@ class ChatConsumer(AsyncWebsocketConsumer):
         }))
 
     @database_sync_to_async
-    def _save_message(self, sender, receiver, message, device_id, restaurant_id, is_from_device,room_name, guest_session=None):
-        try:
-            device = Device.objects.get(id=device_id)
-        except Device.DoesNotExist:
-            logger.warning(f"Device with ID {device_id} does not exist.")
+    def _load_context(self):
+        """
+        Ids of the device, its user, the restaurant, its owner and the open
+        business day: one query for the device and restaurant (two if the
+        socket names a restaurant the device is not in), the business day from
+        its cached lookup. None if the device or restaurant does not exist.
+        """
+        device = Device.objects.select_related('restaurant').filter(id=self.device_id).first()
+        if device is None:
+            logger.warning(f"Device with ID {self.device_id} does not exist.")
             return None
+        if str(device.restaurant_id) == str(self.restaurant_id):
+            restaurant = device.restaurant
+        else:
+            restaurant = Restaurant.objects.filter(id=self.restaurant_id).first()
+            if restaurant is None:
+                logger.warning(f"Restaurant with ID {self.restaurant_id} does not exist.")
+                return None
+
+        business_day = active_business_day(restaurant.id)
+        return {
+            'device_id': device.id,
+            'device_user_id': device.user_id,
+            'restaurant_id': restaurant.id,
+            'owner_id': restaurant.owner_id,
+            'business_day_id': business_day.id if business_day else None,
+        }
 
-        # If sender is anonymous (guest), use the device's user
-        if sender.is_anonymous:
-            sender = device.user
-
-        try:
-            restaurant = Restaurant.objects.get(id=restaurant_id)
-        except Restaurant.DoesNotExist:
-            logger.warning(f"Restaurant with ID {restaurant_id} does not exist.")
+    def _build_message(self, message, is_from_device):
+        """The unsaved row: every foreign key comes from the connection's context."""
+        context = self.context
+        if context is None:
             return None
 
-        return ChatMessage.objects.create(
-            sender=sender,
-            receiver=receiver,
+        if is_from_device:
+            # Guests write as the table's user
+            sender_id = context['device_user_id'] if self.user.is_anonymous else self.user.id
+            receiver_id = context['owner_id']
+        else:  # owner or staff
+            sender_id = self.user.id
+            receiver_id = context['device_user_id']
+
+        return ChatMessage(
+            sender_id=sender_id,
+            receiver_id=receiver_id,
             message=message,
-            device=device,
-            restaurant=restaurant,
+            device_id=context['device_id'],
+            restaurant_id=context['restaurant_id'],
             is_from_device=is_from_device,
-            room_name=room_name,
+            room_name=self.restaurant_group_name,
             new_message=True,
-
-            business_day=restaurant.business_days.filter(is_active=True).last(), # Link to active business day
-            guest_session=guest_session # Link to specific session
+            business_day_id=context['business_day_id'],  # Link to active business day
+            guest_session=self.guest_session  # Link to specific session
         )
 
+    # --- Context invalidation: the events that change what _load_context resolved ---
+    async def business_day_changed(self, event):
+        if self.context is not None:
+            self.context['business_day_id'] = await self._active_business_day_id()
+
+    async def device_created(self, event):
+        pass
+
+    async def device_updated(self, event):
+        if str(event["device"].get("id")) == str(self.device_id):
+            self.context = await self._load_context()
+
+    async def device_deleted(self, event):
+        if str(event["device_id"]) == str(self.device_id):
+            self.context = None
+
     @database_sync_to_async
-    def _get_restaurant_owner(self, restaurant_id):
-        try:
-            restaurant = Restaurant.objects.get(id=restaurant_id)
-            return restaurant.owner
-        except Restaurant.DoesNotExist:
-            return None
+    def _active_business_day_id(self):
+        business_day = active_business_day(self.context['restaurant_id'])
+        return business_day.id if business_day else None
 
     # --- Item Event Handlers for Real-time Menu via Chat Socket ---
+    # Menu events are versioned deltas (item/events.py) and reach clients as published
     async def item_created(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "item_created",
-            "item": event["item"]
-        }))
+        await self.send(text_data=json.dumps(event))
 
     async def item_updated(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "item_updated",
-            "item": event["item"]
-        }))
+        await self.send(text_data=json.dumps(event))
 
     async def item_deleted(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "item_deleted",
-            "item_id": event["item_id"]
-        }))
+        await self.send(text_data=json.dumps(event))
 
+    async def menu_replaced(self, event):
+        # Bulk import: clients refetch the menu instead of applying item events
+        await self.send(text_data=json.dumps(event))
+
+    async def availability_changed(self, event):
+        await self.send(text_data=json.dumps(event))
+
+    async def devices_created(self, event):
+        # Table provisioning is for dashboards; guests have nothing to do with it
+        pass
 
-    @database_sync_to_async
-    def _get_device_user(self, device_id):
-        try:
-            device = Device.objects.get(id=device_id)
-            return device.user
-        except Device.DoesNotExist:
-            logger.warning(f"Device not found when fetching user. Device ID: {device_id}")
-            return None
-        
 
 
 
@@ -464,6 +489,13 @@ class OrderConsumer(AsyncWebsocketConsumer):
             
         await self.send(text_data=json.dumps(response))
 
+    # Several orders of this table changed at once (batch status endpoint)
+    async def order_statuses_update(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'order_statuses_update',
+            'orders': event['orders'],
+        }))
+
     # Receive cart update from the session group
     async def cart_updated(self, event):
         # Forward the update notification to the client
@@ -509,23 +541,22 @@ class RestaurantConsumer(AsyncWebsocketConsumer):
     
 
     # --- Item events ---
+    # Menu events are versioned deltas (item/events.py) and reach clients as published
     async def item_created(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "item_created",
-            "item": event["item"]
-        }))
+        await self.send(text_data=json.dumps(event))
 
     async def item_updated(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "item_updated",
-            "item": event["item"]
-        }))
+        await self.send(text_data=json.dumps(event))
 
     async def item_deleted(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "item_deleted",
-            "item_id": event["item_id"]
-        }))
+        await self.send(text_data=json.dumps(event))
+
+    async def menu_replaced(self, event):
+        # Bulk import: clients refetch the menu instead of applying item events
+        await self.send(text_data=json.dumps(event))
+
+    async def availability_changed(self, event):
+        await self.send(text_data=json.dumps(event))
 
     
     # --- Order events ---
@@ -541,6 +572,12 @@ class RestaurantConsumer(AsyncWebsocketConsumer):
             "order": event["order"]
         }))
 
+    async def orders_updated(self, event):
+        await self.send(text_data=json.dumps({
+            "type": "orders_updated",
+            "orders": event["orders"]
+        }))
+
 
     
     # --- Device events ---
@@ -562,6 +599,13 @@ class RestaurantConsumer(AsyncWebsocketConsumer):
             "device_id": event["device_id"]
         }))
 
+    async def devices_created(self, event):
+        # Bulk provisioning: dashboards refetch the table list
+        await self.send(text_data=json.dumps(event))
+
+    async def business_day_changed(self, event):
+        await self.send(text_data=json.dumps(event))
+
 
 
     # --- Reservation events ---
@@ -616,6 +660,7 @@ class RestaurantConsumer(AsyncWebsocketConsumer):
     async def chat_message(self, event):
         await self.send(text_data=json.dumps({
             'type': 'chat_message',
+            'id': event.get('id'),
             'message': event['message'],
             'sender': event['sender'],
             'device_id': event['device_id'],
@@ -750,15 +795,20 @@ class RestaurantCallConsumer(AsyncWebsocketConsumer):
             message_content = f"Incoming call from {table_name}"
             
             # Save message to DB
-            chat_message = await self._save_message(
-                sender=self.user,
-                receiver=await database_sync_to_async(User.objects.get)(id=receiver_id),
+            chat_message = ChatMessage(
+                sender_id=self.user.id,
+                receiver_id=receiver_id,
                 message=message_content,
-                device_id=data.get("device_id"),
+                device_id=device.id,
                 restaurant_id=self.restaurant_id,
                 is_from_device=True,
-                room_name=f"room_{data.get('device_id')}_{self.restaurant_id}"
+                room_name=f"room_{data.get('device_id')}_{self.restaurant_id}",
+                new_message=True
             )
+            try:
+                await persist(chat_message)
+            except Exception as e:
+                logger.error(f"Error saving message: {e}")
 
             # Broadcast to Chat Group (so dashboard sees it)
             chat_group_name = f"room_{data.get('device_id')}_{self.restaurant_id}"
@@ -766,11 +816,12 @@ class RestaurantCallConsumer(AsyncWebsocketConsumer):
                 chat_group_name,
                 {
                     'type': 'chat_message',
+                    'id': str(chat_message.client_id),
                     'message': message_content,
                     'sender': self.user.username,
                     'device_id': data.get("device_id"),
                     'is_from_device': True,
-                    'timestamp': str(chat_message.timestamp) if chat_message else str(timezone.now()),
+                    'timestamp': str(chat_message.timestamp),
                 }
             )
         except Exception as e:
@@ -912,24 +963,6 @@ class RestaurantCallConsumer(AsyncWebsocketConsumer):
     # -------------------------------
     # Helper Methods
     # -------------------------------
-    @database_sync_to_async
-    def _save_message(self, sender, receiver, message, device_id, restaurant_id, is_from_device, room_name):
-        try:
-            device = Device.objects.get(id=device_id)
-            restaurant = Restaurant.objects.get(id=restaurant_id)
-            return ChatMessage.objects.create(
-                sender=sender,
-                receiver=receiver,
-                message=message,
-                device=device,
-                restaurant=restaurant,
-                is_from_device=is_from_device,
-                room_name=room_name,
-                new_message=True
-            )
-        except Exception as e:
-            logger.error(f"Error saving message: {e}")
-            return None
 
 
 
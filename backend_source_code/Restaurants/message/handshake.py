@@ -0,0 +1,106 @@
+"""
+WebSocket handshake authentication.
+
+Every tablet and phone of a restaurant reconnects at once when its Wi-Fi
+blips, so a handshake must not cost a round of queries each:
+
+- A JWT (three dot-separated parts) is validated locally; the user's public
+  fields and the id of the restaurant they own are loaded with one query and
+  cached per user (WS_IDENTITIES). The scope gets a User built from them, so
+  the password hash never reaches the cache.
+- Anything else is a guest session token; the active session and its device
+  are loaded with one query and cached per token (GUEST_SESSIONS). Misses
+  are cached too, so a storm of stale tokens stays off the database.
+
+Entries live for CACHE_TTLS["ws_identity"] / ["ws_guest_session"] seconds
+and are dropped on logout, when the user or their restaurant changes, and
+when the guest session is saved or deleted (message/signals.py).
+"""
+import hashlib
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import OuterRef, Subquery
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from RESTAURANTS.cache import CacheNamespace, from_cached
+
+logger = logging.getLogger(__name__)
+
+GUEST_TOKEN = "guest_token"
+
+WS_IDENTITIES = CacheNamespace('ws_identity', ttl=settings.CACHE_TTLS['ws_identity'])
+GUEST_SESSIONS = CacheNamespace('ws_guest_session', ttl=settings.CACHE_TTLS['ws_guest_session'])
+
+
+def _token_key(token):
+    # Tokens are credentials: keep them out of cache keys
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def forget_identity(user_id):
+    WS_IDENTITIES.delete(user_id)
+
+
+def forget_guest_session(session_token):
+    GUEST_SESSIONS.delete(_token_key(session_token))
+
+
+def _load_identity(user_id):
+    from restaurant.models import Restaurant
+
+    first_restaurant = Restaurant.objects.filter(owner=OuterRef('pk')).order_by('pk').values('pk')[:1]
+    row = (User.objects.filter(pk=user_id).annotate(restaurants_id=Subquery(first_restaurant))
+           .values('id', 'username', 'email', 'role', 'restaurants_id').first())
+    if row is None:
+        return None
+    return {"user_info": row}
+
+
+def _user(user_info):
+    # The consumers only read id, username and role; any other field loads on access
+    return from_cached(User, {name: user_info[name] for name in ('id', 'username', 'email', 'role')})
+
+
+def _load_guest_session(session_token):
+    from device.models import GuestSession
+
+    # The consumers read session.device from the event loop, so it must already be loaded
+    return GuestSession.objects.select_related('device').filter(session_token=session_token, is_active=True).first()
+
+
+def _resolve(token):
+    if token.count('.') == 2:
+        try:
+            user_id = AccessToken(token)[api_settings.USER_ID_CLAIM]
+        except (TokenError, KeyError) as e:
+            logger.debug("WebSocket token rejected: %s", e)
+            return {"user": None}
+        identity = WS_IDENTITIES.get_or_load(user_id, loader=lambda: _load_identity(user_id))
+        if identity is None:
+            return {"user": None}
+        user_info = dict(identity["user_info"])
+        return {"user": _user(user_info), "user_info": user_info}
+
+    session = GUEST_SESSIONS.get_or_load(_token_key(token), loader=lambda: _load_guest_session(token))
+    if session is None:
+        return {"user": None}
+    return {"user": AnonymousUser(), "guest_session": session}
+
+
+async def resolve_handshake(token):
+    """
+    Scope entries for `token`: "user" (a User, AnonymousUser for guests, or
+    None when rejected) plus "user_info" for users or "guest_session" for
+    guest sessions.
+    """
+    if not token:
+        return {"user": None}
+    if token == GUEST_TOKEN:
+        return {"user": AnonymousUser()}
+    return await sync_to_async(_resolve)(token)
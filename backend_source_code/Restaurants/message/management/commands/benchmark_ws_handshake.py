@@ -0,0 +1,113 @@
+import asyncio
+import time
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from accounts.models import User
+from device.models import Device, GuestSession
+from message.middleware import JWTAuthMiddleware
+from restaurant.models import Restaurant
+
+
+async def legacy_resolve(token):
+    """The handshake before caching: session lookup, user fetch, exists() and first()."""
+    session = await sync_to_async(GuestSession.objects.filter(session_token=token, is_active=True).first)()
+    if session:
+        return {"guest_session": session}
+    try:
+        user = await sync_to_async(User.objects.get)(id=AccessToken(token)["user_id"])
+    except Exception:
+        return {"user": None}
+
+    @sync_to_async
+    def restaurant_id():
+        return user.restaurants.first().id if user.restaurants.exists() else None
+
+    return {"user": user, "restaurants_id": await restaurant_id()}
+
+
+class Command(BaseCommand):
+    help = ('Replays a reconnect storm (every table and dashboard of a restaurant reconnecting at once) '
+            'through the WebSocket handshake auth; seed data rolled back afterwards')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tables', type=int, default=300, help='Guest devices reconnecting')
+        parser.add_argument('--staff', type=int, default=20, help='Dashboards (owner JWT) reconnecting')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            tokens = self.seed(options['tables'], options['staff'])
+            cache.clear()
+            results = {
+                'legacy': self.storm(tokens, legacy=True),
+                'cold cache': self.storm(tokens),
+                'warm cache': self.storm(tokens),
+            }
+            # Never keep the benchmark data
+            transaction.set_rollback(True)
+        cache.clear()
+
+        self.stdout.write(f"{len(tokens)} handshakes ({options['tables']} guests, {options['staff']} dashboards)")
+        self.stdout.write(f"{'resolver':<11} {'queries':>8} {'total (ms)':>11} {'per handshake (ms)':>19}")
+        for name, r in results.items():
+            self.stdout.write(f"{name:<11} {r['queries']:>8} {r['ms']:>11.1f} {r['ms'] / len(tokens):>19.3f}")
+        legacy, warm = results['legacy'], results['warm cache']
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {legacy['queries']} -> {results['cold cache']['queries']} queries cold, {warm['queries']} warm; "
+            f"{legacy['ms'] / warm['ms']:.1f}x faster with a warm cache (seed data rolled back)"
+        ))
+
+    def seed(self, tables, staff):
+        owner = User.objects.create_user(
+            email='bench-owner@example.invalid', username='bench-owner', password=None, role='owner'
+        )
+        restaurant = Restaurant.objects.create(
+            resturent_name='Handshake Benchmark Restaurant', location='-', phone_number='+000000003', owner=owner
+        )
+        users = User.objects.bulk_create([
+            User(email=f'bench-table-{n}@example.invalid', username=f'bench-table-{n}', role='customer')
+            for n in range(tables)
+        ])
+        devices = Device.objects.bulk_create([
+            Device(table_name=f'Table {n}', restaurant=restaurant, user=user) for n, user in enumerate(users)
+        ])
+        sessions = GuestSession.objects.bulk_create([
+            GuestSession(device=device, session_token=str(uuid.uuid4()), expires_at=now() + timedelta(hours=1))
+            for device in devices
+        ])
+        owner_token = str(RefreshToken.for_user(owner).access_token)
+        return [session.session_token for session in sessions] + [owner_token] * staff
+
+    def storm(self, tokens, legacy=False):
+        async def inner(scope, receive, send):
+            pass
+
+        middleware = JWTAuthMiddleware(inner)
+
+        async def handshake(token):
+            if legacy:
+                return await legacy_resolve(token)
+            scope = {'type': 'websocket', 'headers': [], 'query_string': f'token={token}'.encode()}
+            await middleware(scope, None, None)
+            return scope
+
+        async def reconnect_all():
+            return await asyncio.gather(*(handshake(token) for token in tokens))
+
+        # async_to_sync: the resolvers' queries run on this thread, inside the seeding transaction
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            scopes = async_to_sync(reconnect_all)()
+            elapsed = (time.perf_counter() - started) * 1000
+        accepted = sum(1 for scope in scopes if scope.get('guest_session') or scope.get('user'))
+        if accepted != len(tokens):
+            self.stderr.write(f"Only {accepted} of {len(tokens)} handshakes were accepted")
+        return {'queries': len(queries.captured_queries), 'ms': elapsed}
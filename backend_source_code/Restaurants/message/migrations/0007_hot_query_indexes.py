@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0015_hot_query_indexes'),
+        ('message', '0006_chatmessage_guest_session'),
+        ('restaurant', '0011_businessday_closed_by_businessday_total_card_payment_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['device', 'new_message'], name='chat_device_new_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['guest_session', 'timestamp'], name='chat_session_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(condition=models.Q(('is_from_device', True), ('is_read', False)), fields=['restaurant', 'device'], name='chat_unread_from_device_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:05
+
+import uuid
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def fill_client_ids(apps, schema_editor):
+    ChatMessage = apps.get_model('message', 'ChatMessage')
+    messages = list(ChatMessage.objects.only('pk'))
+    for message in messages:
+        message.client_id = uuid.uuid4()
+    ChatMessage.objects.bulk_update(messages, ['client_id'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message', '0007_hot_query_indexes'),
+    ]
+
+    operations = [
+        # Nullable first: existing rows each need their own value before the column turns unique
+        migrations.AddField(
+            model_name='chatmessage',
+            name='client_id',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_client_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='client_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
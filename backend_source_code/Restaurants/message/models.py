@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from accounts.models import User
 from device.models import Device
@@ -15,9 +17,12 @@ class ChatMessage(models.Model):
     business_day = models.ForeignKey('restaurant.BusinessDay', on_delete=models.SET_NULL, null=True, blank=True, related_name='messages')
     guest_session = models.ForeignKey('device.GuestSession', on_delete=models.SET_NULL, null=True, blank=True, related_name='messages') # Session Isolation
 
+    # Both set when the message is created in memory, so sockets can show them before the row
+    # is written (write-behind mode, message/persistence.py) and a re-flush never duplicates it
+    client_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     message = models.TextField()
     is_from_device = models.BooleanField(default=False)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     room_name = models.CharField(max_length=255, blank=True, null=True)
     new_message = models.BooleanField(default=True)
     
@@ -25,6 +30,19 @@ class ChatMessage(models.Model):
     is_read = models.BooleanField(default=False)
     read_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Clearing the "new message" badge of a table
+            models.Index(fields=['device', 'new_message'], name='chat_device_new_idx'),
+            # Guest chat history
+            models.Index(fields=['guest_session', 'timestamp'], name='chat_session_ts_idx'),
+            # Unread counters only ever look at unread device messages
+            models.Index(
+                fields=['restaurant', 'device'], name='chat_unread_from_device_idx',
+                condition=models.Q(is_read=False, is_from_device=True),
+            ),
+        ]
+
     def __str__(self):
         if self.is_from_device:
             return f"Device Msg: {self.device} -> {self.restaurant}"
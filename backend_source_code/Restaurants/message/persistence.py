@@ -0,0 +1,170 @@
+"""
+Chat message persistence.
+
+The consumers build an unsaved ChatMessage (its client_id and timestamp are
+set in memory) and hand it to `persist(message)`:
+
+* "sync" mode (default): the row is inserted before the message is
+  broadcast, one INSERT per message.
+* "write_behind" mode: the message is buffered and broadcast right away; a
+  background writer thread inserts the buffer with one bulk_create per batch
+  once BATCH_SIZE messages are waiting or the oldest has waited
+  FLUSH_INTERVAL seconds. A process that dies without warning loses at most
+  that window; `drain()` flushes everything at interpreter exit.
+
+Rows are keyed by client_id, so writing a batch twice never duplicates it.
+A batch the database refuses is retried row by row and only the rows that
+still fail are dropped (and logged).
+"""
+import atexit
+import logging
+import threading
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+
+from .models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MODE': 'sync',  # "sync" or "write_behind"
+    'BATCH_SIZE': 50,
+    'FLUSH_INTERVAL': 0.25,  # seconds
+}
+
+# (queued_at, message), oldest first
+_buffer = []
+_condition = threading.Condition()
+_writing = 0
+_writer = None
+
+
+def _config(name):
+    return getattr(settings, 'CHAT_PERSISTENCE', {}).get(name, DEFAULTS[name])
+
+
+def mode():
+    return _config('MODE')
+
+
+async def persist(message):
+    """Save `message`, or queue it for the writer in write-behind mode (no database access)."""
+    if mode() == 'write_behind':
+        _submit(message)
+    else:
+        await database_sync_to_async(message.save)()
+    return message
+
+
+def _submit(message):
+    with _condition:
+        _buffer.append((time.monotonic(), message))
+        _condition.notify_all()
+    _ensure_writer()
+
+
+def _take(force=False):
+    """The next batch to write, or [] if none is due yet. Caller holds _condition."""
+    global _writing
+    if not _buffer:
+        return []
+    batch_size = _config('BATCH_SIZE')
+    if not force and len(_buffer) < batch_size and time.monotonic() - _buffer[0][0] < _config('FLUSH_INTERVAL'):
+        return []
+    batch = [message for _, message in _buffer[:batch_size]]
+    del _buffer[:batch_size]
+    _writing += 1
+    return batch
+
+
+def _wait_time():
+    if not _buffer:
+        return None
+    return max(_config('FLUSH_INTERVAL') - (time.monotonic() - _buffer[0][0]), 0)
+
+
+def _insert(batch):
+    try:
+        with transaction.atomic():
+            ChatMessage.objects.bulk_create(batch, ignore_conflicts=True)
+    except DatabaseError as e:
+        logger.error(f"Chat batch of {len(batch)} failed, writing row by row: {e}")
+        for message in batch:
+            try:
+                with transaction.atomic():
+                    ChatMessage.objects.bulk_create([message], ignore_conflicts=True)
+            except DatabaseError as e:
+                logger.error(f"Dropping chat message {message.client_id}: {e}")
+
+
+def _write(batch):
+    global _writing
+    try:
+        _insert(batch)
+    finally:
+        with _condition:
+            _writing -= 1
+            _condition.notify_all()
+
+
+class _Writer(threading.Thread):
+    """Writes the buffer in size- or time-bounded batches until it is replaced."""
+
+    def __init__(self):
+        super().__init__(name='chat-writer', daemon=True)
+
+    def run(self):
+        while True:
+            with _condition:
+                batch = _take()
+                while not batch:
+                    if _writer is not self:
+                        return
+                    _condition.wait(_wait_time())
+                    batch = _take()
+            try:
+                _write(batch)
+            except Exception:
+                logger.exception('Chat writer error')
+            finally:
+                close_old_connections()
+
+
+def _ensure_writer():
+    global _writer
+    with _condition:
+        if _writer is None or not _writer.is_alive():
+            _writer = _Writer()
+            _writer.start()
+
+
+def pending():
+    """Messages accepted but not yet written."""
+    with _condition:
+        return len(_buffer) + _writing
+
+
+def flush():
+    """Write everything buffered right now, on the calling thread."""
+    while True:
+        with _condition:
+            batch = _take(force=True)
+        if not batch:
+            return
+        _write(batch)
+
+
+def drain(timeout=5.0):
+    """
+    Write every buffered message and wait for the writer's batch in flight.
+    Returns False if the timeout expired first. Also runs at interpreter exit.
+    """
+    flush()
+    with _condition:
+        return _condition.wait_for(lambda: not _writing, timeout)
+
+
+atexit.register(drain)
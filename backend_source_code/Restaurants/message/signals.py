@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import User
+from device.models import GuestSession
+from restaurant.models import Restaurant
+from .handshake import forget_guest_session, forget_identity
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_identity(sender, instance, **kwargs):
+    forget_identity(instance.pk)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def forget_owner_identity(sender, instance, **kwargs):
+    """The handshake carries the id of the owner's restaurant."""
+    forget_identity(instance.owner_id)
+
+
+@receiver(post_save, sender=GuestSession)
+@receiver(post_delete, sender=GuestSession)
+def forget_cached_guest_session(sender, instance, **kwargs):
+    # A closed session must stop opening sockets right away
+    forget_guest_session(instance.session_token)
@@ -1,3 +1,443 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.core.signals import request_finished, request_started
+from django.db import DatabaseError, connections, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from device.models import Device, GuestSession
+from restaurant.models import BusinessDay, Restaurant
+from . import broadcast, handshake, persistence, routing
+from .middleware import JWTAuthMiddleware
+from .models import ChatMessage
+
+
+class BroadcastBusTests(TestCase):
+
+    def setUp(self):
+        broadcast.reset_stats()
+        self.layer = mock.Mock(group_send=mock.AsyncMock())
+        patcher = mock.patch('message.broadcast.get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sent(self):
+        return [(call.args[0], call.args[1]['type']) for call in self.layer.group_send.call_args_list]
+
+    def test_event_is_held_until_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            broadcast.publish('restaurant_1', {'type': 'order_created'})
+            self.assertEqual(self.sent(), [])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.sent(), [('restaurant_1', 'order_created')])
+
+    def test_rolled_back_events_are_never_sent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    broadcast.publish('restaurant_1', {'type': 'order_created'})
+                    raise ValueError
+            except ValueError:
+                pass
+            broadcast.publish('restaurant_1', {'type': 'order_deleted'})
+
+        self.assertEqual(self.sent(), [('restaurant_1', 'order_deleted')])
+
+    def test_request_events_are_flushed_as_one_batch_when_request_finishes(self):
+        request_started.send(sender=self.__class__)
+        with self.captureOnCommitCallbacks(execute=True):
+            broadcast.publish('restaurant_1', {'type': 'order_created'})
+            broadcast.publish('session_1', {'type': 'order_status_update'})
+        self.assertEqual(self.sent(), [])
+        self.assertEqual(broadcast.stats()['queue_depth'], 2)
+
+        request_finished.send(sender=self.__class__)
+
+        self.assertEqual(self.sent(), [('restaurant_1', 'order_created'), ('session_1', 'order_status_update')])
+        stats = broadcast.stats()
+        self.assertEqual((stats['queue_depth'], stats['delivered'], stats['batches']), (0, 2, 1))
+
+    @override_settings(BROADCAST_BUS={'MODE': 'inline', 'MAX_RETRIES': 2, 'RETRY_BACKOFF': 0})
+    def test_failed_sends_are_retried_then_dropped(self):
+        self.layer.group_send.side_effect = [ConnectionError, None, ConnectionError, ConnectionError, ConnectionError]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            broadcast.publish('restaurant_1', {'type': 'order_created'})
+            broadcast.publish('restaurant_1', {'type': 'order_deleted'})
+
+        stats = broadcast.stats()
+        self.assertEqual((stats['delivered'], stats['retried'], stats['dropped']), (1, 3, 1))
+        self.assertEqual(self.layer.group_send.call_count, 5)
+
+    @override_settings(BROADCAST_BUS={'MODE': 'thread', 'BATCH_SIZE': 10})
+    def test_thread_mode_delivers_in_background(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(25):
+                broadcast.publish(f'device_{n}', {'type': 'order_status_update'})
+
+        self.assertTrue(broadcast.drain(timeout=5))
+        self.assertEqual(len(self.sent()), 25)
+        stats = broadcast.stats()
+        self.assertEqual((stats['mode'], stats['queue_depth'], stats['delivered']), ('thread', 0, 25))
+        self.assertGreaterEqual(stats['batches'], 3)
+        self.assertGreater(stats['latency_ms']['max'], 0)
+
+
+class HandshakeAuthTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        table_user = User.objects.create_user(email='t1@example.com', username='t1', password='x', role='customer')
+        cls.device = Device.objects.create(table_name='Table 1', restaurant=cls.restaurant, user=table_user)
+        cls.session = GuestSession.objects.create(
+            device=cls.device, session_token='3b0c6f1e-guest', expires_at=now() + timedelta(hours=1)
+        )
+
+    def connect(self, token=None, protocol=None):
+        """The scope the consumer would see for a handshake."""
+        seen = {}
+
+        async def app(scope, receive, send):
+            seen.update(scope)
+
+        headers = [(b'sec-websocket-protocol', f'Bearer {protocol}'.encode())] if protocol else []
+        query = f'token={token}'.encode() if token else b''
+        scope = {'type': 'websocket', 'headers': headers, 'query_string': query}
+        async_to_sync(JWTAuthMiddleware(app))(scope, None, None)
+        return seen
+
+    def token(self, user):
+        return str(RefreshToken.for_user(user).access_token)
+
+    def test_user_handshake_is_one_query_then_cached(self):
+        token = self.token(self.owner)
+        with self.assertNumQueries(1):
+            scope = self.connect(protocol=token)
+        self.assertEqual(scope['user'], self.owner)
+        self.assertEqual(scope['user_info']['restaurants_id'], self.restaurant.id)
+        self.assertEqual(scope['user_info']['role'], 'owner')
+        self.assertEqual(scope['subprotocol'], f'Bearer {token}')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.connect(token=token)['user'], self.owner)
+        # The shared cache holds public fields only
+        cached = handshake.WS_IDENTITIES.get(self.owner.pk)
+        self.assertEqual(set(cached), {'user_info'})
+        self.assertEqual(set(cached['user_info']), {'id', 'username', 'email', 'role', 'restaurants_id'})
+        self.assertEqual(scope['user'].username, 'owner')
+
+    def test_guest_session_handshake_loads_the_device_with_it(self):
+        with self.assertNumQueries(1):
+            scope = self.connect(token=self.session.session_token)
+        self.assertIsInstance(scope['user'], AnonymousUser)
+        with self.assertNumQueries(0):
+            # Consumers read the device from the event loop
+            self.assertEqual(scope['guest_session'].device.id, self.device.id)
+            self.connect(token=self.session.session_token)
+
+    def test_rejected_tokens(self):
+        self.assertIsNone(self.connect()['user'])
+        self.assertIsNone(self.connect(token='not.a.jwt')['user'])
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.connect(token='unknown-session')['user'])
+            # Misses are cached as well
+            self.assertIsNone(self.connect(token='unknown-session')['user'])
+        self.assertIsInstance(self.connect(token='guest_token')['user'], AnonymousUser)
+
+    def test_closing_the_session_drops_it(self):
+        self.connect(token=self.session.session_token)
+        self.session.is_active = False
+        self.session.save()
+        self.assertIsNone(self.connect(token=self.session.session_token)['user'])
+
+    def test_logout_and_ownership_changes_reload_the_user(self):
+        token = self.token(self.owner)
+        self.connect(token=token)
+
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        self.assertEqual(client.post(reverse('logout'), {}, format='json').status_code, 200)
+        with self.assertNumQueries(1):
+            self.connect(token=token)
+
+        self.restaurant.delete()
+        self.assertIsNone(self.connect(token=token)['user_info']['restaurants_id'])
+
+
+class ChatSocketTestCase(TestCase):
+    """A restaurant with one table, its open business day and a guest session."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        cls.table_user = User.objects.create_user(email='t1@example.com', username='t1', password='x', role='customer')
+        cls.device = Device.objects.create(table_name='Table 1', restaurant=cls.restaurant, user=cls.table_user)
+        cls.day = BusinessDay.objects.create(restaurant=cls.restaurant, is_active=True)
+        cls.session = GuestSession.objects.create(
+            device=cls.device, session_token='5d1f-guest', expires_at=now() + timedelta(hours=1)
+        )
+
+    def chat(self, token, script):
+        app = JWTAuthMiddleware(URLRouter(routing.websocket_urlpatterns))
+
+        async def run():
+            communicator = WebsocketCommunicator(
+                app, f'/ws/chat/{self.device.id}/?token={token}&restaurant_id={self.restaurant.id}'
+            )
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            try:
+                await script(communicator)
+            finally:
+                await communicator.disconnect()
+
+        async_to_sync(run)()
+
+    async def say(self, communicator, text):
+        await communicator.send_json_to({'message': text})
+        # Once for the table room, once for the restaurant group
+        await communicator.receive_json_from()
+        return await communicator.receive_json_from()
+
+
+class ChatContextTests(ChatSocketTestCase):
+    """ChatConsumer resolves device, restaurant and business day once per socket."""
+
+    def test_each_message_is_a_single_insert(self):
+        counts = []
+
+        async def script(communicator):
+            # The consumer's queries run on this test's thread and connection
+            for text in ('Water please', 'And the bill'):
+                start = len(ctx)
+                await self.say(communicator, text)
+                counts.append([q['sql'].split()[0] for q in ctx.captured_queries[start:]])
+
+        # The connection object itself: `connection` would resolve to the event loop thread's
+        with CaptureQueriesContext(connections['default']) as ctx:
+            self.chat(self.session.session_token, script)
+
+        self.assertEqual(counts, [['INSERT'], ['INSERT']])
+        message = ChatMessage.objects.get(message='Water please')
+        self.assertEqual(
+            (message.sender_id, message.receiver_id, message.device_id, message.restaurant_id,
+             message.business_day_id, message.guest_session_id, message.is_from_device),
+            (self.table_user.id, self.owner.id, self.device.id, self.restaurant.id, self.day.id, self.session.id, True),
+        )
+
+    def test_staff_messages_go_to_the_table_user(self):
+        async def script(communicator):
+            await self.say(communicator, 'On its way')
+
+        self.chat(str(RefreshToken.for_user(self.owner).access_token), script)
+
+        message = ChatMessage.objects.get()
+        self.assertEqual((message.sender_id, message.receiver_id, message.is_from_device),
+                         (self.owner.id, self.table_user.id, False))
+
+    def test_business_day_change_reaches_open_sockets(self):
+        async def script(communicator):
+            await self.say(communicator, 'Before close')
+            await database_sync_to_async(self.close_day)()
+            await get_channel_layer().group_send(f'restaurant_{self.restaurant.id}', {'type': 'business_day_changed'})
+            await self.say(communicator, 'After close')
+
+        self.chat(self.session.session_token, script)
+
+        days = dict(ChatMessage.objects.values_list('message', 'business_day_id'))
+        self.assertEqual(days, {'Before close': self.day.id, 'After close': None})
+
+    def close_day(self):
+        self.day.is_active = False
+        self.day.save()
+
+    def test_business_day_saves_are_announced(self):
+        layer = mock.Mock(group_send=mock.AsyncMock())
+        with mock.patch('message.broadcast.get_channel_layer', return_value=layer), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.close_day()
+        layer.group_send.assert_called_once_with(f'restaurant_{self.restaurant.id}', {'type': 'business_day_changed'})
+
+
+WRITE_BEHIND = {'MODE': 'write_behind', 'BATCH_SIZE': 4, 'FLUSH_INTERVAL': 1.0}
+
+
+@override_settings(CHAT_PERSISTENCE=WRITE_BEHIND)
+class WriteBehindTests(ChatSocketTestCase):
+    """Write-behind chat persistence: broadcast first, bulk_create in bounded batches."""
+
+    def setUp(self):
+        self.clock = 0.0
+        clock = mock.patch('message.persistence.time.monotonic', side_effect=lambda: self.clock)
+        clock.start()
+        self.addCleanup(clock.stop)
+        # The writer thread would need its own database connection; tests drive it by hand
+        no_writer = mock.patch('message.persistence._ensure_writer')
+        no_writer.start()
+        self.addCleanup(no_writer.stop)
+        self.addCleanup(persistence._buffer.clear)
+
+    def message(self, text):
+        return ChatMessage(
+            sender=self.table_user, receiver=self.owner, device=self.device, restaurant=self.restaurant,
+            message=text, is_from_device=True, room_name='room', new_message=True,
+        )
+
+    def tick(self):
+        """What the writer does when it wakes up: write every batch that is due."""
+        batches = []
+        while True:
+            with persistence._condition:
+                batch = persistence._take()
+            if not batch:
+                return batches
+            persistence._write(batch)
+            batches.append([message.message for message in batch])
+
+    def test_messages_are_broadcast_before_they_are_written(self):
+        events = []
+
+        async def script(communicator):
+            for text in ('Water please', 'And the bill'):
+                events.append(await self.say(communicator, text))
+
+        with CaptureQueriesContext(connections['default']) as ctx:
+            self.chat(self.session.session_token, script)
+
+        self.assertNotIn('INSERT', [q['sql'].split()[0] for q in ctx.captured_queries])
+        self.assertFalse(ChatMessage.objects.exists())
+        self.assertEqual(persistence.pending(), 2)
+
+        with CaptureQueriesContext(connections['default']) as ctx:
+            self.assertTrue(persistence.drain())
+        self.assertEqual([q['sql'].split()[0] for q in ctx.captured_queries if 'chat' in q['sql']], ['INSERT'])
+
+        # The id and timestamp the sockets saw are the stored ones
+        stored = {str(m.client_id): str(m.timestamp) for m in ChatMessage.objects.all()}
+        self.assertEqual(stored, {event['id']: event['timestamp'] for event in events})
+        self.assertEqual(persistence.pending(), 0)
+
+    def test_batches_are_bounded_by_size_and_time(self):
+        for n in range(10):
+            persistence._submit(self.message(f'm{n}'))
+
+        # Two full batches are due at once, the remainder only when its oldest message is FLUSH_INTERVAL old
+        self.assertEqual(self.tick(), [['m0', 'm1', 'm2', 'm3'], ['m4', 'm5', 'm6', 'm7']])
+        self.clock = 0.9
+        self.assertEqual(self.tick(), [])
+        self.clock = 1.0
+        self.assertEqual(self.tick(), [['m8', 'm9']])
+        self.assertEqual(ChatMessage.objects.count(), 10)
+
+    def test_crash_loses_at_most_the_last_window(self):
+        # A message every 0.3s, the writer looking every 0.1s
+        queued_at = {}
+        for step in range(68):
+            self.clock = step / 10
+            if step % 3 == 0:
+                text = f'm{len(queued_at)}'
+                queued_at[text] = self.clock
+                persistence._submit(self.message(text))
+            self.tick()
+        crashed_at = self.clock
+
+        # The process dies: whatever is still buffered is gone
+        persistence._buffer.clear()
+
+        written = set(ChatMessage.objects.values_list('message', flat=True))
+        lost = set(queued_at) - written
+        self.assertTrue(lost)
+        self.assertLess(len(lost), WRITE_BEHIND['BATCH_SIZE'])
+        for text in lost:
+            self.assertLess(crashed_at - queued_at[text], WRITE_BEHIND['FLUSH_INTERVAL'])
+
+        # A batch written again (e.g. retried after a restart) does not duplicate rows
+        persistence._insert([self.message('again')] + list(ChatMessage.objects.all()))
+        self.assertEqual(ChatMessage.objects.count(), len(written) + 1)
+
+    def test_a_refused_row_does_not_sink_its_batch(self):
+        bulk_create = ChatMessage.objects.bulk_create
+
+        def refuse_orphans(batch, **kwargs):
+            if any(message.message == 'orphan' for message in batch):
+                raise DatabaseError('refused')
+            return bulk_create(batch, **kwargs)
+
+        persistence._submit(self.message('fine'))
+        persistence._submit(self.message('orphan'))
+        with mock.patch.object(ChatMessage.objects, 'bulk_create', side_effect=refuse_orphans), \
+                self.assertLogs('message.persistence', 'ERROR') as logs:
+            persistence.flush()
+        self.assertEqual(len(logs.records), 2)  # the batch, then the one row
+        self.assertEqual(list(ChatMessage.objects.values_list('message', flat=True)), ['fine'])
+
+
+@override_settings(CHAT_PERSISTENCE={'MODE': 'write_behind', 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 0.05})
+class WriterThreadTests(TestCase):
+
+    def setUp(self):
+        self.batches = []
+        insert = mock.patch('message.persistence._insert', side_effect=lambda batch: self.batches.append(len(batch)))
+        insert.start()
+        self.addCleanup(insert.stop)
+        self.addCleanup(self.retire_writer)
+
+    def retire_writer(self):
+        writer = persistence._writer
+        with persistence._condition:
+            persistence._writer = None
+            persistence._condition.notify_all()
+        if writer is not None:
+            writer.join(timeout=1)
+            self.assertFalse(writer.is_alive())
+
+    def wait_until_written(self):
+        deadline = time.monotonic() + 2
+        while persistence.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(persistence.pending(), 0)
+
+    def test_writer_flushes_on_interval_and_on_size(self):
+        persistence._submit(ChatMessage(message='one'))
+        persistence._submit(ChatMessage(message='two'))
+        self.wait_until_written()
+        self.assertEqual(self.batches, [2])
+
+        with override_settings(CHAT_PERSISTENCE={'MODE': 'write_behind', 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 60}):
+            for n in range(3):
+                persistence._submit(ChatMessage(message=str(n)))
+            self.wait_until_written()
+        self.assertEqual(self.batches, [2, 3])
+
+    def test_drain_flushes_what_the_writer_has_not(self):
+        with override_settings(CHAT_PERSISTENCE={'MODE': 'write_behind', 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 60}):
+            persistence._submit(ChatMessage(message='late'))
+            self.assertEqual(self.batches, [])
+            self.assertTrue(persistence.drain(timeout=1))
+        self.assertEqual(self.batches, [1])
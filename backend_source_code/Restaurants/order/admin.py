@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, SalesRollup
 
 class OrderItemInline(admin.TabularInline):  # or use StackedInline
     model = OrderItem
@@ -19,3 +19,10 @@ class OrderAdmin(admin.ModelAdmin):
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('order', 'item', 'quantity', 'price')
     search_fields = ('order__id', 'item__item_name')
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('restaurant', 'business_day', 'bucket', 'revenue', 'order_count', 'tips')
+    list_filter = ('restaurant',)
+    readonly_fields = ('restaurant', 'business_day', 'bucket', 'revenue', 'order_count', 'tips')
@@ -13,4 +13,8 @@ PAYMENT_STATUS = [
     ('unpaid', 'Unpaid'),
     ('pending_cash', 'Pending Cash'), # New status
     ('paid', 'Paid'),
-]
\ No newline at end of file
+]
+
+
+# Statuses that count as a sale for the SalesRollup tables
+SOLD_STATUSES = ('completed', 'paid')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from order.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the hourly SalesRollup tables from order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurant', type=int, default=None,
+                            help='Only rebuild rollups for this restaurant id')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        restaurant_id = options['restaurant']
+        scope = f"restaurant {restaurant_id}" if restaurant_id else "all restaurants"
+        self.stdout.write(f"Rebuilding sales rollups for {scope}...")
+
+        written = rebuild_rollups(restaurant_id=restaurant_id, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"✓ Wrote {written} hourly buckets"))
@@ -0,0 +1,115 @@
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import User
+from device.models import Device
+from order.models import Order
+from order.pagination import OrderFeedPagination
+from restaurant.models import Restaurant
+
+
+@contextmanager
+def explicit_created_time():
+    """Let bulk_create write our own created_time values instead of now()."""
+    field = Order._meta.get_field('created_time')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks page-number vs cursor pagination of the order feed on a seeded table (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1_000_000, help='Orders to seed')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--pages', default='1,10,100,1000,10000,50000',
+                            help='Comma separated page numbers to fetch')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per measurement (best is kept)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert while seeding')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            restaurant = self.seed(options['orders'], options['batch_size'])
+            self.compare(restaurant, options)
+            # Never keep the benchmark data
+            transaction.set_rollback(True)
+
+    def seed(self, count, batch_size):
+        self.stdout.write(f"Seeding {count} orders...")
+        started = time.perf_counter()
+
+        owner = User.objects.create_user(
+            email='bench-owner@example.invalid', username='bench-owner', password=None, role='owner'
+        )
+        restaurant = Restaurant.objects.create(
+            resturent_name='Pagination Benchmark', location='-', phone_number='+000000000', owner=owner
+        )
+        table_user = User.objects.create_user(
+            email='bench-table@example.invalid', username='bench-table', password=None, role='customer'
+        )
+        device = Device.objects.create(table_name='Bench', user=table_user, restaurant=restaurant)
+
+        start = timezone.now()
+        statuses = ['pending', 'preparing', 'served', 'completed']
+        with explicit_created_time():
+            for offset in range(0, count, batch_size):
+                Order.objects.bulk_create([
+                    Order(
+                        device=device, restaurant=restaurant, total_price=Decimal('10.00'),
+                        status=statuses[n % len(statuses)],
+                        # a few orders share each second, so the id tie-breaker is exercised
+                        created_time=start - timedelta(seconds=n // 3),
+                    )
+                    for n in range(offset, min(offset + batch_size, count))
+                ])
+
+        self.stdout.write(f"  seeded in {time.perf_counter() - started:.1f}s")
+        return restaurant
+
+    def compare(self, restaurant, options):
+        page_size = options['page_size']
+        repeat = options['repeat']
+        total = options['orders']
+        queryset = Order.objects.filter(restaurant=restaurant).order_by('-created_time', '-id')
+        factory = APIRequestFactory()
+
+        def fetch(params):
+            request = Request(factory.get('/orders/', {'page_size': page_size, **params}))
+            return OrderFeedPagination().paginate_queryset(queryset, request)
+
+        def best_of(params):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                fetch(params)
+                timings.append(time.perf_counter() - started)
+            return min(timings) * 1000
+
+        self.stdout.write(f"{'page':>8} {'page-number (ms)':>18} {'cursor (ms)':>12} {'cursor+count (ms)':>18}")
+        for page in [int(p) for p in options['pages'].split(',') if p.strip()]:
+            if (page - 1) * page_size >= total:
+                continue
+
+            cursor_params = {'pagination': 'cursor'}
+            if page > 1:
+                # Cursor of the last row on the previous page (found outside the timing)
+                anchor = queryset[(page - 1) * page_size - 1]
+                cursor_params['cursor'] = OrderFeedPagination().encode_cursor(anchor)
+
+            page_number_ms = best_of({'page': page})
+            cursor_ms = best_of(cursor_params)
+            counted_ms = best_of({**cursor_params, 'include_count': 'true'})
+            self.stdout.write(f"{page:>8} {page_number_ms:>18.2f} {cursor_ms:>12.2f} {counted_ms:>18.2f}")
+
+        self.stdout.write(self.style.SUCCESS("✓ Benchmark finished (seed data rolled back)"))
@@ -0,0 +1,134 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from device.models import GuestSession
+from message.models import ChatMessage
+from order.models import Order, SalesRollup
+from payment.models import Payment
+
+
+def hot_queries():
+    """
+    The queries the busiest views run, as (name, queryset). Ids are placeholders:
+    the plan depends on the shape of the query, not on the values.
+    """
+    since = timezone.now() - timedelta(days=1)
+    ongoing = ['pending', 'preparing', 'served']
+    return [
+        ("order feed page (owner/kitchen)",
+         Order.objects.filter(restaurant_id=1).order_by('-created_time', '-id')[:11]),
+        ("order delta sync (?since=)",
+         Order.objects.filter(restaurant_id=1, updated_time__gt=since).order_by('updated_time', 'id')[:201]),
+        ("orders by status in a restaurant",
+         Order.objects.filter(restaurant_id=1, status__in=ongoing, created_time__gte=since)),
+        ("blocking orders of a business day",
+         Order.objects.filter(business_day_id=1, status__in=ongoing)),
+        ("unpaid orders of a guest session",
+         Order.objects.filter(guest_session_id=1, payment_status__in=['unpaid', 'pending', 'pending_cash'])),
+        ("new chat messages of a table",
+         ChatMessage.objects.filter(device_id=1, new_message=True)),
+        ("guest chat history",
+         ChatMessage.objects.filter(guest_session_id=1).order_by('timestamp')),
+        ("unread device messages for a restaurant",
+         ChatMessage.objects.filter(restaurant_id__in=[1], is_read=False, is_from_device=True)),
+        ("active session of a table",
+         GuestSession.objects.filter(device_id=1, is_active=True)),
+        ("session by token",
+         GuestSession.objects.filter(session_token='token', is_active=True)),
+        ("completed payments of orders",
+         Payment.objects.filter(order_id__in=[1, 2], status='completed')),
+        ("restaurant payments list",
+         Payment.objects.filter(restaurant_id=1).order_by('-created_at')),
+        ("sales rollup range",
+         SalesRollup.objects.filter(restaurant_id=1, bucket__gte=since)),
+    ]
+
+
+def sqlite_findings(plan):
+    """
+    `plan` is Django's rendering of EXPLAIN QUERY PLAN, one "id parent notused
+    detail" row per line. "SCAN <table>" without an index is a full table
+    scan; "USE TEMP B-TREE" is a sort the index could not provide.
+    """
+    findings = []
+    for line in plan.splitlines():
+        parts = line.split(None, 3)
+        if len(parts) == 4 and all(part.isdigit() for part in parts[:3]):
+            detail = parts[3]
+        else:
+            detail = line.strip(' |`-')
+        if detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail:
+            findings.append(('seq_scan', detail[len('SCAN '):].split()[0]))
+        elif detail.startswith('USE TEMP B-TREE'):
+            findings.append(('sort', detail))
+    return findings
+
+
+def postgres_findings(plan):
+    """`plan` is EXPLAIN (FORMAT JSON) output; walk it for Seq Scan / Sort nodes."""
+    findings = []
+    stack = [node['Plan'] for node in json.loads(plan)]
+    while stack:
+        node = stack.pop()
+        if node.get('Node Type') == 'Seq Scan':
+            findings.append(('seq_scan', node.get('Relation Name')))
+        elif node.get('Node Type') == 'Sort':
+            findings.append(('sort', ', '.join(node.get('Sort Key', []))))
+        stack.extend(node.get('Plans', []))
+    return findings
+
+
+def explain(queryset):
+    """Returns (plan text, findings) for the current database vendor."""
+    if connection.vendor == 'postgresql':
+        plan = queryset.explain(format='json')
+        return plan, postgres_findings(plan)
+    if connection.vendor == 'sqlite':
+        plan = queryset.explain()
+        return plan, sqlite_findings(plan)
+    raise CommandError(f"explain_hot_queries does not support {connection.vendor}")
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN over the hot query catalog and reports sequential scans (SQLite and Postgres)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan in full')
+        parser.add_argument('--no-force-index', action='store_true',
+                            help="Postgres: keep enable_seqscan on (small tables will then always seq scan)")
+        parser.add_argument('--fail-on-seq-scan', action='store_true',
+                            help='Exit with an error if any query needs a sequential scan (for CI)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Explaining hot queries on {connection.vendor}...")
+        seq_scans = []
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql' and not options['no_force_index']:
+                # Empty dev/test tables are cheaper to scan; ask whether an index is usable at all
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for name, queryset in hot_queries():
+                plan, findings = explain(queryset)
+                scans = [target for kind, target in findings if kind == 'seq_scan']
+                sorts = [target for kind, target in findings if kind == 'sort']
+
+                if scans:
+                    seq_scans.append((name, scans))
+                    self.stdout.write(self.style.ERROR(f"✗ {name}: sequential scan on {', '.join(scans)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"✓ {name}"))
+                if sorts:
+                    self.stdout.write(self.style.WARNING(f"    sort not served by an index: {'; '.join(sorts)}"))
+                if options['verbose_plans'] or scans:
+                    for line in plan.splitlines():
+                        self.stdout.write(f"    {line}")
+
+        if seq_scans and options['fail_on_seq_scan']:
+            raise CommandError(f"{len(seq_scans)} hot queries need a sequential scan")
+        self.stdout.write(f"{len(seq_scans)} of {len(hot_queries())} hot queries use sequential scans")
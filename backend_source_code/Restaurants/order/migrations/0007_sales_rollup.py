@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0006_order_business_day'),
+        ('restaurant', '0011_businessday_closed_by_businessday_total_card_payment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='sales_recorded',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('tips', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('business_day', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='restaurant.businessday')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='restaurant.restaurant')),
+            ],
+            options={
+                'ordering': ['bucket'],
+                'unique_together': {('restaurant', 'business_day', 'bucket')},
+            },
+        ),
+    ]
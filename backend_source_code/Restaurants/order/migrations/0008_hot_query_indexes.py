@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0015_hot_query_indexes'),
+        ('order', '0007_sales_rollup'),
+        ('restaurant', '0011_businessday_closed_by_businessday_total_card_payment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['restaurant', '-created_time', '-id'], name='order_rest_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['restaurant', 'status', 'created_time'], name='order_rest_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['business_day', 'status'], name='order_bday_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['guest_session', 'payment_status'], name='order_session_payment_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0015_hot_query_indexes'),
+        ('order', '0008_hot_query_indexes'),
+        ('restaurant', '0011_businessday_closed_by_businessday_total_card_payment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['restaurant', 'updated_time', 'id'], name='order_rest_updated_idx'),
+        ),
+    ]
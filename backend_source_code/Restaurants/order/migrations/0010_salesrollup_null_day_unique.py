@@ -0,0 +1,48 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_null_day_buckets(apps, schema_editor):
+    """Folds duplicate NULL-day buckets into one so the new constraint can be created."""
+    SalesRollup = apps.get_model('order', 'SalesRollup')
+    duplicates = (
+        SalesRollup.objects.filter(business_day__isnull=True)
+        .values('restaurant_id', 'bucket').annotate(rows=Count('id')).filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        rollups = list(SalesRollup.objects.filter(
+            restaurant_id=duplicate['restaurant_id'], business_day__isnull=True, bucket=duplicate['bucket'],
+        ).order_by('pk'))
+        keep = rollups[0]
+        for rollup in rollups[1:]:
+            keep.revenue += rollup.revenue
+            keep.order_count += rollup.order_count
+            keep.tips += rollup.tips
+        keep.save(update_fields=['revenue', 'order_count', 'tips'])
+        SalesRollup.objects.filter(pk__in=[rollup.pk for rollup in rollups[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0009_order_updated_time_index'),
+        ('restaurant', '0013_restaurant_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_null_day_buckets, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='salesrollup',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('business_day__isnull', False)), fields=('restaurant', 'business_day', 'bucket'), name='salesrollup_day_bucket_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('business_day__isnull', True)), fields=('restaurant', 'bucket'), name='salesrollup_no_day_bucket_uniq'),
+        ),
+    ]
@@ -1,9 +1,16 @@
-from django.db import models
+from django.db import models, transaction
 from device.models import Device
 from restaurant.models import Restaurant
 from item.models import Item
 from .constants import STATUS,PAYMENT_STATUS 
 
+# Fields whose change can move an order in or out of its SalesRollup bucket
+ROLLUP_FIELDS = {
+    'status', 'total_price', 'tip_amount', 'restaurant', 'restaurant_id',
+    'business_day', 'business_day_id', 'created_time', 'sales_recorded',
+}
+
+
 class Order(models.Model):
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='orders')
     guest_session = models.ForeignKey('device.GuestSession', on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
@@ -17,11 +24,35 @@ class Order(models.Model):
     tip_type = models.CharField(max_length=20, choices=[('percentage','Percentage'), ('custom_amount','Custom Amount'), ('custom_percentage','Custom Percentage')], default='custom_amount', null=True, blank=True)
     created_time = models.DateTimeField(auto_now_add=True)
     updated_time = models.DateTimeField(auto_now=True)
+    # Set once the order has been added to its SalesRollup bucket (see order/rollups.py)
+    sales_recorded = models.BooleanField(default=False, editable=False)
 
     
     class Meta:
         ordering = ['-created_time']
-        
+        indexes = [
+            # Owner/kitchen feeds: keyset pagination on (created_time, id) per restaurant
+            models.Index(fields=['restaurant', '-created_time', '-id'], name='order_rest_feed_idx'),
+            # Dashboards and stats filtered by status within a restaurant
+            models.Index(fields=['restaurant', 'status', 'created_time'], name='order_rest_status_created_idx'),
+            # Business day open/close checks
+            models.Index(fields=['business_day', 'status'], name='order_bday_status_idx'),
+            # Unpaid orders of a guest session (bulk checkout, close table)
+            models.Index(fields=['guest_session', 'payment_status'], name='order_session_payment_idx'),
+            # Delta sync (?since=<cursor>) walks (updated_time, id) per restaurant
+            models.Index(fields=['restaurant', 'updated_time', 'id'], name='order_rest_updated_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or (update_fields is not None and not ROLLUP_FIELDS.intersection(update_fields)):
+            return super().save(*args, **kwargs)
+        # sales_recorded belongs to order/rollups.py: the locked row supplies it (a stale
+        # instance never writes it back) and a counted order's bucket follows this write
+        from .rollups import resync_sale
+        with transaction.atomic():
+            resync_sale(self, update_fields)
+            super().save(*args, **kwargs)
         
     def __str__(self):
         return f"Order #{self.id} - {self.status}"
@@ -61,3 +92,34 @@ class CartItem(models.Model):
 
 
 
+
+
+
+class SalesRollup(models.Model):
+    """
+    Hourly sales totals per restaurant (and business day), maintained as orders
+    are sold so dashboards never have to rescan the Order table.
+    """
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='sales_rollups')
+    business_day = models.ForeignKey('restaurant.BusinessDay', on_delete=models.SET_NULL, null=True, blank=True, related_name='sales_rollups')
+    bucket = models.DateTimeField()  # Order.created_time truncated to the hour
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    order_count = models.PositiveIntegerField(default=0)
+    tips = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+
+    class Meta:
+        ordering = ['bucket']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['restaurant', 'business_day', 'bucket'], condition=models.Q(business_day__isnull=False),
+                name='salesrollup_day_bucket_uniq',
+            ),
+            # NULLs are distinct to a plain unique index, so buckets without a day need their own
+            models.UniqueConstraint(
+                fields=['restaurant', 'bucket'], condition=models.Q(business_day__isnull=True),
+                name='salesrollup_no_day_bucket_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id} @ {self.bucket:%Y-%m-%d %H:00} - {self.order_count} orders"
@@ -1,6 +1,166 @@
+import base64
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(moment, pk):
+    """Opaque cursor for a (timestamp, id) position."""
+    raw = f"{moment.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(encoded):
+    """Inverse of encode_cursor; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+        moment, pk = raw.rsplit('|', 1)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('malformed cursor')
+    moment = parse_datetime(moment)
+    if moment is None:
+        raise ValueError('malformed cursor')
+    return moment, int(pk)
 
 
 class TenPerPagePagination(PageNumberPagination):
     page_size = 10
-    page_size_query_param = 'page_size'
\ No newline at end of file
+    page_size_query_param = 'page_size'
+
+
+class OrderFeedPagination(TenPerPagePagination):
+    """
+    Page-number pagination by default. Clients polling a feed can opt in to
+    keyset pagination with `?pagination=cursor`: rows are ordered by
+    (created_time, id) descending and each page continues strictly after the
+    last row of the previous one, so there is no OFFSET scan and no COUNT(*).
+    Add `?include_count=true` to get the total (and the view's stats) anyway.
+    """
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'include_count'
+    ordering = ('-created_time', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.use_cursor = request.query_params.get(self.mode_query_param) == 'cursor'
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        self.count = queryset.count() if self.wants_totals(request) else None
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_time, pk = position
+            queryset = queryset.filter(
+                Q(created_time__lt=created_time) | Q(created_time=created_time, id__lt=pk)
+            )
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page_rows = rows[:page_size]
+        return self.page_rows
+
+    def wants_totals(self, request):
+        """Page-number mode always counts; cursor mode only when asked to."""
+        if request.query_params.get(self.mode_query_param) != 'cursor':
+            return True
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            return decode_cursor(encoded)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, order):
+        return encode_cursor(order.created_time, order.pk)
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page_rows[-1]))
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        payload = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return Response(payload)
+
+
+class OrderDeltaSync:
+    """
+    `?since=<cursor>` on the order feeds: returns only orders whose
+    updated_time moved past the cursor, oldest change first, plus the cursor
+    to send next time. An empty `since` starts from the beginning, so the same
+    call also serves the initial load.
+
+    Once caught up, the new cursor never moves closer than `overlap` to now: a
+    write whose transaction commits late still carries an earlier
+    updated_time, so the last few seconds are returned again on the next
+    call. Clients upsert by id.
+    """
+    since_query_param = 'since'
+    limit_query_param = 'limit'
+    default_limit = 200
+    max_limit = 500
+    overlap = timedelta(seconds=2)
+    invalid_cursor_message = 'Invalid since cursor'
+
+    @classmethod
+    def requested(cls, request):
+        return cls.since_query_param in request.query_params
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def changes(self, queryset, request):
+        """Returns (orders, next_cursor, has_more)."""
+        limit = self.get_limit(request)
+        queryset = queryset.order_by('updated_time', 'id')
+
+        since = request.query_params.get(self.since_query_param)
+        position = None
+        if since:
+            try:
+                position = decode_cursor(since)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            updated_time, pk = position
+            queryset = queryset.filter(
+                Q(updated_time__gt=updated_time) | Q(updated_time=updated_time, id__gt=pk)
+            )
+
+        rows = list(queryset[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        settled = timezone.now() - self.overlap
+        if rows:
+            position = (rows[-1].updated_time, rows[-1].pk)
+        if position is None or (position[0] > settled and not has_more):
+            # Too recent to be final: the next call resumes from the settle point
+            position = (settled, 0)
+        return rows, encode_cursor(*position), has_more
@@ -0,0 +1,48 @@
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import Cart, CartItem, Order, OrderItem
+
+
+def order_items_prefetch():
+    """order_items with their Item joined (OrderItemSerializer reads item.item_name)."""
+    return Prefetch('order_items', queryset=OrderItem.objects.select_related('item'))
+
+
+def order_read_queryset(queryset=None):
+    """
+    Shared read path for everything rendered with OrderDetailSerializer.
+
+    Joins the device and prefetches items (+ Item) and payments, so a page of
+    orders costs the same number of queries whatever its size. Pass an existing
+    Order queryset to keep its filters and ordering.
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+    return queryset.select_related('device').prefetch_related(order_items_prefetch(), 'payments')
+
+
+def prefetch_order_details(orders):
+    """Same relations as order_read_queryset, loaded onto orders already in memory."""
+    prefetch_related_objects(list(orders), 'device', order_items_prefetch(), 'payments')
+    return orders
+
+
+def order_detail_data(order):
+    """OrderDetailSerializer payload for one order (WebSocket events)."""
+    from .serializers import OrderDetailSerializer
+    prefetch_order_details([order])
+    return OrderDetailSerializer(order).data
+
+
+def cart_read_queryset(queryset=None):
+    """
+    Carts as CartSerializer renders them: lines with their Item joined and
+    `total_price` summed in the same query (item/pricing.py).
+    """
+    from item.pricing import total_price
+
+    if queryset is None:
+        queryset = Cart.objects.all()
+    return queryset.annotate(total_price=total_price()).prefetch_related(
+        Prefetch('items', queryset=CartItem.objects.select_related('item').order_by('id'))
+    )
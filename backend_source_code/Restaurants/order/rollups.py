@@ -0,0 +1,187 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncHour
+
+from .constants import SOLD_STATUSES
+from .models import Order, SalesRollup
+
+
+def hour_bucket(dt):
+    """Truncates a datetime to the start of its hour (the rollup granularity)."""
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+# What an order contributes to its bucket; a counted order's row always holds what was added
+COUNTED_FIELDS = ('restaurant_id', 'business_day_id', 'created_time', 'total_price', 'tip_amount')
+
+
+def _bucket_key(values):
+    return values['restaurant_id'], values['business_day_id'], hour_bucket(values['created_time'])
+
+
+def _apply(deltas):
+    """Adds {(restaurant_id, business_day_id, bucket): [revenue, count, tips]} to the buckets."""
+    for (restaurant_id, business_day_id, bucket), (revenue, count, tips) in deltas.items():
+        if not (revenue or count or tips):
+            continue
+        rollup, _ = SalesRollup.objects.get_or_create(
+            restaurant_id=restaurant_id, business_day_id=business_day_id, bucket=bucket,
+        )
+        SalesRollup.objects.filter(pk=rollup.pk).update(
+            revenue=F('revenue') + revenue,
+            order_count=F('order_count') + count,
+            tips=F('tips') + tips,
+        )
+
+
+def _add(deltas, values, sign):
+    delta = deltas[_bucket_key(values)]
+    # str(): views assign floats to the price fields
+    delta[0] += sign * Decimal(str(values['total_price']))
+    delta[1] += sign
+    delta[2] += sign * Decimal(str(values['tip_amount']))
+
+
+def _new_deltas():
+    return defaultdict(lambda: [Decimal('0'), 0, Decimal('0')])
+
+
+def record_sale(order):
+    """
+    Adds `order` to its hourly SalesRollup bucket the first time it reaches a
+    sold status. Safe to call repeatedly: the order row is claimed with a
+    conditional UPDATE, so concurrent or repeated calls count it only once.
+    """
+    if order.status not in SOLD_STATUSES or order.sales_recorded:
+        return False
+
+    with transaction.atomic():
+        claimed = Order.objects.filter(pk=order.pk, sales_recorded=False).update(sales_recorded=True)
+        if not claimed:
+            order.sales_recorded = True
+            return False
+
+        deltas = _new_deltas()
+        _add(deltas, {name: getattr(order, name) for name in COUNTED_FIELDS}, 1)
+        _apply(deltas)
+
+    order.sales_recorded = True
+    return True
+
+
+def resync_sale(order, update_fields=None):
+    """
+    Called by Order.save() for an existing row, inside its transaction and
+    before the write. If the locked row is counted, its contribution moves to
+    the values about to be saved: a signed delta when totals change, a full
+    retraction (and sales_recorded cleared) when the order leaves
+    SOLD_STATUSES. The instance's sales_recorded is taken from the row, so a
+    stale instance never writes the flag back.
+    """
+    row = Order.objects.select_for_update(of=('self',)).filter(pk=order.pk).values(
+        'status', 'sales_recorded', *COUNTED_FIELDS
+    ).first()
+    if row is None:
+        return
+    if row['sales_recorded']:
+        def saved(name):
+            field = name[:-3] if name.endswith('_id') else name
+            written = update_fields is None or field in update_fields or name in update_fields
+            return getattr(order, name) if written else row[name]
+
+        new = {name: saved(name) for name in COUNTED_FIELDS}
+        status = saved('status')
+        still_sold = status in SOLD_STATUSES
+        if not still_sold or new != {name: row[name] for name in COUNTED_FIELDS}:
+            deltas = _new_deltas()
+            _add(deltas, row, -1)
+            if still_sold:
+                _add(deltas, new, 1)
+            _apply(deltas)
+        if not still_sold:
+            Order.objects.filter(pk=order.pk).update(sales_recorded=False)
+            row['sales_recorded'] = False
+    order.sales_recorded = row['sales_recorded']
+
+
+def retract_sales(orders):
+    """
+    Takes the counted orders of `orders` (a queryset about to leave
+    SOLD_STATUSES through .update()) out of their buckets and clears their
+    sales_recorded. Returns how many were retracted.
+    """
+    with transaction.atomic():
+        rows = list(orders.filter(sales_recorded=True).select_for_update(of=('self',)).values('pk', *COUNTED_FIELDS))
+        if not rows:
+            return 0
+        Order.objects.filter(pk__in=[row['pk'] for row in rows]).update(sales_recorded=False)
+        deltas = _new_deltas()
+        for row in rows:
+            _add(deltas, row, -1)
+        _apply(deltas)
+    return len(rows)
+
+
+def detach_business_day(business_day):
+    """
+    Before a BusinessDay is deleted (its buckets' business_day goes NULL):
+    folds its buckets into the restaurant's NULL-day buckets for the same hours.
+    """
+    with transaction.atomic():
+        deltas = _new_deltas()
+        rollups = SalesRollup.objects.filter(business_day=business_day)
+        for rollup in rollups:
+            delta = deltas[(rollup.restaurant_id, None, rollup.bucket)]
+            delta[0] += rollup.revenue
+            delta[1] += rollup.order_count
+            delta[2] += rollup.tips
+        rollups.delete()
+        _apply(deltas)
+
+
+def rebuild_rollups(restaurant_id=None, batch_size=1000):
+    """
+    Recomputes SalesRollup rows from order history (used by the backfill
+    command). Runs in one transaction; returns the number of buckets written.
+    """
+    orders = Order.objects.filter(status__in=SOLD_STATUSES)
+    rollups = SalesRollup.objects.all()
+    if restaurant_id is not None:
+        orders = orders.filter(restaurant_id=restaurant_id)
+        rollups = rollups.filter(restaurant_id=restaurant_id)
+
+    rows = (
+        orders
+        .annotate(bucket=TruncHour('created_time'))
+        .values('restaurant_id', 'business_day_id', 'bucket')
+        .annotate(revenue=Sum('total_price'), order_count=Count('id'), tips=Sum('tip_amount'))
+        .order_by()
+    )
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(SalesRollup(
+                restaurant_id=row['restaurant_id'],
+                business_day_id=row['business_day_id'],
+                bucket=row['bucket'],
+                revenue=row['revenue'] or 0,
+                order_count=row['order_count'],
+                tips=row['tips'] or 0,
+            ))
+            if len(batch) >= batch_size:
+                SalesRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            SalesRollup.objects.bulk_create(batch)
+            written += len(batch)
+
+        orders.filter(sales_recorded=False).update(sales_recorded=True)
+
+    return written
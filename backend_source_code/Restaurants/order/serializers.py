@@ -1,6 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem, Cart, CartItem
 from item.models import Item
+from item.pricing import final_prices, total_price
 
 class OrderItemSerializer(serializers.ModelSerializer):
     item_name = serializers.CharField(source='item.item_name')
@@ -12,6 +14,10 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
 
 class OrderItemCreateSerializer(serializers.ModelSerializer):
+    # Resolved to Item instances for all lines at once in
+    # OrderCreateSerializerFixed.validate_order_items (one query per order)
+    item = serializers.IntegerField(min_value=1)
+
     class Meta:
         model = OrderItem
         fields = ['item', 'quantity']
@@ -30,34 +36,45 @@ class OrderCreateSerializerFixed(serializers.ModelSerializer):
             'restaurant': {'read_only': True}
         }
 
+    def validate_order_items(self, value):
+        item_ids = {line['item'] for line in value}
+        items = Item.objects.in_bulk(item_ids)
+
+        missing = sorted(item_ids - items.keys())
+        if missing:
+            raise serializers.ValidationError(f"Invalid item id(s): {', '.join(map(str, missing))}.")
+
+        # STRICT AVAILABILITY CHECK (all lines at once)
+        unavailable = sorted(items[i].item_name for i in item_ids if not items[i].availability)
+        if len(unavailable) == 1:
+            raise serializers.ValidationError(f"Item '{unavailable[0]}' is currently unavailable.")
+        if unavailable:
+            names = ', '.join(f"'{name}'" for name in unavailable)
+            raise serializers.ValidationError(f"Items {names} are currently unavailable.")
+
+        for line in value:
+            line['item'] = items[line['item']]
+        return value
+
     def create(self, validated_data):
         order_items_data = validated_data.pop('order_items')
-        order = Order.objects.create(**validated_data)
-        total = 0
-        from rest_framework.exceptions import ValidationError
 
+        # Price every line up front so the order row is written once with its total
+        prices = final_prices(line['item'] for line in order_items_data)
+        lines = []
+        total = 0
         for item_data in order_items_data:
             item = item_data['item']
-            
-            # STRICT AVAILABILITY CHECK
-            if not item.availability:
-                # Rollback - actually transaction.atomic is best, but here we just raise
-                order.delete() 
-                raise ValidationError(f"Item '{item.item_name}' is currently unavailable.")
-
-            quantity = item_data['quantity']
-            
-            # DISCOUNT LOGIC
-            final_price = item.price
-            if item.discount_percentage > 0:
-                discount_amount = (item.price * item.discount_percentage) / 100
-                final_price = item.price - discount_amount
-            
-            OrderItem.objects.create(order=order, item=item, quantity=quantity, price=final_price)
-            total += final_price * quantity
-            
-        order.total_price = total
-        order.save()
+            quantity = item_data.get('quantity', 1)
+            lines.append((item, quantity, prices[item.pk]))
+            total += prices[item.pk] * quantity
+
+        with transaction.atomic():
+            order = Order.objects.create(total_price=total, **validated_data)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, item=item, quantity=quantity, price=price)
+                for item, quantity, price in lines
+            ])
         return order
 
     def update(self, instance, validated_data):
@@ -73,6 +90,21 @@ class OrderCreateSerializerFixed(serializers.ModelSerializer):
 
 
 
+class OrderStatusTransitionSerializer(serializers.Serializer):
+    order_id = serializers.IntegerField(min_value=1)
+    status = serializers.CharField(max_length=20)
+
+
+class BulkOrderStatusSerializer(serializers.Serializer):
+    transitions = OrderStatusTransitionSerializer(many=True, allow_empty=False, max_length=100)
+
+    def validate_transitions(self, value):
+        order_ids = [t['order_id'] for t in value]
+        if len(order_ids) != len(set(order_ids)):
+            raise serializers.ValidationError("Each order may only appear once.")
+        return value
+
+
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         from payment.models import Payment
@@ -91,19 +123,13 @@ class CartItemSerializer(serializers.ModelSerializer):
     item_name = serializers.CharField(source='item.item_name', read_only=True)
     price = serializers.DecimalField(source='item.price', max_digits=10, decimal_places=2, read_only=True)
     discount_percentage = serializers.DecimalField(source='item.discount_percentage', max_digits=5, decimal_places=2, read_only=True)
-    final_price = serializers.SerializerMethodField()
-    image = serializers.ImageField(source='item.image', read_only=True)
+    final_price = serializers.DecimalField(source='item.effective_price', max_digits=10, decimal_places=2, read_only=True)
+    image = serializers.ImageField(source='item.image1', read_only=True)
 
     class Meta:
         model = CartItem
         fields = ['id', 'item', 'item_name', 'quantity', 'price', 'discount_percentage', 'final_price', 'image']
 
-    def get_final_price(self, obj):
-        item = obj.item
-        if item.discount_percentage > 0:
-            discount_amount = (item.price * item.discount_percentage) / 100
-            return round(item.price - discount_amount, 2)
-        return item.price
 
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
@@ -114,11 +140,8 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ['id', 'items', 'total_price']
 
     def get_total_price(self, obj):
-        total = 0
-        for cart_item in obj.items.all():
-            item = cart_item.item
-            price = item.price
-            if item.discount_percentage > 0:
-                price = price - (price * item.discount_percentage / 100)
-            total += price * cart_item.quantity
-        return round(total, 2)
+        # CartViewSet annotates it; a lone cart costs one aggregate query
+        total = getattr(obj, 'total_price', None)
+        if total is None:
+            total = Cart.objects.filter(pk=obj.pk).aggregate(total=total_price())['total']
+        return total
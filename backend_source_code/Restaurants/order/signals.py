@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from .models import CartItem
+from message.broadcast import publish
+from .models import CartItem, Order
+from .constants import SOLD_STATUSES
+from restaurant.models import BusinessDay
 import json
 
 @receiver(post_save, sender=CartItem)
@@ -19,10 +20,9 @@ def broadcast_cart_update(sender, instance, **kwargs):
         if not guest_session:
             return
 
-        channel_layer = get_channel_layer()
         group_name = f'session_{guest_session.id}'
 
-        async_to_sync(channel_layer.group_send)(
+        publish(
             group_name,
             {
                 'type': 'cart_updated',
@@ -33,3 +33,18 @@ def broadcast_cart_update(sender, instance, **kwargs):
         print(f"DEBUG: Broadcast cart_updated to {group_name}")
     except Exception as e:
         print(f"ERROR: Failed to broadcast cart update: {str(e)}")
+
+
+@receiver(post_save, sender=Order)
+def update_sales_rollup(sender, instance, **kwargs):
+    """Keep SalesRollup in step with orders reaching a sold status."""
+    if instance.status in SOLD_STATUSES and not instance.sales_recorded:
+        from .rollups import record_sale
+        record_sale(instance)
+
+
+@receiver(pre_delete, sender=BusinessDay)
+def detach_sales_rollup(sender, instance, **kwargs):
+    """The day's buckets would go NULL-day next to existing ones; merge them first."""
+    from .rollups import detach_business_day
+    detach_business_day(instance)
@@ -1,3 +1,859 @@
-from django.test import TestCase
+import hashlib
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import threading
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from accounts.models import ChefStaff, User
+from category.models import Category
+from device.models import Device, GuestSession
+from item.models import Item
+from payment.models import Payment
+from restaurant.models import BusinessDay, Restaurant
+from RESTAURANTS.idempotency import idempotent
+from .management.commands.explain_hot_queries import explain, postgres_findings, sqlite_findings
+from .models import Cart, Order, OrderItem, SalesRollup
+from .rollups import rebuild_rollups
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class OrderTestCase(TestCase):
+    """Shared fixtures: one owner, one restaurant, one table."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+        cls.restaurant = Restaurant.objects.create(
+            resturent_name='Test Bistro', location='Dubai', phone_number='+971500000001', owner=cls.owner
+        )
+        cls.device_user = User.objects.create_user(
+            email='table1@example.com', username='table1', password='pass1234', role='customer'
+        )
+        cls.device = Device.objects.create(
+            table_name='Table 1', user=cls.device_user, restaurant=cls.restaurant
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def make_order(self, created_time, total='10.00', status='completed', **kwargs):
+        order = Order.objects.create(
+            device=self.device, restaurant=self.restaurant, status='pending',
+            total_price=Decimal(total), **kwargs
+        )
+        # created_time is auto_now_add, so backdate it explicitly
+        Order.objects.filter(pk=order.pk).update(created_time=created_time)
+        order.refresh_from_db()
+        if status != 'pending':
+            order.status = status
+            order.save()
+        return order
+
+
+class OrderAnalyticsAPIViewTests(OrderTestCase):
+    url = reverse('owner-order-analytics')
+
+    def test_query_count_is_constant_for_every_range(self):
+        now = timezone.now()
+        for days_ago in range(0, 60, 3):
+            self.make_order(now - timedelta(days=days_ago))
+
+        # restaurant lookup, current series, comparison series, weekly growth, active staff
+        # ('day' has no comparison range)
+        expected = {'day': 4, 'today': 5, 'week': 5, 'month': 5, 'year': 5}
+        for time_range, num_queries in expected.items():
+            with self.subTest(time_range=time_range):
+                with self.assertNumQueries(num_queries):
+                    response = self.client.get(self.url, {'time_range': time_range})
+                self.assertEqual(response.status_code, 200)
+
+    def test_monthly_series_fills_empty_buckets(self):
+        now = timezone.now()
+        start_of_year = now.replace(month=1, day=1, hour=12, minute=0, second=0, microsecond=0)
+        self.make_order(start_of_year, total='25.50')
+        self.make_order(start_of_year, total='4.50')
+        self.make_order(start_of_year, total='99.00', status='pending')
+
+        response = self.client.get(self.url, {'time_range': 'year', 'compare': 'false'})
+        chart = response.data['chart']
+
+        self.assertEqual(len(chart['labels']), 12)
+        self.assertEqual(chart['labels'][0], 'Jan')
+        self.assertEqual(chart['revenue'][0], 30.0)
+        self.assertEqual(chart['orders'][0], 2)
+        self.assertEqual(response.data['status']['total_orders'], 2)
+
+    def test_daily_series_matches_per_day_totals(self):
+        now = timezone.now()
+        self.make_order(now - timedelta(days=2), total='12.00')
+        self.make_order(now - timedelta(days=2), total='8.00')
+        self.make_order(now, total='5.00')
+
+        response = self.client.get(self.url, {'time_range': 'week', 'compare': 'false'})
+        chart = response.data['chart']
+
+        self.assertEqual(len(chart['labels']), 8)
+        self.assertEqual(chart['revenue'][-3], 20.0)
+        self.assertEqual(chart['orders'][-3], 2)
+        self.assertEqual(chart['revenue'][-1], 5.0)
+
+
+class SalesRollupTests(OrderTestCase):
+
+    def totals(self):
+        return list(SalesRollup.objects.values_list('order_count', 'revenue', 'tips'))
+
+    def test_completed_order_is_rolled_up_once(self):
+        order = self.make_order(timezone.now(), total='20.00', status='paid', tip_amount=Decimal('2.00'))
+        order.status = 'completed'
+        order.save()
+
+        self.assertEqual(self.totals(), [(1, Decimal('20.00'), Decimal('2.00'))])
+
+    def test_unsold_orders_are_not_rolled_up(self):
+        self.make_order(timezone.now(), status='preparing')
+        self.make_order(timezone.now(), status='cancelled')
+
+        self.assertFalse(SalesRollup.objects.exists())
+
+    def test_stale_instance_does_not_double_count(self):
+        order = self.make_order(timezone.now(), status='served')
+        stale = Order.objects.get(pk=order.pk)
+
+        order.status = 'paid'
+        order.save()
+        stale.status = 'completed'
+        stale.save()
+
+        self.assertEqual(SalesRollup.objects.get().order_count, 1)
+
+    def test_orders_in_the_same_hour_share_a_bucket(self):
+        hour = timezone.now().replace(minute=5, second=0, microsecond=0) - timedelta(hours=3)
+        self.make_order(hour, total='10.00')
+        self.make_order(hour + timedelta(minutes=40), total='15.00')
+        self.make_order(hour + timedelta(hours=1), total='1.00')
+
+        buckets = list(SalesRollup.objects.values_list('bucket', 'order_count', 'revenue'))
+        self.assertEqual(buckets, [
+            (hour.replace(minute=0), 2, Decimal('25.00')),
+            (hour.replace(minute=0) + timedelta(hours=1), 1, Decimal('1.00')),
+        ])
+
+    def test_backfill_matches_incremental_rollup(self):
+        now = timezone.now()
+        for days_ago in range(5):
+            self.make_order(now - timedelta(days=days_ago, hours=days_ago), total=f'{days_ago + 1}.00')
+        self.make_order(now, status='pending')
+        incremental = sorted(SalesRollup.objects.values_list('bucket', 'order_count', 'revenue'))
+
+        SalesRollup.objects.all().delete()
+        Order.objects.update(sales_recorded=False)
+        call_command('backfill_sales_rollup', stdout=StringIO())
+
+        self.assertEqual(sorted(SalesRollup.objects.values_list('bucket', 'order_count', 'revenue')), incremental)
+        self.assertFalse(Order.objects.filter(status__in=['completed', 'paid'], sales_recorded=False).exists())
+
+    def test_closing_a_table_takes_its_sold_orders_back_out(self):
+        session = GuestSession.objects.create(
+            device=self.device, session_token='close-me', expires_at=timezone.now() + timedelta(hours=1)
+        )
+        self.make_order(timezone.now(), total='20.00', guest_session=session)
+        self.make_order(timezone.now(), total='5.00')
+
+        with mock.patch('message.broadcast.get_channel_layer', return_value=mock.Mock(group_send=mock.AsyncMock())):
+            response = self.client.post(reverse('staff-close-session', args=[session.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(), [(1, Decimal('5.00'), Decimal('0.00'))])
+        self.assertFalse(Order.objects.filter(guest_session=session, sales_recorded=True).exists())
+
+    def test_tip_on_a_counted_order_moves_its_totals(self):
+        session = GuestSession.objects.create(
+            device=self.device, session_token='tipper', expires_at=timezone.now() + timedelta(hours=1)
+        )
+        order = self.make_order(timezone.now(), total='20.00', status='paid', guest_session=session)
+
+        with mock.patch('payment.views.PaymentService.create_payment', return_value={}):
+            response = APIClient().post(
+                reverse('create_checkout_session', args=[order.id]),
+                {'tip_amount': '3.50', 'tip_type': 'custom_amount'},
+                format='json', HTTP_X_GUEST_SESSION_TOKEN=session.session_token,
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals(), [(1, Decimal('23.50'), Decimal('3.50'))])
+
+    def test_leaving_a_sold_status_retracts_the_sale(self):
+        order = self.make_order(timezone.now(), total='8.00')
+        stale = Order.objects.get(pk=order.pk)
+        order.status = 'cancelled'
+        order.save()
+
+        self.assertEqual(self.totals(), [(0, Decimal('0.00'), Decimal('0.00'))])
+        # A stale instance neither restores the flag nor counts the order twice
+        stale.save()
+        stale.status = 'completed'
+        stale.save()
+        self.assertEqual(self.totals(), [(1, Decimal('8.00'), Decimal('0.00'))])
+
+    def test_deleting_a_business_day_merges_into_the_null_day_bucket(self):
+        hour = timezone.now()
+        day = BusinessDay.objects.create(restaurant=self.restaurant, is_active=True)
+        self.make_order(hour, total='4.00')
+        self.make_order(hour, total='6.00', business_day=day)
+
+        day.delete()
+
+        self.assertEqual(self.totals(), [(2, Decimal('10.00'), Decimal('0.00'))])
+
+    def test_backfill_is_idempotent(self):
+        self.make_order(timezone.now(), total='7.00')
+        rebuild_rollups()
+        rebuild_rollups()
+
+        self.assertEqual(self.totals(), [(1, Decimal('7.00'), Decimal('0.00'))])
+
+
+class MonthlySalesReportViewTests(OrderTestCase):
+    url = reverse('monthly-sales-report')
+
+    def test_reads_day_totals_from_rollup(self):
+        today = timezone.now()
+        self.make_order(today, total='11.00')
+        self.make_order(today, total='9.00', status='paid')
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data['sales_report_price'][f"day{today.day}"], 20.0)
+        self.assertEqual(response.data['total_completed_orders'], 2)
+
+
+class OrderCreateAPIViewTests(OrderTestCase):
+    url = reverse('order-create')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        category = Category.objects.create(restaurant=cls.restaurant, Category_name='Mains')
+        cls.items = [
+            Item.objects.create(
+                item_name=f'Dish {n}', price=Decimal('10.00'), description='', category=category,
+                restaurant=cls.restaurant, discount_percentage=Decimal('10.00') if n == 0 else 0,
+            )
+            for n in range(5)
+        ]
+        cls.session = GuestSession.objects.create(device=cls.device, session_token='guest-token')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_X_GUEST_SESSION_TOKEN=self.session.session_token)
+        cache.clear()
+
+    def place(self, lines, idempotency_key=None, **extra):
+        payload = {'order_items': [{'item': item.id, 'quantity': qty} for item, qty in lines], **extra}
+        headers = {'HTTP_IDEMPOTENCY_KEY': idempotency_key} if idempotency_key else {}
+        return self.client.post(self.url, payload, format='json', **headers)
+
+    def test_order_and_items_are_written_in_bulk(self):
+        lines = [(item, 2) for item in self.items]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.place(lines)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        order = Order.objects.get()
+        self.assertEqual(order.order_items.count(), 5)
+        # 4 x 2 x 10.00 + 2 x 9.00 (10% off)
+        self.assertEqual(order.total_price, Decimal('98.00'))
+        self.assertEqual(response.data['id'], order.id)
+
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len([sql for sql in inserts if 'order_orderitem' in sql]), 1)
+        self.assertEqual(len([sql for sql in inserts if 'order_order"' in sql]), 1)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+
+    def test_unavailable_item_leaves_nothing_behind(self):
+        Item.objects.filter(pk=self.items[1].pk).update(availability=False)
+        Cart.objects.create(guest_session=self.session, device=self.device)
+
+        response = self.place([(self.items[0], 1), (self.items[1], 1)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('unavailable', str(response.data))
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertTrue(Cart.objects.exists())
+
+    def test_failure_inside_transaction_rolls_back_order(self):
+        Cart.objects.create(guest_session=self.session, device=self.device)
+        with mock.patch('order.serializers.OrderItem.objects.bulk_create', side_effect=RuntimeError):
+            response = self.place([(self.items[0], 1)])
+
+        self.assertEqual(response.status_code, 500)
+
+        self.assertFalse(Order.objects.exists())
+        self.assertTrue(Cart.objects.exists())
+
+    def test_broadcasts_are_sent_after_commit(self):
+        layer = mock.Mock(group_send=mock.AsyncMock())
+        with mock.patch('message.broadcast.get_channel_layer', return_value=layer):
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                response = self.place([(self.items[0], 1)], payment_method='cash')
+            self.assertEqual(response.status_code, 201, response.data)
+            self.assertFalse(layer.group_send.called)
+
+            for callback in callbacks:
+                callback()
+
+        order = Order.objects.get()
+        self.assertEqual((order.status, order.payment_status), ('awaiting_cash', 'pending_cash'))
+        sent = [call.args[1]['type'] for call in layer.group_send.call_args_list]
+        # The first order of the day opens a business day, which open chat sockets are told about
+        self.assertEqual(sent, ['business_day_changed', 'order_created', 'cash_payment_alert', 'order_status_update'])
+
+    def test_retry_with_idempotency_key_replays_the_first_response(self):
+        first = self.place([(self.items[0], 2)], idempotency_key='retry-1')
+        self.assertEqual(first.status_code, 201, first.data)
+
+        with CaptureQueriesContext(connection) as ctx:
+            retry = self.place([(self.items[0], 2)], idempotency_key='retry-1')
+
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_idempotency_key_reused_for_another_order_is_rejected(self):
+        self.place([(self.items[0], 1)], idempotency_key='retry-2')
+        response = self.place([(self.items[1], 1)], idempotency_key='retry-2')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_idempotency_key_is_scoped_to_the_guest_session(self):
+        other = GuestSession.objects.create(device=self.device, session_token='other-guest-token')
+        self.place([(self.items[0], 1)], idempotency_key='shared')
+        self.client.credentials(HTTP_X_GUEST_SESSION_TOKEN=other.session_token)
+        response = self.place([(self.items[0], 1)], idempotency_key='shared')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_server_errors_are_not_replayed(self):
+        with mock.patch('order.serializers.OrderItem.objects.bulk_create', side_effect=RuntimeError):
+            failed = self.place([(self.items[0], 1)], idempotency_key='retry-3')
+        self.assertEqual(failed.status_code, 500)
+
+        response = self.place([(self.items[0], 1)], idempotency_key='retry-3')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_stored_response_expires(self):
+        with override_settings(IDEMPOTENCY={'TTL': 1}):
+            self.place([(self.items[0], 1)], idempotency_key='retry-4')
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=timezone.now().timestamp() + 5):
+            response = self.place([(self.items[0], 1)], idempotency_key='retry-4')
+
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class CartPricingTests(OrderTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        category = Category.objects.create(restaurant=cls.restaurant, Category_name='Mains')
+        cls.items = [
+            Item.objects.create(item_name=f'Dish {n}', price=Decimal('9.99'), description='', category=category,
+                                restaurant=cls.restaurant, discount_percentage=Decimal('15.00') if n % 2 else 0)
+            for n in range(6)
+        ]
+        cls.session = GuestSession.objects.create(device=cls.device, session_token='cart-token')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_X_GUEST_SESSION_TOKEN=self.session.session_token)
+
+    def test_cart_total_is_one_annotated_query(self):
+        for item in self.items:
+            self.client.post(reverse('cart-add-item'), {'item_id': item.id, 'quantity': 2}, format='json')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('cart-list'))
+        cart = response.data[0] if isinstance(response.data, list) else response.data['results'][0]
+
+        # 3 x 2 x 9.99 + 3 x 2 x 8.49 (15% off 9.99, rounded to cents)
+        self.assertEqual(Decimal(str(cart['total_price'])), Decimal('110.88'))
+        self.assertEqual({line['final_price'] for line in cart['items']}, {'9.99', '8.49'})
+        # session, page count, carts with their totals, lines with their items; however many lines
+        self.assertEqual(len(ctx.captured_queries), 4)
+
+    def test_order_lines_use_the_same_prices(self):
+        self.client.post(reverse('order-create'), {'order_items': [
+            {'item': self.items[0].id, 'quantity': 1}, {'item': self.items[1].id, 'quantity': 3},
+        ]}, format='json')
+        order = Order.objects.get()
+        self.assertEqual(sorted(order.order_items.values_list('price', flat=True)), [Decimal('8.49'), Decimal('9.99')])
+        self.assertEqual(order.total_price, Decimal('35.46'))
+
+
+class IdempotentDecoratorTests(TestCase):
+    """Concurrency behaviour, on a view that needs no database."""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        test = self
+
+        class SlowView(APIView):
+            authentication_classes = []
+            permission_classes = []
+
+            @idempotent('slow')
+            def post(self, request):
+                test.calls += 1
+                test.entered.set()
+                test.release.wait(5)
+                return Response({'call': test.calls}, status=201)
+
+        self.view = SlowView.as_view()
+
+    def post(self, results):
+        request = RequestFactory().post('/slow/', {'a': 1}, content_type='application/json',
+                                        HTTP_IDEMPOTENCY_KEY='same')
+        results.append(self.view(request))
+
+    def test_concurrent_duplicate_waits_for_the_first_request(self):
+        first, second = [], []
+        leader = threading.Thread(target=self.post, args=(first,))
+        leader.start()
+        self.assertTrue(self.entered.wait(5))
+
+        follower = threading.Thread(target=self.post, args=(second,))
+        follower.start()
+        follower.join(0.2)
+        self.assertTrue(follower.is_alive())  # parked on the in-flight request
+
+        self.release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first[0].status_code, 201)
+        self.assertEqual(second[0].status_code, 201)
+        self.assertEqual(second[0].data, {'call': 1})
+        self.assertEqual(second[0]['Idempotent-Replayed'], 'true')
+
+    def test_expired_lock_taken_by_another_request_is_left_alone(self):
+        results = []
+        leader = threading.Thread(target=self.post, args=(results,))
+        leader.start()
+        self.assertTrue(self.entered.wait(5))
+
+        # The leader outlives LOCK_TTL and a later request takes the lock
+        digest = hashlib.sha256(b'anonymous|same').hexdigest()
+        lock_key = f'idempotency:slow:{digest}:lock'
+        self.assertIsNotNone(cache.get(lock_key))
+        cache.set(lock_key, 'later request')
+        self.release.set()
+        leader.join(5)
+
+        self.assertEqual(results[0].status_code, 201)
+        self.assertEqual(cache.get(lock_key), 'later request')
+
+    def test_duplicate_gives_up_after_the_wait_timeout(self):
+        results = []
+        leader = threading.Thread(target=self.post, args=(results,))
+        leader.start()
+        self.assertTrue(self.entered.wait(5))
+
+        with override_settings(IDEMPOTENCY={'WAIT_TIMEOUT': 0.1}):
+            duplicate = []
+            self.post(duplicate)
+        self.release.set()
+        leader.join(5)
+
+        self.assertEqual(duplicate[0].status_code, 409)
+        self.assertEqual(self.calls, 1)
+
+
+class OrderFeedTestCase(OrderTestCase):
+    """Adds menu items, an open business day, a guest session and a chef."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        category = Category.objects.create(restaurant=cls.restaurant, Category_name='Drinks')
+        cls.items = [
+            Item.objects.create(item_name=f'Drink {n}', price=Decimal('5.00'), description='',
+                                category=category, restaurant=cls.restaurant)
+            for n in range(3)
+        ]
+        cls.business_day = BusinessDay.objects.create(restaurant=cls.restaurant, is_active=True)
+        cls.session = GuestSession.objects.create(device=cls.device, session_token='read-path-token')
+        cls.chef = User.objects.create_user(
+            email='chef@example.com', username='chef', password='pass1234', role='chef'
+        )
+        ChefStaff.objects.create(restaurant=cls.restaurant, user=cls.chef, action='accepted')
+
+    def seed(self, count):
+        for _ in range(count):
+            order = Order.objects.create(
+                device=self.device, restaurant=self.restaurant, business_day=self.business_day,
+                guest_session=self.session, total_price=Decimal('10.00'),
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, item=item, quantity=1, price=item.price) for item in self.items
+            ])
+            Payment.objects.create(device=self.device, restaurant=self.restaurant, order=order,
+                                   amount=Decimal('10.00'), provider='cash')
+
+
+class OrderReadPathTests(OrderFeedTestCase):
+    """List endpoints cost the same number of queries for 2 or 10 orders on a page."""
+
+    def assertConstantQueries(self, num_queries, request):
+        for count in (2, 8):
+            with self.subTest(orders=count):
+                self.seed(count)
+                with self.assertNumQueries(num_queries):
+                    response = request()
+                self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_owner_orders(self):
+        # page count, page, items, payments, stats
+        response = self.assertConstantQueries(
+            5, lambda: self.client.get(reverse('owner-orders'))
+        )
+        order = response.data['results']['orders'][0]
+        self.assertEqual(order['device_name'], 'Table 1')
+        self.assertEqual([line['item_name'] for line in order['order_items']], ['Drink 0', 'Drink 1', 'Drink 2'])
+        self.assertEqual(len(order['payments']), 1)
+
+    def test_chef_orders(self):
+        self.client.force_authenticate(self.chef)
+        # restaurant lookup x2, page count, page, items, payments, stats
+        self.assertConstantQueries(7, lambda: self.client.get(reverse('chef-orders')))
+
+    def test_guest_orders(self):
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_X_GUEST_SESSION_TOKEN=self.session.session_token)
+        # session, page count, page, items, payments
+        response = self.assertConstantQueries(5, lambda: self.client.get(reverse('my-orders')))
+        self.assertEqual(response.data['count'], 10)
+
+
+class OrderFeedPaginationTests(OrderFeedTestCase):
+    """?pagination=cursor walks (created_time, id) without OFFSET or COUNT."""
+
+    def walk(self, url, **params):
+        ids, pages = [], 0
+        response = self.client.get(url, {'pagination': 'cursor', 'page_size': 4, **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages += 1
+            ids += [order['id'] for order in response.data['results']['orders']]
+            if not response.data['next']:
+                return ids, pages
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_walk_is_stable_across_equal_timestamps(self):
+        self.seed(10)
+        # force ties on created_time so the id tie-breaker matters
+        same = timezone.now() - timedelta(hours=1)
+        Order.objects.filter(pk__in=Order.objects.order_by('id').values('id')[:6]).update(created_time=same)
+
+        ids, pages = self.walk(reverse('owner-orders'))
+
+        expected = list(Order.objects.order_by('-created_time', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_cursor_mode_skips_counts_unless_requested(self):
+        self.seed(5)
+        url = reverse('owner-orders')
+
+        # page (+1 row to detect a next page), items, payments
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'pagination': 'cursor'})
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertNotIn('COUNT(', ' '.join(q['sql'] for q in ctx.captured_queries))
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['results']['stats'])
+
+        response = self.client.get(url, {'pagination': 'cursor', 'include_count': 'true'})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['results']['stats']['ongoing_orders'], 5)
+
+    def test_kitchen_feed_supports_cursor_mode(self):
+        self.seed(6)
+        self.client.force_authenticate(self.chef)
+
+        ids, pages = self.walk(reverse('chef-orders'))
+
+        self.assertEqual(sorted(ids, reverse=True), ids)
+        self.assertEqual((len(ids), pages), (6, 2))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('owner-orders'), {'pagination': 'cursor', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderDeltaSyncTests(OrderFeedTestCase):
+    """?since=<cursor> returns only orders changed after the cursor."""
+    url = reverse('owner-orders')
+
+    def sync(self, since='', **params):
+        response = self.client.get(self.url, {'since': since, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def age_all(self, hours=1):
+        # Everything seeded so far is older than the settle window
+        Order.objects.update(updated_time=timezone.now() - timedelta(hours=hours))
+
+    def test_initial_sync_then_only_changes(self):
+        self.seed(3)
+        self.age_all()
+        first = self.sync()
+        self.assertEqual(len(first['orders']), 3)
+        self.assertFalse(first['has_more'])
+
+        self.assertEqual(self.sync(first['cursor'])['orders'], [])
+
+        order = Order.objects.order_by('id').first()
+        order.status = 'preparing'
+        order.save()
+
+        changed = self.sync(first['cursor'])
+        self.assertEqual([(o['id'], o['status']) for o in changed['orders']], [(order.id, 'preparing')])
+
+    def test_recent_changes_are_returned_again_until_settled(self):
+        self.seed(2)
+        first = self.sync()
+        self.assertEqual(len(first['orders']), 2)
+
+        # updated just now: the cursor stays behind the overlap window
+        self.assertEqual(len(self.sync(first['cursor'])['orders']), 2)
+
+    def test_limit_and_has_more_walk_every_change_once(self):
+        self.seed(5)
+        self.age_all()
+        seen, cursor = [], ''
+        while True:
+            data = self.sync(cursor, limit=2)
+            seen += [o['id'] for o in data['orders']]
+            cursor = data['cursor']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, list(Order.objects.order_by('updated_time', 'id').values_list('id', flat=True)))
+
+    def test_delta_is_one_indexed_query_plus_prefetches(self):
+        self.seed(4)
+        self.age_all()
+        cursor = self.sync()['cursor']
+        Order.objects.filter(pk=Order.objects.first().pk).update(updated_time=timezone.now() - timedelta(minutes=5))
+
+        # changed orders, items, payments
+        with self.assertNumQueries(3):
+            data = self.sync(cursor)
+        self.assertEqual(len(data['orders']), 1)
+
+    def test_bulk_session_close_is_picked_up(self):
+        self.seed(2)
+        self.age_all()
+        cursor = self.sync()['cursor']
+
+        staff = APIClient()
+        staff.force_authenticate(self.owner)
+        response = staff.post(reverse('staff-close-session', args=[self.session.id]))
+        self.assertEqual(response.status_code, 200)
+
+        statuses = {o['status'] for o in self.sync(cursor)['orders']}
+        self.assertEqual(statuses, {'cancelled'})
+
+    def test_kitchen_feed_supports_since(self):
+        self.seed(2)
+        self.client.force_authenticate(self.chef)
+        response = self.client.get(reverse('chef-orders'), {'since': ''})
+        self.assertEqual(len(response.data['orders']), 2)
+        self.assertIn('cursor', response.data)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'since': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkOrderStatusTests(OrderFeedTestCase):
+    url = reverse('chef-bulk-update-order-status')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.chef)
+        self.layer = mock.Mock(group_send=mock.AsyncMock())
+        patcher = mock.patch('message.broadcast.get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def move(self, transitions):
+        payload = {'transitions': [{'order_id': pk, 'status': new} for pk, new in transitions]}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, payload, format='json')
+
+    def sent(self):
+        return [(call.args[0], call.args[1]) for call in self.layer.group_send.call_args_list]
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        counts = []
+        for size in (2, 10):
+            Order.objects.all().delete()
+            self.seed(size)
+            ids = list(Order.objects.values_list('id', flat=True))
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.move([(pk, 'preparing') for pk in ids])
+            self.assertEqual(response.status_code, 200, response.data)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), {'preparing'})
+
+    def test_one_event_per_restaurant_and_per_table(self):
+        self.seed(3)
+        other_table = Device.objects.create(
+            table_name='Table 2', restaurant=self.restaurant,
+            user=User.objects.create_user(email='t2@example.com', username='t2', password='x', role='customer'),
+        )
+        Order.objects.filter(pk=Order.objects.first().pk).update(device=other_table)
+
+        response = self.move([(pk, 'served') for pk in Order.objects.values_list('id', flat=True)])
+
+        self.assertEqual(response.status_code, 200)
+        sent = self.sent()
+        self.assertEqual(sorted(group for group, _ in sent),
+                         sorted([f'restaurant_{self.restaurant.id}', f'device_{self.device.id}', f'device_{other_table.id}']))
+        restaurant_event = dict(sent)[f'restaurant_{self.restaurant.id}']
+        self.assertEqual(restaurant_event['type'], 'orders_updated')
+        self.assertEqual(len(restaurant_event['orders']), 3)
+        self.assertEqual(len(dict(sent)[f'device_{self.device.id}']['orders']), 2)
+
+    def test_any_invalid_transition_rejects_the_whole_batch(self):
+        self.seed(2)
+        done, todo = Order.objects.order_by('id')
+        done.status = 'completed'
+        done.save()
+
+        response = self.move([(done.id, 'preparing'), (todo.id, 'preparing'), (999999, 'served')])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['errors']), {done.id, 999999})
+        self.assertEqual(response.data['errors'][done.id], 'Order already completed')
+        todo.refresh_from_db()
+        self.assertEqual(todo.status, 'pending')
+        self.assertEqual(self.sent(), [])
+
+    def test_orders_of_other_restaurants_are_not_found(self):
+        other_owner = User.objects.create_user(email='o2@example.com', username='o2', password='x', role='owner')
+        other = Restaurant.objects.create(resturent_name='Other', location='-', phone_number='+971500000002', owner=other_owner)
+        self.seed(1)
+        Order.objects.update(restaurant=other)
+
+        response = self.move([(Order.objects.get().id, 'served')])
+        self.assertEqual(response.status_code, 400)
+
+    def test_completion_side_effects(self):
+        from message.models import ChatMessage
+        self.seed(2)
+        ChatMessage.objects.create(device=self.device, restaurant=self.restaurant, message='hi', new_message=True)
+
+        response = self.move([(pk, 'completed') for pk in Order.objects.values_list('id', flat=True)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ChatMessage.objects.filter(new_message=True).exists())
+        self.assertEqual(SalesRollup.objects.get().order_count, 2)
+
+    def test_duplicate_orders_are_rejected(self):
+        self.seed(1)
+        pk = Order.objects.get().id
+        response = self.move([(pk, 'served'), (pk, 'completed')])
+        self.assertEqual(response.status_code, 400)
+
+    def test_single_endpoint_uses_the_same_table(self):
+        self.seed(1)
+        order = Order.objects.get()
+        order.status = 'paid'
+        order.save()
+
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(reverse('update-order-status', args=[order.id]), {'status': 'served'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Once order is paid, it can only be marked as completed.')
+
+
+class ExplainHotQueriesTests(TestCase):
+
+    def test_every_hot_query_is_served_by_an_index(self):
+        out = StringIO()
+        call_command('explain_hot_queries', '--fail-on-seq-scan', stdout=out)
+        self.assertIn('0 of', out.getvalue())
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite plan format')
+    def test_unindexed_filter_is_reported(self):
+        _, findings = explain(Order.objects.filter(tip_amount=5))
+        self.assertIn(('seq_scan', 'order_order'), findings)
+
+    def test_sqlite_plan_parsing(self):
+        plan = (
+            "3 0 0 SCAN order_order\n"
+            "5 0 0 SEARCH device_device USING INTEGER PRIMARY KEY (rowid=?)\n"
+            "9 0 0 SCAN payment_payment USING INDEX payment_rest_created_idx\n"
+            "24 0 0 USE TEMP B-TREE FOR ORDER BY"
+        )
+        self.assertEqual(sqlite_findings(plan), [
+            ('seq_scan', 'order_order'),
+            ('sort', 'USE TEMP B-TREE FOR ORDER BY'),
+        ])
+
+    def test_postgres_plan_parsing(self):
+        plan = json.dumps([{'Plan': {
+            'Node Type': 'Sort', 'Sort Key': ['created_time DESC'],
+            'Plans': [
+                {'Node Type': 'Seq Scan', 'Relation Name': 'message_chatmessage'},
+                {'Node Type': 'Index Scan', 'Relation Name': 'order_order'},
+            ],
+        }}])
+        self.assertEqual(sorted(postgres_findings(plan)), [
+            ('seq_scan', 'message_chatmessage'),
+            ('sort', 'created_time DESC'),
+        ])
@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .constants import STATUS, SOLD_STATUSES
+from .models import Order
+
+ALL_STATUSES = frozenset(value for value, _ in STATUS)
+
+# current status -> statuses it may move to. Shared by the single and batch
+# status endpoints so both enforce the same rules.
+TRANSITIONS = {
+    'pending': ALL_STATUSES,
+    'preparing': ALL_STATUSES,
+    'served': ALL_STATUSES,
+    'awaiting_cash': ALL_STATUSES,
+    'cancelled': ALL_STATUSES,
+    'paid': frozenset({'completed'}),
+    'completed': frozenset(),
+}
+
+TRANSITION_ERRORS = {
+    'paid': "Once order is paid, it can only be marked as completed.",
+    'completed': "Order already completed",
+}
+
+
+def transition_error(current, new):
+    """Returns why `current` -> `new` is not allowed, or None if it is."""
+    if new not in ALL_STATUSES:
+        return "Invalid status value"
+    if new not in TRANSITIONS.get(current, ALL_STATUSES):
+        return TRANSITION_ERRORS.get(current, f"Cannot change status from {current} to {new}")
+    return None
+
+
+def apply_transitions(orders, new_statuses):
+    """
+    Writes already validated transitions for `orders` (Order instances) with a
+    single bulk_update and runs the side effects the single endpoints run:
+    clearing the table's chat badge on completion and recording sales.
+    `new_statuses` maps order id -> status. Returns the changed orders.
+    """
+    from message.models import ChatMessage
+    from .rollups import record_sale
+
+    now = timezone.now()
+    changed = []
+    for order in orders:
+        order.status = new_statuses[order.id]
+        order.updated_time = now
+        changed.append(order)
+
+    with transaction.atomic():
+        Order.objects.bulk_update(changed, ['status', 'updated_time'])
+
+        completed_devices = {order.device_id for order in changed if order.status == 'completed'}
+        if completed_devices:
+            ChatMessage.objects.filter(device_id__in=completed_devices, new_message=True).update(new_message=False)
+
+        # bulk_update skips post_save, so feed the rollups directly
+        for order in changed:
+            if order.status in SOLD_STATUSES:
+                record_sale(order)
+
+    return changed
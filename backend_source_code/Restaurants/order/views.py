@@ -3,25 +3,30 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import generics, status,filters, permissions
 from rest_framework.views import APIView
-from .pagination import TenPerPagePagination
-from .models import Order, Cart, CartItem
+from .pagination import TenPerPagePagination, OrderFeedPagination, OrderDeltaSync
+from .models import Order, Cart, CartItem, SalesRollup
 from device.models import GuestSession
 from rest_framework import viewsets
 from rest_framework.decorators import action
-from .serializers import OrderCreateSerializerFixed, OrderDetailSerializer
+from .serializers import OrderCreateSerializerFixed, OrderDetailSerializer, BulkOrderStatusSerializer
+from .transitions import transition_error, apply_transitions
+from .querysets import order_read_queryset, prefetch_order_details, order_detail_data, cart_read_queryset
+from .analytics import build_series, weekly_revenue
+from .rollups import hour_bucket
 from accounts.permissions import IsCustomerRole,IsOwnerRole,IsChefOrStaff,IsOwnerChefOrStaff
 from accounts.models import ChefStaff
 from django.utils.timezone import now
-from django.db.models import Sum, Count
+from django.db import transaction
+from django.db.models import Sum, Count, Q
+from django.db.models.functions import TruncDate
 from calendar import month_name
 from restaurant.models import Restaurant
 from accounts.models import ChefStaff
-from asgiref.sync import async_to_sync
+from message.broadcast import publish
+from RESTAURANTS.idempotency import idempotent
 # date 
 from datetime import date,timedelta
 from django.db.models import Sum
-from channels.layers import get_channel_layer
-channel_layer = get_channel_layer()
 from message.models import ChatMessage
 from datetime import datetime
 from calendar import monthrange
@@ -32,6 +37,7 @@ class OrderCreateAPIView(generics.CreateAPIView):
     serializer_class = OrderCreateSerializerFixed
     permission_classes = [permissions.AllowAny]
 
+    @idempotent('order-create')
     def create(self, request, *args, **kwargs):
         # Override create to return full OrderDetailSerializer data (including ID)
         serializer = self.get_serializer(data=request.data)
@@ -84,43 +90,77 @@ class OrderCreateAPIView(generics.CreateAPIView):
 
         device = session.device
         restaurant = device.restaurant
-        
-        # --- BUSINESS DAY LOGIC ---
-        from restaurant.models import BusinessDay
-        business_day = BusinessDay.objects.filter(restaurant=restaurant, is_active=True).last()
-        
-        # Auto-open logic (if missing)
-        # "Logic to Open/Close day (manual or auto?). *assumption: Auto-create on first order*"
-        # Actually simplest to just CREATE one if none exists?
-        # But we only want ONE active day.
-        if not business_day:
-            business_day = BusinessDay.objects.create(restaurant=restaurant, is_active=True)
-
-        # Save via serializer
-        order = serializer.save(device=device, restaurant=restaurant, guest_session=session, business_day=business_day)
-        
-        # Serialize Response
-        headers = self.get_success_headers(serializer.data)
-        data = OrderDetailSerializer(order).data
-        
+        payment_method = self.request.data.get('payment_method')
+
+        # Everything below is one unit of work: the business day, the order and its
+        # items, and the cart clear either all commit or none of them do.
+        with transaction.atomic():
+            # --- BUSINESS DAY LOGIC ---
+            from restaurant.models import BusinessDay
+            from restaurant.lookups import active_business_day
+            business_day = active_business_day(restaurant.id)
+
+            # Auto-open logic (if missing)
+            # "Logic to Open/Close day (manual or auto?). *assumption: Auto-create on first order*"
+            # We only want ONE active day, so create one on the first order.
+            if not business_day:
+                business_day = BusinessDay.objects.create(restaurant=restaurant, is_active=True)
+
+            order_fields = {
+                'device': device,
+                'restaurant': restaurant,
+                'guest_session': session,
+                'business_day': business_day,
+            }
+            # Handle Cash Payment Logic (set up front so the order is written once)
+            if payment_method == 'cash':
+                order_fields['status'] = 'awaiting_cash'
+                order_fields['payment_status'] = 'pending_cash'
+
+            order = serializer.save(**order_fields)
+
+            # CLEAR CART after successful order placement (Assuming One Cart per Session)
+            Cart.objects.filter(guest_session=session).delete()
+
+            data = order_detail_data(order)
+
+            # Queued on the broadcast bus; only sent once the order is really committed
+            self.broadcast_order_created(order, data, payment_method)
+
+        headers = self.get_success_headers(data)
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
+
+    def broadcast_order_created(self, order, data, payment_method):
         # Notify Restaurant
         try:
-            async_to_sync(channel_layer.group_send)(
-                f"restaurant_{order.restaurant.id}",
+            publish(
+                f"restaurant_{order.restaurant_id}",
                 {
                     "type": "order_created",
                     "order": data
                 }
             )
+            if payment_method == 'cash':
+                # Broadcast Cash Alert to Restaurant
+                publish(
+                    f"restaurant_{order.restaurant_id}",
+                    {
+                        "type": "cash_payment_alert",
+                        "order": data,
+                        "table_number": order.device.table_number or order.device.table_name,
+                        "total_amount": str(order.total_price),
+                        "timestamp": str(order.created_time)
+                    }
+                )
         except Exception as e:
             print(f"Error sending restaurant notification: {e}")
-        
-        if order.guest_session:
+
+        if order.guest_session_id:
             try:
-                async_to_sync(channel_layer.group_send)(
-                    f"session_{order.guest_session.id}",
+                publish(
+                    f"session_{order.guest_session_id}",
                     {
-                        "type": "order_status_update", 
+                        "type": "order_status_update",
                         "order_id": order.id,
                         "status": order.status,
                         "order": data
@@ -129,45 +169,6 @@ class OrderCreateAPIView(generics.CreateAPIView):
             except Exception as e:
                  print(f"Error sending guest notification: {e}")
 
-            # CLEAR CART after successful order placement
-            try:
-                # Assuming One Cart per Session
-                deleted_count, _ = Cart.objects.filter(guest_session=order.guest_session).delete()
-                print(f"DEBUG_CART: Deleted {deleted_count} carts for session {order.guest_session.id}")
-            except Exception as e:
-                print(f"Error clearing cart: {e}")
-        
-        # Handle Cash Payment Logic
-        payment_method = self.request.data.get('payment_method')
-        if payment_method == 'cash':
-            order.status = 'awaiting_cash'
-            order.payment_status = 'pending_cash'
-            order.save()
-            # Broadcast Cash Alert to Restaurant
-            async_to_sync(channel_layer.group_send)(
-                f"restaurant_{order.restaurant.id}",
-                {
-                    "type": "cash_payment_alert",
-                    "order": data,
-                    "table_number": device.table_number or device.table_name,
-                    "total_amount": str(order.total_price),
-                    "timestamp": str(order.created_time)
-                }
-            )
-            # Send updated status to guest
-            if order.guest_session:
-                 async_to_sync(channel_layer.group_send)(
-                    f"session_{order.guest_session.id}",
-                    {
-                        "type": "order_status_update",
-                        "order_id": order.id,
-                        "status": 'awaiting_cash',
-                        "order": OrderDetailSerializer(order).data
-                    }
-                )
-
-        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
-
     def perform_create(self, serializer):
         pass # Deprecated by custom create() above
 
@@ -211,19 +212,22 @@ class ConfirmCashPaymentAPIView(APIView):
             o.status = 'completed'
             o.payment_status = 'paid'
             o.save()
-            
+
+        # One prefetch for every order's payload instead of a few queries per order
+        prefetch_order_details(orders_to_update)
+        for o in orders_to_update:
             # Notify Restaurant (Updates Dashboard for each order logic or refresh)
             data = OrderDetailSerializer(o).data
-            async_to_sync(channel_layer.group_send)(
-                f"restaurant_{o.restaurant.id}",
+            publish(
+                f"restaurant_{o.restaurant_id}",
                 {
                     "type": "order_paid",
                     "order": data
                 }
             )
             # Remove Alert
-            async_to_sync(channel_layer.group_send)(
-                f"restaurant_{o.restaurant.id}",
+            publish(
+                f"restaurant_{o.restaurant_id}",
                 {
                     "type": "cash_payment_confirmed",
                     "order_id": o.id
@@ -246,7 +250,7 @@ class ConfirmCashPaymentAPIView(APIView):
             session.save()
             
             # Notify Guest (Updates App)
-            async_to_sync(channel_layer.group_send)(
+            publish(
                 f"session_{order.guest_session.id}",
                 {
                     "type": "order_status_update",
@@ -277,8 +281,8 @@ class OrderCancelAPIView(APIView):
 
         order.status = 'cancelled'
         order.save()
-        data = OrderDetailSerializer(order).data
-        async_to_sync(channel_layer.group_send)(
+        data = order_detail_data(order)
+        publish(
             f"restaurant_{order.restaurant.id}",
             {
                 "type": "order_updated",
@@ -300,30 +304,30 @@ class MyOrdersAPIView(generics.ListAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.is_authenticated:
-            return Order.objects.filter(
+            return order_read_queryset(Order.objects.filter(
                 device__user=user,
                 status__in=['pending', 'preparing', 'served' , 'paid']
-            ).order_by('-created_time')
+            )).order_by('-created_time')
         else:
             # Try to resolve guest session
             session_token = self.request.headers.get('X-Guest-Session-Token')
             if session_token:
                 try:
                     session = GuestSession.objects.get(session_token=session_token, is_active=True)
-                    return Order.objects.filter(
+                    return order_read_queryset(Order.objects.filter(
                         guest_session=session,
                         status__in=['pending', 'preparing', 'served' , 'paid']
-                    ).order_by('-created_time')
+                    )).order_by('-created_time')
                 except GuestSession.DoesNotExist:
                     return Order.objects.none()
 
             # Fallback to device_id (Legacy/Insecure - consider deprecating)
             device_id = self.request.query_params.get('device_id')
             if device_id:
-                return Order.objects.filter(
+                return order_read_queryset(Order.objects.filter(
                     device_id=device_id,
                     status__in=['pending', 'preparing', 'served' , 'paid']
-                ).order_by('-created_time')
+                )).order_by('-created_time')
             return Order.objects.none()
 
 
@@ -335,18 +339,33 @@ class MySingleOrderAPIView(generics.RetrieveAPIView):
     lookup_field = 'pk' 
 
     def get_queryset(self):
-        return Order.objects.filter(
+        return order_read_queryset(Order.objects.filter(
             device__user=self.request.user,
             status__in=['pending', 'preparing', 'served']
-        )
+        ))
+
+
 
 
+class OrderDeltaSyncMixin:
+    """
+    `?since=<cursor>` on an order feed returns only the orders changed after the
+    cursor (see OrderDeltaSync), so a reconnecting board resyncs in one query.
+    """
+
+    def delta_sync(self, request):
+        orders, cursor, has_more = OrderDeltaSync().changes(self.get_queryset(), request)
+        return Response({
+            "orders": self.get_serializer(orders, many=True).data,
+            "cursor": cursor,
+            "has_more": has_more,
+        })
 
 
-class OwnerRestaurantOrdersAPIView(generics.ListAPIView):
+class OwnerRestaurantOrdersAPIView(OrderDeltaSyncMixin, generics.ListAPIView):
     serializer_class = OrderDetailSerializer
     permission_classes = [IsAuthenticated,IsOwnerChefOrStaff]
-    pagination_class = TenPerPagePagination
+    pagination_class = OrderFeedPagination
     filter_backends = [filters.SearchFilter]
     search_fields = ['id']
 
@@ -369,25 +388,27 @@ class OwnerRestaurantOrdersAPIView(generics.ListAPIView):
         # But usually a user dashboard focuses on ONE restaurant context.
         # However, for now, let's filter orders where order.business_day.is_active = True
         
-        return queryset.filter(business_day__is_active=True).order_by('-created_time')
+        return order_read_queryset(queryset.filter(business_day__is_active=True)).order_by('-created_time')
     
     def list(self, request, *args, **kwargs):
+        if OrderDeltaSync.requested(request):
+            return self.delta_sync(request)
+
         queryset = self.filter_queryset(self.get_queryset())  # ✅ apply search filtering
 
         page = self.paginate_queryset(queryset)
         serializer = self.get_serializer(page, many=True)
 
-        # Stats should be calculated on the FULL (unfiltered) queryset
-        full_queryset = self.get_queryset()
-        today = date.today()
-        completed_orders = full_queryset.filter(status='completed')
-        completed_today = completed_orders.filter(updated_time__date=today)
-
-        stats = {
-            "total_completed_orders": completed_orders.count(),
-            "today_completed_order_count": completed_today.count(),
-            "ongoing_orders": full_queryset.filter(status__in=['pending', 'preparing', 'served']).count()
-        }
+        # Stats should be calculated on the FULL (unfiltered) queryset, in one aggregate.
+        # Cursor-mode pollers skip them unless they ask for counts.
+        stats = None
+        if self.paginator.wants_totals(request):
+            today = date.today()
+            stats = self.get_queryset().aggregate(
+                total_completed_orders=Count('id', filter=Q(status='completed')),
+                today_completed_order_count=Count('id', filter=Q(status='completed', updated_time__date=today)),
+                ongoing_orders=Count('id', filter=Q(status__in=['pending', 'preparing', 'served'])),
+            )
 
         return self.get_paginated_response({
             "stats": stats,
@@ -421,16 +442,9 @@ class OwnerUpdateOrderStatusAPIView(APIView):
             return Response({"error": "Order not found or unauthorized"}, status=status.HTTP_404_NOT_FOUND)
 
         new_status = request.data.get("status")
-        if new_status not in dict(Order._meta.get_field('status').choices):
-            return Response({"error": "Invalid status value"}, status=status.HTTP_400_BAD_REQUEST)
-
-
-        if order.status == "completed":
-            return Response({"error": "Order already completed"}, status=status.HTTP_400_BAD_REQUEST)
-
-
-        if order.status == "paid" and new_status != "completed":
-            return Response({"error": "Once order is paid, it can only be marked as completed."}, status=status.HTTP_400_BAD_REQUEST)
+        error = transition_error(order.status, new_status)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
         order.status = new_status
         if order.status == "completed":
@@ -443,7 +457,7 @@ class OwnerUpdateOrderStatusAPIView(APIView):
                 new_message=True
             ).update(new_message=False)
 
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f'device_{order.device_id}',  # <-- send to device_id group
             {
                 'type': 'order_status_update',
@@ -452,9 +466,9 @@ class OwnerUpdateOrderStatusAPIView(APIView):
             }
         )
 
-        data = OrderDetailSerializer(order).data
-        async_to_sync(channel_layer.group_send)(
-            f"restaurant_{order.restaurant.id}",
+        data = order_detail_data(order)
+        publish(
+            f"restaurant_{order.restaurant_id}",
             {
                 "type": "order_updated",
                 "order": data
@@ -466,10 +480,10 @@ class OwnerUpdateOrderStatusAPIView(APIView):
 
 
 
-class ChefStaffOrdersAPIView(generics.ListAPIView):
+class ChefStaffOrdersAPIView(OrderDeltaSyncMixin, generics.ListAPIView):
     serializer_class = OrderDetailSerializer
     permission_classes = [IsAuthenticated,IsChefOrStaff]
-    pagination_class = TenPerPagePagination
+    pagination_class = OrderFeedPagination
     filter_backends = [filters.SearchFilter]
     search_fields = ['id']
 
@@ -510,8 +524,8 @@ class ChefStaffOrdersAPIView(generics.ListAPIView):
                      print(f"DEBUG_ORDERS: User is Owner. Found Restaurant ID: {restaurant_id}")
 
         if restaurant_id:
-             qs = Order.objects.filter(restaurant_id=restaurant_id).order_by('-created_time')
-             print(f"DEBUG_ORDERS: Returning {qs.count()} orders for Rest {restaurant_id}")
+             qs = order_read_queryset(Order.objects.filter(restaurant_id=restaurant_id)).order_by('-created_time')
+             print(f"DEBUG_ORDERS: Returning orders for Rest {restaurant_id}")
              return qs
         
         print("DEBUG_ORDERS: Could not determine restaurant. Returning empty.")
@@ -519,21 +533,22 @@ class ChefStaffOrdersAPIView(generics.ListAPIView):
     
 
     def list(self, request, *args, **kwargs):
+        if OrderDeltaSync.requested(request):
+            return self.delta_sync(request)
+
         queryset = self.filter_queryset(self.get_queryset())
         print("riad")
 
         page = self.paginate_queryset(queryset)
         serializer = self.get_serializer(page, many=True)
 
-        full_queryset = self.get_queryset()
-        ongoing_statuses = ['pending', 'preparing', 'served']
-        total_ongoing = full_queryset.filter(status__in=ongoing_statuses).count()
-        total_completed = full_queryset.filter(status='completed').count()
-
-        stats = {
-            "total_ongoing_orders": total_ongoing,
-            "total_completed_orders": total_completed,
-        }
+        stats = None
+        if self.paginator.wants_totals(request):
+            ongoing_statuses = ['pending', 'preparing', 'served']
+            stats = self.get_queryset().aggregate(
+                total_ongoing_orders=Count('id', filter=Q(status__in=ongoing_statuses)),
+                total_completed_orders=Count('id', filter=Q(status='completed')),
+            )
 
         return self.get_paginated_response({
             "stats": stats,
@@ -561,13 +576,9 @@ class ChefStaffUpdateOrderStatusAPIView(APIView):
 
 
         
-        if order.status == "completed":
-            return Response({"detail": "Order already completed"}, status=status.HTTP_400_BAD_REQUEST)
-
-        if order.status == "paid" and new_status != "completed":
-            return Response({
-                "detail": "Once order is paid, it can only be marked as completed."
-            }, status=status.HTTP_400_BAD_REQUEST)
+        error = transition_error(order.status, new_status)
+        if error:
+            return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
 
         order.status = new_status
         order.save()
@@ -578,7 +589,7 @@ class ChefStaffUpdateOrderStatusAPIView(APIView):
                 new_message=True
             ).update(new_message=False)
 
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f'device_{order.device_id}',  # <-- send to device_id group
             {
                 'type': 'order_status_update',
@@ -587,9 +598,9 @@ class ChefStaffUpdateOrderStatusAPIView(APIView):
             }
         )
 
-        data = OrderDetailSerializer(order).data
-        async_to_sync(channel_layer.group_send)(
-            f"restaurant_{order.restaurant.id}",
+        data = order_detail_data(order)
+        publish(
+            f"restaurant_{order.restaurant_id}",
             {
                 "type": "order_updated",
                 "order": data
@@ -597,6 +608,67 @@ class ChefStaffUpdateOrderStatusAPIView(APIView):
         )
 
         return Response({"detail": f"Order status updated to {new_status}"}, status=status.HTTP_200_OK)
+
+
+
+
+class BulkOrderStatusUpdateAPIView(APIView):
+    """
+    Moves several orders at once: {"transitions": [{"order_id": 1, "status": "served"}, ...]}.
+    Every transition is checked against order/transitions.py; either all of them
+    are applied (one bulk UPDATE) or none. Sends one event per restaurant and
+    one per table instead of two per order.
+    """
+    permission_classes = [IsAuthenticated, IsOwnerChefOrStaff]
+
+    def get_scope(self, user):
+        if user.role == 'owner':
+            return Order.objects.filter(restaurant__owner=user)
+        restaurant_ids = ChefStaff.objects.filter(user=user, action='accepted').values_list('restaurant_id', flat=True)
+        return Order.objects.filter(restaurant_id__in=restaurant_ids)
+
+    def post(self, request):
+        serializer = BulkOrderStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_statuses = {t['order_id']: t['status'] for t in serializer.validated_data['transitions']}
+
+        with transaction.atomic():
+            # of=self: the owner scope joins the restaurant, whose row must not be locked too
+            orders = self.get_scope(request.user).select_for_update(of=('self',)).in_bulk(list(new_statuses))
+
+            errors = {}
+            for order_id, new_status in new_statuses.items():
+                order = orders.get(order_id)
+                if order is None:
+                    errors[order_id] = "Order not found or unauthorized"
+                    continue
+                error = transition_error(order.status, new_status)
+                if error:
+                    errors[order_id] = error
+            if errors:
+                return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            changed = apply_transitions(list(orders.values()), new_statuses)
+            self.broadcast(changed)
+
+        return Response({
+            "message": "Order statuses updated",
+            "orders": [{"order_id": order.id, "status": order.status} for order in changed],
+        })
+
+    def broadcast(self, orders):
+        prefetch_order_details(orders)
+        payloads = OrderDetailSerializer(orders, many=True).data
+
+        by_restaurant, by_device = {}, {}
+        for order, data in zip(orders, payloads):
+            by_restaurant.setdefault(order.restaurant_id, []).append(data)
+            by_device.setdefault(order.device_id, []).append({"order_id": order.id, "status": order.status})
+
+        for restaurant_id, orders_data in by_restaurant.items():
+            publish(f"restaurant_{restaurant_id}", {"type": "orders_updated", "orders": orders_data})
+        for device_id, statuses in by_device.items():
+            publish(f"device_{device_id}", {"type": "order_statuses_update", "orders": statuses})
     
 
 
@@ -634,52 +706,20 @@ class OrderAnalyticsAPIView(APIView):
             compare = request.query_params.get('compare', 'true') == 'true'
 
             from django.utils import timezone
-            import calendar
-            from django.db.models import Sum
-            
+
             now_dt = timezone.now()
             print(f"DEBUG_ANALYTICS: Range={time_range} Agg={aggregation} Compare={compare} Now={now_dt}")
             
-            # Helper to get data for a specific range
+            # All series come from one grouped query per range over the hourly
+            # sales rollup (see order/analytics.py and order/rollups.py)
+            rollups = SalesRollup.objects.filter(restaurant=restaurant)
+
             def get_data_for_range(start_d, end_d, agg_type):
                 try:
-                    l, r_data, o_data = [], [], []
-                    curr_q = Order.objects.filter(restaurant=restaurant, status='completed', created_time__range=[start_d, end_d])
-                    
-                    if agg_type == 'hourly':
-                        query_date = start_d.date()
-                        # Iterate 0 to 23 hours
-                        for h in range(0, 24):
-                            l.append(f"{h:02d}:00")
-                            hour_orders = curr_q.filter(created_time__hour=h, created_time__date=query_date)
-                            rev = hour_orders.aggregate(r=Sum('total_price'))['r'] or 0
-                            cnt = hour_orders.count()
-                            r_data.append(float(rev))
-                            o_data.append(cnt)
-
-                    elif agg_type == 'daily':
-                        curr = start_d.date()
-                        end = end_d.date()
-                        while curr <= end:
-                            l.append(curr.strftime("%d %b"))
-                            day_orders = curr_q.filter(created_time__date=curr)
-                            rev = day_orders.aggregate(r=Sum('total_price'))['r'] or 0
-                            cnt = day_orders.count()
-                            r_data.append(float(rev))
-                            o_data.append(cnt)
-                            curr += timedelta(days=1)
-                            
-                    elif agg_type == 'monthly':
-                         target_year = start_d.year
-                         for m in range(1, 13):
-                             l.append(calendar.month_name[m][:3])
-                             month_orders = curr_q.filter(created_time__month=m, created_time__year=target_year)
-                             rev = month_orders.aggregate(r=Sum('total_price'))['r'] or 0
-                             cnt = month_orders.count()
-                             r_data.append(float(rev))
-                             o_data.append(cnt)
-                    
-                    return l, r_data, o_data
+                    return build_series(
+                        rollups, hour_bucket(start_d), end_d, agg_type, date_field='bucket',
+                        revenue=Sum('revenue'), orders=Sum('order_count')
+                    )
                 except Exception as help_err:
                      print(f"DEBUG_ANALYTICS: Helper Error: {help_err}")
                      return [], [], []
@@ -739,12 +779,9 @@ class OrderAnalyticsAPIView(APIView):
             total_orders_count = sum(orders_count_data)
             
             # Weekly Growth (Compare this week vs last week)
-            start_week = now_dt.date() - timedelta(days=now_dt.weekday())
-            this_week_rev = Order.objects.filter(restaurant=restaurant, status='completed', created_time__date__gte=start_week).aggregate(s=Sum('total_price'))['s'] or 0
-            
-            last_week_start = start_week - timedelta(days=7)
-            last_week_end = start_week - timedelta(days=1)
-            last_week_rev = Order.objects.filter(restaurant=restaurant, status='completed', created_time__date__range=[last_week_start, last_week_end]).aggregate(s=Sum('total_price'))['s'] or 0
+            this_week_rev, last_week_rev = weekly_revenue(
+                rollups, timezone.localdate(now_dt), date_field='bucket', revenue_field='revenue'
+            )
             
             growth = 0
             if last_week_rev > 0:
@@ -822,12 +859,17 @@ class MonthlySalesReportView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            # Get all completed orders for this restaurant in the current month
-            orders = Order.objects.filter(
-                restaurant=restaurant,
-                status='completed',
-                created_time__year=current_year,
-                created_time__month=current_month
+            # Day-wise totals for the current month, read from the hourly sales rollup
+            daily_rollups = (
+                SalesRollup.objects.filter(
+                    restaurant=restaurant,
+                    bucket__year=current_year,
+                    bucket__month=current_month
+                )
+                .annotate(day=TruncDate('bucket'))
+                .values('day')
+                .annotate(revenue=Sum('revenue'), orders=Sum('order_count'))
+                .order_by()
             )
 
             # Prepare day-wise totals and counts
@@ -835,10 +877,10 @@ class MonthlySalesReportView(APIView):
             day_wise_sales = {f"day{day}": 0 for day in range(1, days_in_month + 1)}
             day_wise_order_count = {f"day{day}": 0 for day in range(1, days_in_month + 1)}
 
-            for order in orders:
-                day_key = f"day{order.created_time.day}"
-                day_wise_sales[day_key] += float(order.total_price)
-                day_wise_order_count[day_key] += 1
+            for row in daily_rollups:
+                day_key = f"day{row['day'].day}"
+                day_wise_sales[day_key] += float(row['revenue'] or 0)
+                day_wise_order_count[day_key] += row['orders'] or 0
 
             total_sales = sum(day_wise_sales.values())
             total_orders = sum(day_wise_order_count.values())
@@ -869,7 +911,7 @@ class CartViewSet(viewsets.ModelViewSet):
         
         try:
             session = GuestSession.objects.get(session_token=session_token, is_active=True)
-            return Cart.objects.filter(guest_session=session)
+            return cart_read_queryset(Cart.objects.filter(guest_session=session))
         except GuestSession.DoesNotExist:
             return Cart.objects.none()
 
@@ -917,7 +959,7 @@ class CartViewSet(viewsets.ModelViewSet):
         
         # Serialize and return cart
         from .serializers import CartSerializer
-        return Response(CartSerializer(cart).data)
+        return Response(CartSerializer(cart_read_queryset().get(pk=cart.pk)).data)
 
     @action(detail=False, methods=['post'])
     def clear(self, request):
@@ -0,0 +1,159 @@
+"""
+AI image generation for menu items, behind /owners/generate-image/.
+
+The upstream service (Pollinations by default) takes seconds per image, so it
+is called from the event loop with a pooled httpx.AsyncClient instead of
+holding a worker thread:
+
+- connect/read/total timeouts and at most MAX_CONCURRENCY upstream requests
+  per process; further requests wait for a slot (within the total timeout).
+- Results are stored in media storage under a hash of the normalized prompt,
+  "media/generated_images/ai.<sha32>.<ext>", and answered with their URL.
+  The same prompt is never generated twice, and concurrent requests for it
+  share one upstream call.
+- Bodies are streamed and capped at MAX_BYTES; anything but an image is
+  refused.
+"""
+import asyncio
+import hashlib
+import weakref
+from urllib.parse import quote
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from RESTAURANTS.cache import CacheNamespace
+
+DEFAULTS = {
+    'ENDPOINT': 'https://image.pollinations.ai/prompt/',
+    'CONNECT_TIMEOUT': 5,
+    'READ_TIMEOUT': 60,
+    'TOTAL_TIMEOUT': 90,
+    'MAX_CONCURRENCY': 4,
+    'MAX_BYTES': 10 * 1024 * 1024,
+}
+
+UPLOAD_DIR = 'media/generated_images/'
+EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp'}
+
+# prompt hash -> storage name; storage itself is the source of truth
+GENERATED = CacheNamespace('generated_image', ttl=settings.CACHE_TTLS['generated_image'])
+
+
+class ImageGenerationError(Exception):
+    def __init__(self, message, status=502):
+        super().__init__(message)
+        self.status = status
+
+
+def _config(name):
+    return getattr(settings, 'IMAGE_GENERATION', {}).get(name, DEFAULTS[name])
+
+
+def normalize_prompt(prompt):
+    return ' '.join(str(prompt).split())
+
+
+def prompt_hash(prompt):
+    payload = f"{_config('ENDPOINT')}\n{normalize_prompt(prompt)}"
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class _LoopState:
+    """One pooled client, concurrency limit and in-flight table per event loop."""
+
+    def __init__(self):
+        limit = _config('MAX_CONCURRENCY')
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(_config('READ_TIMEOUT'), connect=_config('CONNECT_TIMEOUT')),
+            limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+            follow_redirects=True,
+        )
+        self.slots = asyncio.Semaphore(limit)
+        self.in_flight = {}
+
+
+_states = weakref.WeakKeyDictionary()
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _LoopState()
+    return state
+
+
+def _find_stored(key, storage):
+    name = GENERATED.get(key)
+    if name and storage.exists(name):
+        return name
+    for extension in EXTENSIONS.values():
+        name = f"{UPLOAD_DIR}ai.{key}.{extension}"
+        if storage.exists(name):
+            GENERATED.set(key, value=name)
+            return name
+    return None
+
+
+def _store(key, content, content_type, storage):
+    name = f"{UPLOAD_DIR}ai.{key}.{EXTENSIONS[content_type]}"
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(content))
+    GENERATED.set(key, value=name)
+    return name
+
+
+async def _download(state, prompt):
+    url = _config('ENDPOINT') + quote(normalize_prompt(prompt), safe='')
+    max_bytes = _config('MAX_BYTES')
+    async with state.slots:
+        try:
+            async with state.client.stream('GET', url) as response:
+                if response.status_code != 200:
+                    raise ImageGenerationError(f"Generation Error: upstream answered {response.status_code}")
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type not in EXTENSIONS:
+                    raise ImageGenerationError(f"Generation Error: unexpected content type {content_type or 'none'}")
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ImageGenerationError("Generation Error: image too large")
+                    chunks.append(chunk)
+        except httpx.TimeoutException:
+            raise ImageGenerationError("Generation Error: the image service timed out", status=504)
+        except httpx.HTTPError as e:
+            raise ImageGenerationError(f"Generation Error: {e}")
+    return b''.join(chunks), content_type
+
+
+async def _generate(state, key, prompt, storage):
+    content, content_type = await _download(state, prompt)
+    return await sync_to_async(_store)(key, content, content_type, storage)
+
+
+async def generate_image(prompt, storage=default_storage):
+    """
+    Storage name of the image for `prompt`, and whether it was already
+    there. Raises ImageGenerationError (with the HTTP status to answer).
+    """
+    key = prompt_hash(prompt)
+    name = await sync_to_async(_find_stored)(key, storage)
+    if name:
+        return name, True
+
+    state = _state()
+    task = state.in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_generate(state, key, prompt, storage))
+        state.in_flight[key] = task
+        task.add_done_callback(lambda _: state.in_flight.pop(key, None))
+    try:
+        # shield: one waiter giving up must not cancel the call the others share
+        return await asyncio.wait_for(asyncio.shield(task), _config('TOTAL_TIMEOUT')), False
+    except asyncio.TimeoutError:
+        raise ImageGenerationError("Generation Error: the image service timed out", status=504)
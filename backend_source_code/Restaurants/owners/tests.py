@@ -1,3 +1,139 @@
-from django.test import TestCase
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import unquote
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from .image_generation import ImageGenerationError, generate_image
+
+
+def _png():
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), 'orange').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class StubImageServer(ThreadingHTTPServer):
+    """Local stand-in for the image service: /prompt/<text>, with knobs on the server object."""
+    daemon_threads = True
+
+    def __init__(self):
+        self.requests = []
+        self.delay = 0
+        self.content_type = 'image/png'
+        self.body = _png()
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+
+    @property
+    def endpoint(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/prompt/'
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(unquote(self.path))
+        time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header('Content-Type', self.server.content_type)
+        self.send_header('Content-Length', str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GenerateImageTests(TestCase):
+    url = reverse('generate-image')
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubImageServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            email='owner@example.com', username='owner', password='pass1234', role='owner'
+        )
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(
+            MEDIA_ROOT=media,
+            IMAGE_GENERATION={'ENDPOINT': self.server.endpoint, 'READ_TIMEOUT': 2, 'TOTAL_TIMEOUT': 5},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.server.requests.clear()
+        self.server.delay = 0
+        self.server.content_type = 'image/png'
+        token = RefreshToken.for_user(self.owner).access_token
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def generate(self, prompt, **extra):
+        return self.client.post(self.url, {'prompt': prompt}, content_type='application/json', **{**self.auth, **extra})
+
+    def test_returns_a_media_url_and_caches_by_prompt(self):
+        response = self.generate('Grilled  halloumi salad')
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertFalse(body['cached'])
+        self.assertTrue(body['image'].startswith('http://testserver/media/media/generated_images/ai.'))
+        self.assertTrue(body['image'].endswith('.png'))
+        self.assertEqual(self.server.requests, ['/prompt/Grilled halloumi salad'])
+
+        # Same prompt modulo whitespace: served from storage, the service is not called again
+        again = self.generate(' Grilled halloumi  salad ').json()
+        self.assertEqual(again, {'image': body['image'], 'cached': True})
+        self.assertEqual(len(self.server.requests), 1)
+
+        name = body['image'].split('/media/', 1)[1]
+        self.assertTrue(default_storage.exists(name))
+
+    def test_concurrent_identical_prompts_share_one_call(self):
+        self.server.delay = 0.3
+
+        async def burst():
+            return await asyncio.gather(*(generate_image('Mango lassi') for _ in range(5)))
+
+        results = async_to_sync(burst)()
+        self.assertEqual(len({name for name, _ in results}), 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_upstream_failures(self):
+        self.server.content_type = 'text/html'
+        response = self.generate('Not an image')
+        self.assertEqual(response.status_code, 502)
+        self.assertIn('unexpected content type', response.json()['error'])
+
+        self.server.content_type = 'image/png'
+        self.server.delay = 1
+        with override_settings(IMAGE_GENERATION={'ENDPOINT': self.server.endpoint, 'READ_TIMEOUT': 0.2}):
+            with self.assertRaises(ImageGenerationError) as raised:
+                async_to_sync(generate_image)('Slow soup')
+        self.assertEqual(raised.exception.status, 504)
+
+    def test_requires_a_token_and_a_prompt(self):
+        self.assertEqual(self.client.post(self.url, {'prompt': 'x'}, content_type='application/json').status_code, 401)
+        self.assertEqual(self.generate('  ').status_code, 400)
+        self.assertEqual(self.server.requests, [])
@@ -3,10 +3,10 @@ from rest_framework.routers import DefaultRouter
 from restaurant.views import OwnerRegisterView
 from accounts.simple_views import SimpleOwnerRegisterView
 from category.views import CategoryViewSet, SubCategoryViewSet
-from item.views import ItemViewSet,MostSellingItemsAPIView
+from item.views import ItemViewSet,MostSellingItemsAPIView,MenuImportView,MenuExportView
 from accounts.views import ChefStaffViewSet
 from device.views import DeviceViewSet,ReservationViewSet
-from order.views import OwnerRestaurantOrdersAPIView,OwnerUpdateOrderStatusAPIView,OrderAnalyticsAPIView,MonthlySalesReportView, ConfirmCashPaymentAPIView
+from order.views import OwnerRestaurantOrdersAPIView,OwnerUpdateOrderStatusAPIView,OrderAnalyticsAPIView,MonthlySalesReportView, ConfirmCashPaymentAPIView, BulkOrderStatusUpdateAPIView
 from review.views import OwnerRestaurantReviewListAPIView
 from device.views import DeviceViewSetall
 from vapi.views import CreateAssistantView,UpdateAssistantNumber,GetRestaurantAssistanceView
@@ -39,9 +39,12 @@ urlpatterns = [
     path('registered-restaurants/', OwnerRegisterView.as_view(), name='registered-restaurants'), # New Admin Register Endpoint
     path('orders/', OwnerRestaurantOrdersAPIView.as_view(), name='owner-orders'),
     path('orders/status/<int:pk>/', OwnerUpdateOrderStatusAPIView.as_view(), name='update-order-status'),
+    path('orders/status/bulk/', BulkOrderStatusUpdateAPIView.as_view(), name='bulk-update-order-status'),
     path('orders/confirm-cash/<int:pk>/', ConfirmCashPaymentAPIView.as_view(), name='confirm-order-cash'), # New Endpoint
     path('reviews/', OwnerRestaurantReviewListAPIView.as_view(), name='owner-reviews'),
     path('most-selling-items/', MostSellingItemsAPIView.as_view(), name='most-selling-items'),
+    path('menu/import/', MenuImportView.as_view(), name='menu-import'),
+    path('menu/export/', MenuExportView.as_view(), name='menu-export'),
     path('orders/analytics/', OrderAnalyticsAPIView.as_view(), name='owner-order-analytics'),
     path('create-assistant/', CreateAssistantView.as_view(), name='create_assistant'),
     path('update-assistant-number/', UpdateAssistantNumber.as_view(), name='update_assistant_number'),
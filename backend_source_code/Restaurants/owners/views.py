@@ -1,42 +1,50 @@
-from rest_framework.views import APIView
-from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.conf import settings
-import requests
-
-class GenerateImageView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request):
-        import base64
-        from urllib.parse import quote
-
-        prompt = request.data.get('prompt')
-        if not prompt:
-            return Response({"error": "Prompt is required"}, status=400)
-
-        # Free Version: Pollinations.ai
-        # No API Key required.
-        
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts.authentication import CachedJWTAuthentication
+from .image_generation import ImageGenerationError, generate_image
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class GenerateImageView(View):
+    """
+    POST {"prompt": "..."} -> {"image": "<media url>", "cached": bool}.
+
+    A plain async Django view (DRF views are sync only): while the image
+    service works, the request waits on the event loop instead of a worker
+    thread. Authentication is the API's JWT one.
+    """
+    http_method_names = ['post', 'options']
+
+    async def post(self, request):
         try:
-            encoded_prompt = quote(prompt)
-            # Add random seed to ensure freshness if needed, or just prompt
-            # Pollinations returns the image binary directly
-            image_url = f"https://image.pollinations.ai/prompt/{encoded_prompt}"
-            
-            response = requests.get(image_url)
-            response.raise_for_status()
-            
-            # Convert binary to base64
-            b64_data = base64.b64encode(response.content).decode('utf-8')
-            
-            # Detrmine mime type (usually jpeg from pollinations, but safe to default)
-            content_type = response.headers.get('Content-Type', 'image/jpeg')
-            
-            # Return as data URI
-            return Response({"image": f"data:{content_type};base64,{b64_data}"})
-            
-        except requests.exceptions.RequestException as e:
-            return Response({"error": f"Generation Error: {str(e)}"}, status=500)
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+            authenticated = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({"detail": str(e.detail)}, status=401)
+        if authenticated is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+        if request.content_type == 'application/json':
+            try:
+                prompt = json.loads(request.body or b'{}').get('prompt')
+            except (ValueError, AttributeError):
+                return JsonResponse({"error": "Invalid JSON body"}, status=400)
+        else:
+            prompt = request.POST.get('prompt')
+        if not prompt or not str(prompt).strip():
+            return JsonResponse({"error": "Prompt is required"}, status=400)
+
+        try:
+            name, cached = await generate_image(prompt)
+        except ImageGenerationError as e:
+            return JsonResponse({"error": str(e)}, status=e.status)
+
+        url = await sync_to_async(default_storage.url)(name)
+        return JsonResponse({"image": request.build_absolute_uri(url), "cached": cached})
@@ -197,14 +197,12 @@ class CashAdapter(PaymentAdapter):
         order.save()
 
         # Broadcast Cash Alert to Restaurant (Dashboard)
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        from order.serializers import OrderDetailSerializer
+        from message.broadcast import publish
+        from order.querysets import order_detail_data
         
-        channel_layer = get_channel_layer()
-        order_data = OrderDetailSerializer(order).data
+        order_data = order_detail_data(order)
         
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{order.restaurant.id}",
             {
                 "type": "cash_payment_alert",
@@ -7,11 +7,9 @@ from .models import Payment
 from .serializers import PaymentGatewaySerializer # We might need a PaymentSerializer
 from rest_framework import serializers
 from django.utils import timezone
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from message.broadcast import publish
 from order.models import Order
 
-channel_layer = get_channel_layer()
 
 class PaymentSerializer(serializers.ModelSerializer):
     order_id = serializers.IntegerField(source='order.id', read_only=True)
@@ -136,8 +134,8 @@ class PaymentAdminViewSet(ModelViewSet):
         return Response({'status': 'cancelled'})
 
     def _emit_update(self, payment, event_type):
-        from order.serializers import OrderDetailSerializer
-        order_data = OrderDetailSerializer(payment.order).data
+        from order.querysets import order_detail_data
+        order_data = order_detail_data(payment.order)
         
         payload = {
             "type": event_type,
@@ -146,7 +144,7 @@ class PaymentAdminViewSet(ModelViewSet):
         }
         
         # Notify Restaurant
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{payment.restaurant.id}",
             payload
         )
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db import transaction
+
+from RESTAURANTS.cache import CacheNamespace, cacheable_fields, from_cached
+from .models import PaymentGateway
+
+# Versioned per restaurant: saving one gateway deactivates the others with a
+# bulk update, so every lookup of the restaurant goes stale together.
+GATEWAYS = CacheNamespace('payment_gateway', ttl=settings.CACHE_TTLS['payment_gateway'], versioned=True)
+
+# key_secret stays out of the shared cache; adapters read it from the database when they need it
+CACHED_FIELDS = cacheable_fields(PaymentGateway, exclude=('key_secret',))
+
+
+def active_gateway(restaurant_id, provider=None):
+    """The active gateway of a restaurant (for `provider`, if given), or None."""
+    def load():
+        gateways = PaymentGateway.objects.filter(restaurant_id=restaurant_id, is_active=True)
+        if provider:
+            gateways = gateways.filter(provider=provider)
+        return gateways.values(*CACHED_FIELDS).first()
+    return from_cached(PaymentGateway, GATEWAYS.get_or_load(restaurant_id, provider or 'any', loader=load))
+
+
+def forget_gateways(restaurant_id):
+    GATEWAYS.invalidate(restaurant_id)
+    transaction.on_commit(lambda: GATEWAYS.invalidate(restaurant_id))
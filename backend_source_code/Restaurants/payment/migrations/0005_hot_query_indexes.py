@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0015_hot_query_indexes'),
+        ('order', '0008_hot_query_indexes'),
+        ('payment', '0004_alter_paymentgateway_provider'),
+        ('restaurant', '0011_businessday_closed_by_businessday_total_card_payment_and_more'),
+        ('staff', '0003_alter_staff_role_alter_staff_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['order', 'status'], name='payment_order_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['restaurant', '-created_at'], name='payment_rest_created_idx'),
+        ),
+    ]
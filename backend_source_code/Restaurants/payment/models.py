@@ -55,6 +55,12 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'status'], name='payment_order_status_idx'),
+            models.Index(fields=['restaurant', '-created_at'], name='payment_rest_created_idx'),
+        ]
+
     def __str__(self):
         return f"Payment for Order #{self.order.id} by Device #{self.device.id}"
 
@@ -1,11 +1,11 @@
 from .models import PaymentGateway, Payment, StripeDetails
 from .adapters import StripeAdapter, RazorpayAdapter, CashAdapter, PayTabsAdapter
+from .lookups import active_gateway
 from rest_framework.exceptions import ValidationError
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from message.broadcast import publish
 from order.serializers import OrderDetailSerializer
+from order.querysets import prefetch_order_details
 
-channel_layer = get_channel_layer()
 
 class PaymentService:
     ADAPTERS = {
@@ -23,7 +23,7 @@ class PaymentService:
         # Handle generic 'card' alias
         if provider == 'card':
             # 1. Respect currently active gateway if exists
-            active = PaymentGateway.objects.filter(restaurant=restaurant, is_active=True).first()
+            active = active_gateway(restaurant.id)
             if active:
                 provider = active.provider
                 gateway = active
@@ -32,10 +32,7 @@ class PaymentService:
                 provider = 'paytabs'
 
         # 1. Try exact match (Active)
-        if provider:
-            gateway = PaymentGateway.objects.filter(restaurant=restaurant, provider=provider, is_active=True).first()
-        else:
-            gateway = PaymentGateway.objects.filter(restaurant=restaurant, is_active=True).first()
+        gateway = active_gateway(restaurant.id, provider)
         
         # 2. Self-Healing: If not found, try to find ANY match and activate/fix it
         if not gateway and provider:
@@ -132,7 +129,7 @@ class PaymentService:
         # Notify Restaurant of new payment
         from .serializers import PaymentSerializer
         payment_data = PaymentSerializer(payment).data
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{order.restaurant.id}",
             {
                 "type": "payment_update",
@@ -190,10 +187,12 @@ class PaymentService:
                 order.status = 'paid'
                 order.payment_status = 'paid'
                 order.save()
-                
+
+            prefetch_order_details(orders_to_update)
+            for order in orders_to_update:
                 # Notify Restaurant
                 order_data = OrderDetailSerializer(order).data
-                async_to_sync(channel_layer.group_send)(
+                publish(
                     f"restaurant_{order.restaurant.id}",
                     {
                         "type": "order_paid",
@@ -204,7 +203,7 @@ class PaymentService:
             # Notify Restaurant of payment update (just once for the transaction)
             from .serializers import PaymentSerializer
             payment_data = PaymentSerializer(payment).data
-            async_to_sync(channel_layer.group_send)(
+            publish(
                 f"restaurant_{payment.restaurant.id}",
                 {
                     "type": "payment_update",
@@ -298,10 +297,12 @@ class PaymentService:
                     order.status = 'paid'
                     order.payment_status = 'paid'
                     order.save()
-                    
+
+                prefetch_order_details(orders_to_update)
+                for order in orders_to_update:
                     # Notify Restaurant
                     order_data = OrderDetailSerializer(order).data
-                    async_to_sync(channel_layer.group_send)(
+                    publish(
                         f"restaurant_{order.restaurant.id}",
                         {
                             "type": "order_paid",
@@ -312,7 +313,7 @@ class PaymentService:
                 # Notify Restaurant of payment update
                 from .serializers import PaymentSerializer
                 payment_data = PaymentSerializer(payment).data
-                async_to_sync(channel_layer.group_send)(
+                publish(
                     f"restaurant_{payment.restaurant.id}",
                     {
                         "type": "payment_update",
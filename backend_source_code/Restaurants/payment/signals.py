@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .lookups import forget_gateways
+from .models import PaymentGateway
+
+
+@receiver(post_save, sender=PaymentGateway)
+@receiver(post_delete, sender=PaymentGateway)
+def invalidate_gateways(sender, instance, **kwargs):
+    forget_gateways(instance.restaurant_id)
@@ -12,12 +12,11 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from message.broadcast import publish
+from RESTAURANTS.idempotency import idempotent
 from order.serializers import OrderDetailSerializer
 from message.models import ChatMessage
 
-channel_layer = get_channel_layer()
 
 
 class PaymentGatewayViewSet(ModelViewSet):
@@ -127,6 +126,7 @@ class CreateBulkCheckoutSessionView(APIView):
     permission_classes = []
     authentication_classes = []
 
+    @idempotent('bulk-checkout')
     def post(self, request):
         # 1. Resolve Guest Session
         session_token = request.headers.get('X-Guest-Session-Token')
@@ -174,7 +174,8 @@ class CreateBulkCheckoutSessionView(APIView):
         # 4. Processing
         if provider == 'cash':
             # Mark all as awaiting_cash
-            unpaid_orders.update(status='awaiting_cash', payment_status='pending_cash')
+            # updated_time is auto_now, which .update() skips; delta sync relies on it
+            unpaid_orders.update(status='awaiting_cash', payment_status='pending_cash', updated_time=now())
             
             # Send ONE Alert
             first_order = unpaid_orders.first()
@@ -189,7 +190,7 @@ class CreateBulkCheckoutSessionView(APIView):
                         "price": str(item.price)
                     })
 
-            async_to_sync(channel_layer.group_send)(
+            publish(
                 f"restaurant_{first_order.restaurant.id}",
                 {
                     "type": "cash_payment_alert",
@@ -208,7 +209,7 @@ class CreateBulkCheckoutSessionView(APIView):
             )
             
             # Notify User Session
-            async_to_sync(channel_layer.group_send)(
+            publish(
                 f"session_{session.id}",
                 {
                     "type": "order_status_update", 
@@ -334,6 +335,7 @@ class CreateCheckoutSessionView(APIView):
     permission_classes = [] # Allow guests (manual token check inside)
     authentication_classes = []
 
+    @idempotent('checkout')
     def post(self, request, order_id):
         # 1. Resolve Guest Session
         session_token = request.headers.get('X-Guest-Session-Token')
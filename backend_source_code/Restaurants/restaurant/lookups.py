@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.db import transaction
+
+from RESTAURANTS.cache import CacheNamespace
+from .models import BusinessDay
+
+BUSINESS_DAYS = CacheNamespace('business_day', ttl=settings.CACHE_TTLS['business_day'])
+
+
+def active_business_day(restaurant_id):
+    """The restaurant's open BusinessDay (or None), cached until a business day changes."""
+    return BUSINESS_DAYS.get_or_load(
+        restaurant_id,
+        loader=lambda: BusinessDay.objects.filter(restaurant_id=restaurant_id, is_active=True).last(),
+    )
+
+
+def forget_business_day(restaurant_id):
+    BUSINESS_DAYS.delete(restaurant_id)
+    transaction.on_commit(lambda: BUSINESS_DAYS.delete(restaurant_id))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0011_businessday_closed_by_businessday_total_card_payment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='menu_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -9,17 +9,28 @@ class Restaurant(models.Model):
     package = models.CharField(max_length=100, blank=True, null=True)
     image = models.ImageField(upload_to='media/restaurant_images/', null=True, blank=True)
     logo = models.ImageField(upload_to='media/restaurant_logos/', null=True, blank=True)
+    # Resized copies of image and logo (RESTAURANTS/images.py)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='restaurants')
+    # Bumped whenever an item or category changes; keys the customer menu snapshot
+    menu_version = models.PositiveBigIntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.resturent_name
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # menu_version only moves through bump_menu_version()'s F() update; a save() from a
+        # stale instance would otherwise write an old version back (and revive old snapshots)
+        values = [value for value in values if value[0].attname != 'menu_version']
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
     
     @property
     def active_business_day(self):
-        return self.business_days.filter(is_active=True).last()
+        from .lookups import active_business_day
+        return active_business_day(self.pk)
 
 class BusinessDay(models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='business_days')
@@ -2,11 +2,15 @@
 from rest_framework import serializers
 from accounts.models import User
 from restaurant.models import Restaurant
+from RESTAURANTS.images import ImageVariantsField
 
 class RestaurantSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField('image')
+    logo_variants = ImageVariantsField('logo')
+
     class Meta:
         model = Restaurant
-        fields = ['resturent_name', 'location', 'phone_number', 'package', 'image', 'logo', 'owner']
+        fields = ['resturent_name', 'location', 'phone_number', 'package', 'image', 'image_variants', 'logo', 'logo_variants', 'owner']
 
 class OwnerRegisterSerializer(serializers.ModelSerializer):
     # restaurant fields
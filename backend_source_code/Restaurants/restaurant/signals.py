@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from message.broadcast import publish
+from RESTAURANTS.images import IMAGE_FIELDS, schedule_derivatives
+from .lookups import forget_business_day
+from .models import BusinessDay, Restaurant
+
+
+@receiver(post_save, sender=BusinessDay)
+@receiver(post_delete, sender=BusinessDay)
+def invalidate_active_business_day(sender, instance, **kwargs):
+    forget_business_day(instance.restaurant_id)
+
+
+@receiver(post_save, sender=BusinessDay)
+@receiver(post_delete, sender=BusinessDay)
+def announce_business_day(sender, instance, **kwargs):
+    """Open chat sockets stamp messages with the active day and reload it on this event."""
+    publish(f"restaurant_{instance.restaurant_id}", {"type": "business_day_changed"})
+
+
+@receiver(post_save, sender=Restaurant)
+def build_restaurant_image_derivatives(sender, instance, **kwargs):
+    schedule_derivatives(instance, IMAGE_FIELDS['restaurant.Restaurant'])
@@ -5,6 +5,7 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework import serializers
 from .models import Restaurant
+from .lookups import active_business_day
 from device.models import Device
 from category.models import Category
 from item.models import Item
@@ -256,7 +257,7 @@ class PublicRestaurantListView(APIView):
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from .models import BusinessDay
-from order.models import Order
+from order.models import Order, SalesRollup
 from device.models import GuestSession
 from django.db.models import Sum
 from accounts.permissions import IsOwnerChefOrStaff
@@ -285,7 +286,7 @@ class BusinessDayViewSet(viewsets.ModelViewSet):
         if not restaurant:
             return Response({"error": "No restaurant association found"}, status=403)
 
-        b_day = BusinessDay.objects.filter(restaurant=restaurant, is_active=True).last()
+        b_day = active_business_day(restaurant.id)
         
         if b_day:
             return Response({
@@ -293,7 +294,7 @@ class BusinessDayViewSet(viewsets.ModelViewSet):
                 "is_active": True,
                 "opened_at": b_day.opened_at,
                 "total_orders": Order.objects.filter(business_day=b_day).count(),
-                "revenue_so_far": Order.objects.filter(business_day=b_day, status='completed').aggregate(s=Sum('total_price'))['s'] or 0
+                "revenue_so_far": SalesRollup.objects.filter(business_day=b_day).aggregate(s=Sum('revenue'))['s'] or 0
             })
         else:
             return Response({
@@ -11,10 +11,8 @@ from .pagination import TenPerPagePagination
 from django.utils.timezone import now
 from rest_framework.decorators import action
 from django.db.models import Avg
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from message.broadcast import publish
 
-channel_layer = get_channel_layer()
 
 # Create your views here.
 
@@ -42,7 +40,7 @@ class CreateReviewAPIView(generics.CreateAPIView):
         review = serializer.save(device=device)
         review_data = GetReviewSerializer(review).data
 
-        async_to_sync(channel_layer.group_send)(
+        publish(
             f"restaurant_{device.restaurant.id}",
             {
                 "type": "review_created",
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import AdminLoginView
 from item.views import StaffItemViewSet
-from order.views import ChefStaffOrdersAPIView, ChefStaffUpdateOrderStatusAPIView
+from order.views import ChefStaffOrdersAPIView, ChefStaffUpdateOrderStatusAPIView, BulkOrderStatusUpdateAPIView
 from device.views import DeviceViewSetall, CloseTableSessionView, DeviceViewSet
 
 router = DefaultRouter()
@@ -22,5 +22,6 @@ urlpatterns = [
     path('login/', AdminLoginView.as_view(), name='admin-login'),
     path('orders/', ChefStaffOrdersAPIView.as_view(), name='staff-orders'),
     path('orders/status/<int:pk>/', ChefStaffUpdateOrderStatusAPIView.as_view(), name='staff-update-order-status'),
+    path('orders/status/bulk/', BulkOrderStatusUpdateAPIView.as_view(), name='staff-bulk-update-order-status'),
     path('sessions/<int:session_id>/close/', CloseTableSessionView.as_view(), name='staff-close-session'),
 ]